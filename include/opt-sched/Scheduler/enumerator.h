@@ -331,6 +331,30 @@ public:
 };
 /*****************************************************************************/
 
+// Statistics on the history table of one region, logged as a HistTableStats
+// event. The table is cleared for every target length, so the sizes are those
+// of the fullest table, while the lookups are counted over all of them.
+class HistTableStats {
+public:
+  HistTableStats();
+
+  // Record the size of the table. Call before the table is cleared.
+  void RecordTable(BinHashTable<HistEnumTreeNode> *tbl);
+  // Record a lookup of a node which traversed trvrsdEntryCnt entries.
+  void RecordLookup(int trvrsdEntryCnt, bool dmntd);
+  // Log the statistics, estimating the memory from the size of a node.
+  void Log(BinHashTable<HistEnumTreeNode> *tbl, size_t histNodeSize);
+
+private:
+  UDT_HASHTBL_CPCTY maxEntryCnt_;
+  UDT_HASHTBL_CPCTY ppultdBktCnt_;
+  UDT_HASHTBL_CPCTY maxListSize_;
+  uint64_t lookupCnt_;
+  uint64_t trvrsdEntryCnt_;
+  uint64_t dmntnHitCnt_;
+};
+/*****************************************************************************/
+
 class Enumerator : public ConstrainedScheduler {
 
 protected:
@@ -379,6 +403,7 @@ protected:
   InstCount minUnschduldTplgclOrdr_;
 
   BinHashTable<HistEnumTreeNode> *exmndSubProbs_;
+  HistTableStats histTblStats_;
 
   // A list of insts whose lower bounds have been tightened to be used for
   // efficient untightening
@@ -560,6 +585,9 @@ public:
   inline bool IsRlxdPrnng();
   virtual bool IsCostEnum() = 0;
 
+  // Log the HistTableStats event of the region, if history domination is on.
+  void LogHistTableStats();
+
   // (Chris)
   inline bool IsSchedForRPOnly() const { return SchedForRPOnly_; }
 
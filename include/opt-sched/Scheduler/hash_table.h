@@ -108,6 +108,7 @@ public:
   UDT_HASHTBL_CPCTY GetEntryCnt() { return entryCnt_; }
   UDT_HASHTBL_CPCTY GetPpultdBktCnt() { return ppultdBktCnt_; }
   UDT_HASHTBL_CPCTY GetMaxListSize() { return maxListSize_; }
+  UDT_HASHVAL GetTblSize() { return tblSize_; }
 
   // Clear the table by deleting all entries, and if (del is set to true),
   // delete the element themselves as well.
@@ -38,6 +38,22 @@ enum LOG_LEVEL {
 void SetLogStream(std::ostream &out);
 std::ostream &GetLogStream();
 
+// Directs all subsequent events to the given stream in the binary event log
+// format, instead of writing them as text to the log stream. Pass NULL to go
+// back to text. The stream must be opened in binary mode and stay alive until
+// it is replaced.
+//
+// The binary format is a header ("OSEV" and a 16-bit version) followed by
+// records of a 8-bit kind, a 32-bit payload size and the payload. All numbers
+// are little-endian.
+//   String (kind 1): a 32-bit id and the bytes of an event ID or key, written
+//     the first time the string is used.
+//   Event (kind 2): the 32-bit id of the event ID, the 64-bit time, and for
+//     every attribute the 32-bit id of its key, its EventAttrType as 8 bits
+//     and its value: 8 bits for Bool, 64 bits for Int64 and UInt64, and a
+//     32-bit length and the bytes for CStr.
+void SetBinaryEventStream(std::ostream *out);
+
 // Output a log message of a given level, either with a timestamp or without.
 // Expects a printf-style format string and a variable number of arguments to
 // place into the string.
@@ -62,12 +78,13 @@ namespace detail {
 // TODO: When we get C++17, get rid of EventAttrType and EventAttrValue in favor
 // of a std::variant.
 
-/** Encodes the type of an Event attribute */
+/** Encodes the type of an Event attribute. The values are part of the binary
+ * event log format. */
 enum class EventAttrType {
-  Int64,
-  UInt64,
-  CStr,
-  Bool,
+  Int64 = 0,
+  UInt64 = 1,
+  CStr = 2,
+  Bool = 3,
 };
 
 /* Gets the type of the argument */
@@ -121,7 +138,8 @@ void Event(const std::pair<EventAttrType, EventAttrValue> *attrs,
  *
  * Logs messages of the format `EVENT: {"event_id": eventID, "key": value...}`,
  * allowing for easier parsing by tools later down the line. The current time is
- * always included.
+ * always included. With SetBinaryEventStream(), the events are written in a
+ * binary format instead.
  *
  * \param eventID a unique ID identifying this event. This should match the
  * regular expression `[A-Z0-9_]+`. That is, this should contain no spaces.
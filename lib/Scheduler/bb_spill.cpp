@@ -300,7 +300,7 @@ void BBWithSpill::CmputAndSetCostLwrBound() {
 
 #if defined(IS_DEBUG_STATIC_LOWER_BOUND)
   Logger::Event("StaticLowerBoundDebugInfo", "name", dataDepGraph_->GetDagID(),
-                "spill_cost_lb", spillCostLwrBound, "sc_factor", SCW_,       //
+                "spill_cost_lb", SpillCostLwrBound, "sc_factor", SCW_,       //
                 "length_lb", schedLwrBound_, "len_factor", schedCostFactor_, //
                 "static_lb", staticLowerBound);
 #endif
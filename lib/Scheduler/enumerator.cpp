@@ -432,6 +432,65 @@ EnumTreeNode::ExaminedInst::~ExaminedInst() {
 /****************************************************************************/
 /****************************************************************************/
 
+HistTableStats::HistTableStats() {
+  maxEntryCnt_ = 0;
+  ppultdBktCnt_ = 0;
+  maxListSize_ = 0;
+  lookupCnt_ = 0;
+  trvrsdEntryCnt_ = 0;
+  dmntnHitCnt_ = 0;
+}
+/****************************************************************************/
+
+void HistTableStats::RecordTable(BinHashTable<HistEnumTreeNode> *tbl) {
+  if (tbl->GetEntryCnt() > maxEntryCnt_) {
+    maxEntryCnt_ = tbl->GetEntryCnt();
+    ppultdBktCnt_ = tbl->GetPpultdBktCnt();
+  }
+  maxListSize_ = std::max(maxListSize_, tbl->GetMaxListSize());
+}
+/****************************************************************************/
+
+void HistTableStats::RecordLookup(int trvrsdEntryCnt, bool dmntd) {
+  lookupCnt_++;
+  trvrsdEntryCnt_ += trvrsdEntryCnt;
+  if (dmntd)
+    dmntnHitCnt_++;
+}
+/****************************************************************************/
+
+void HistTableStats::Log(BinHashTable<HistEnumTreeNode> *tbl,
+                         size_t histNodeSize) {
+  RecordTable(tbl);
+
+  UDT_HASHVAL bktCnt = tbl->GetTblSize();
+  int hashBits = 0;
+  while (((UDT_HASHVAL)1 << hashBits) < bktCnt)
+    hashBits++;
+
+  // The bucket arrays (first entry, last entry and list size) plus an entry
+  // and a history node for every element of the fullest table.
+  uint64_t tblBytes =
+      bktCnt * (2 * sizeof(HashTblEntry<HistEnumTreeNode> *) +
+                sizeof(UDT_HASHTBL_CPCTY));
+  uint64_t entryBytes =
+      (uint64_t)maxEntryCnt_ *
+      (sizeof(BinHashTblEntry<HistEnumTreeNode>) + histNodeSize);
+
+  // The mean chain length of the populated buckets is entries divided by
+  // populated_buckets; events only hold integers.
+  Logger::Event("HistTableStats", "hash_bits", hashBits, //
+                "buckets", bktCnt,                       //
+                "entries", maxEntryCnt_,                 //
+                "populated_buckets", ppultdBktCnt_,      //
+                "max_chain", maxListSize_,               //
+                "lookups", lookupCnt_,                   //
+                "traversed_entries", trvrsdEntryCnt_,    //
+                "domination_hits", dmntnHitCnt_,         //
+                "memory_bytes", tblBytes + entryBytes);
+}
+/****************************************************************************/
+
 Enumerator::Enumerator(DataDepGraph *dataDepGraph, MachineModel *machMdl,
                        InstCount schedUprBound, int16_t sigHashSize,
                        SchedPriorities prirts, Pruning PruningStrategy,
@@ -583,6 +642,7 @@ void Enumerator::FreeAllocators_() {
 
 void Enumerator::Reset() {
   if (IsHistDom()) {
+    histTblStats_.RecordTable(exmndSubProbs_);
     exmndSubProbs_->Clear(false, hashTblEntryAlctr_);
   }
 
@@ -1577,6 +1637,7 @@ bool Enumerator::WasDmnntSubProbExmnd_(SchedInstruction *,
         stats::historyDominationPositionToListSize.Record(
             (trvrsdListSize * 100) / listSize);
 #endif
+        histTblStats_.RecordLookup(trvrsdListSize, true);
         return true;
       } else {
 #ifdef IS_DEBUG_SPD
@@ -1587,10 +1648,21 @@ bool Enumerator::WasDmnntSubProbExmnd_(SchedInstruction *,
   }
 
   stats::traversedHistoryListSize.Record(trvrsdListSize);
+  histTblStats_.RecordLookup(trvrsdListSize, false);
   return false;
 }
 /****************************************************************************/
 
+void Enumerator::LogHistTableStats() {
+  if (!IsHistDom())
+    return;
+
+  size_t histNodeSize =
+      IsCostEnum() ? sizeof(CostHistEnumTreeNode) : sizeof(HistEnumTreeNode);
+  histTblStats_.Log(exmndSubProbs_, histNodeSize);
+}
+/****************************************************************************/
+
 bool Enumerator::TightnLwrBounds_(SchedInstruction *newInst) {
   SchedInstruction *inst;
   InstCount newLwrBound = 0;
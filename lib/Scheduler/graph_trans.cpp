@@ -288,6 +288,7 @@ void StaticNodeSupTrans::nodeMultiPass_(
   // Try to add superior edges until there are no more independent nodes or no
   // edges can be added.
   bool didAddEdge = true;
+  int NumAdded = 0;
   while (didAddEdge && indepNodes.size() > 0) {
     std::list<std::pair<SchedInstruction *, SchedInstruction *>>::iterator
         pair = indepNodes.begin();
@@ -305,9 +306,13 @@ void StaticNodeSupTrans::nodeMultiPass_(
         if (result) {
           pair = indepNodes.erase(pair);
           didAddEdge = true;
+          NumAdded++;
         } else
           pair++;
       }
     }
   }
+
+  Logger::Event("MultiPassGraphTransRPNodeSuperiorityFinished",
+                "superior_edges", NumAdded);
 }
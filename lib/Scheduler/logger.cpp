@@ -6,6 +6,10 @@
 #include <cstdio>
 // For exit().
 #include <cstdlib>
+// For memcpy().
+#include <cstring>
+#include <string>
+#include <unordered_map>
 // For GetProcessorTime().
 #include "opt-sched/Scheduler/utilities.h"
 
@@ -24,6 +28,11 @@ static const int MAX_MSGSIZE = 8000;
 // The current output stream.
 static std::ostream *logStream = &std::cerr;
 
+// The stream of the binary event log, NULL to log events as text.
+static std::ostream *binaryEventStream = NULL;
+// The ids of the event IDs and keys written to the binary event log.
+static std::unordered_map<std::string, uint32_t> binaryEventStrings;
+
 // The periodic logging callback.
 static void (*periodLogCallback)() = NULL;
 // The minimum length of (CPU) time between two calls to the periodic logging
@@ -65,6 +74,15 @@ static void Output(Logger::LOG_LEVEL level, bool timed, const char *message) {
 
 void Logger::SetLogStream(std::ostream &out) { logStream = &out; }
 
+void Logger::SetBinaryEventStream(std::ostream *out) {
+  binaryEventStream = out;
+  binaryEventStrings.clear();
+  if (out) {
+    const char header[] = {'O', 'S', 'E', 'V', 1, 0};
+    out->write(header, sizeof(header));
+  }
+}
+
 std::ostream &Logger::GetLogStream() { return *logStream; }
 
 void Logger::RegisterPeriodicLogger(Milliseconds period, void (*callback)()) {
@@ -122,8 +140,91 @@ void Logger::Summary(const char *format_string, ...) {
 using Logger::detail::EventAttrType;
 using Logger::detail::EventAttrValue;
 
+// The kinds of records in the binary event log.
+enum BinaryRecordKind : uint8_t { BINREC_STRING = 1, BINREC_EVENT = 2 };
+
+template <typename T> static void AppendBinary(std::string &buf, T val) {
+  // The format is little-endian, like every host we run on.
+  char bytes[sizeof(T)];
+  memcpy(bytes, &val, sizeof(T));
+  buf.append(bytes, sizeof(T));
+}
+
+static void WriteBinaryRecord(std::ostream &out, BinaryRecordKind kind,
+                              const std::string &payload) {
+  std::string header;
+  AppendBinary<uint8_t>(header, kind);
+  AppendBinary<uint32_t>(header, payload.size());
+  out.write(header.data(), header.size());
+  out.write(payload.data(), payload.size());
+}
+
+// Returns the id of an event ID or key, writing a string record the first
+// time it is used.
+static uint32_t GetBinaryStringId(std::ostream &out, const char *str) {
+  auto inserted =
+      binaryEventStrings.emplace(str, (uint32_t)binaryEventStrings.size());
+  uint32_t id = inserted.first->second;
+  if (inserted.second) {
+    std::string payload;
+    AppendBinary<uint32_t>(payload, id);
+    payload.append(str);
+    WriteBinaryRecord(out, BINREC_STRING, payload);
+  }
+  return id;
+}
+
+static void
+WriteBinaryEvent(std::ostream &out,
+                 const std::pair<EventAttrType, EventAttrValue> *attrs,
+                 size_t numAttrs) {
+  // Reused between events to avoid allocating.
+  static std::string payload;
+  payload.clear();
+
+  // The first attribute is "event_id" with the event ID as its value.
+  AppendBinary<uint32_t>(payload, GetBinaryStringId(out, attrs[1].second.cstr));
+  AppendBinary<int64_t>(payload, Utilities::GetProcessorTime());
+
+  for (size_t index = 2; index + 1 < numAttrs; index += 2) {
+    const auto type = attrs[index + 1].first;
+    const auto val = attrs[index + 1].second;
+
+    AppendBinary<uint32_t>(payload,
+                           GetBinaryStringId(out, attrs[index].second.cstr));
+    AppendBinary<uint8_t>(payload, static_cast<uint8_t>(type));
+
+    switch (type) {
+    case EventAttrType::Bool:
+      AppendBinary<uint8_t>(payload, val.b);
+      break;
+    case EventAttrType::Int64:
+      AppendBinary<int64_t>(payload, val.i64);
+      break;
+    case EventAttrType::UInt64:
+      AppendBinary<uint64_t>(payload, val.u64);
+      break;
+    case EventAttrType::CStr: {
+      uint32_t len = strlen(val.cstr);
+      AppendBinary<uint32_t>(payload, len);
+      payload.append(val.cstr, len);
+      break;
+    }
+    default:
+      Logger::Fatal("Unknown event type %d. Internal error", (int)type);
+    }
+  }
+
+  WriteBinaryRecord(out, BINREC_EVENT, payload);
+}
+
 void Logger::detail::Event(
     const std::pair<EventAttrType, EventAttrValue> *attrs, size_t numAttrs) {
+  if (binaryEventStream) {
+    WriteBinaryEvent(*binaryEventStream, attrs, numAttrs);
+    return;
+  }
+
   std::ostream &out = *logStream;
 
   // We alternate using ": " and ", " as the separators.
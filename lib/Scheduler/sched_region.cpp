@@ -789,6 +789,7 @@ FUNC_RESULT SchedRegion::Optimize_(Milliseconds startTime,
   Milliseconds solutionTime = Utilities::GetProcessorTime() - startTime;
 
   Logger::Event("NodeExamineCount", "num_nodes", enumrtr->GetNodeCnt());
+  enumrtr->LogHistTableStats();
 
   stats::nodeCount.Record(enumrtr->GetNodeCnt());
   stats::solutionTime.Record(solutionTime);
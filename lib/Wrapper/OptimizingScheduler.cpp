@@ -34,6 +34,8 @@
 #include "llvm/Support/raw_ostream.h"
 #include <algorithm>
 #include <chrono>
+#include <cstdlib>
+#include <fstream>
 #include <string>
 
 #define DEBUG_TYPE "optsched"
@@ -174,6 +176,52 @@ static SchedulerType parseListSchedType() {
       "Unrecognized option for HEUR_SCHED_TYPE: " + SchedTypeString, false);
 }
 
+// Directs the events of this process to a binary event log in EVENT_LOG_PATH
+// if EVENT_LOG_FORMAT is BINARY. Returns whether it did.
+static bool openBinaryEventLog() {
+  SchedulerOptions &SchedIni = SchedulerOptions::getInstance();
+  const std::string Format = SchedIni.GetString("EVENT_LOG_FORMAT", "TEXT");
+  if (Format == "TEXT")
+    return false;
+  if (Format != "BINARY")
+    llvm::report_fatal_error(
+        "Unrecognized option for EVENT_LOG_FORMAT setting: " + Format, false);
+
+  const std::string Dir = SchedIni.GetString("EVENT_LOG_PATH", "");
+  if (Dir.empty())
+    llvm::report_fatal_error(
+        "EVENT_LOG_PATH must be set if EVENT_LOG_FORMAT is BINARY.", false);
+  SmallString<128> Path;
+  auto EC = sys::fs::real_path(Dir, Path, /* expand_tilde = */ true);
+  if (EC || !sys::fs::is_directory(Path))
+    llvm::report_fatal_error(
+        "EVENT_LOG_PATH is set to a non-existent directory or non-directory " +
+            Dir,
+        false);
+  // One file per compiler process, so that parallel builds do not mix their
+  // records. The name is made unique rather than taken from the process id,
+  // which is reused over a long build.
+  sys::path::append(Path, "events.%%%%%%%%.bin");
+  SmallString<128> LogPath;
+  EC = sys::fs::createUniqueFile(Path, LogPath);
+  if (EC)
+    llvm::report_fatal_error("Unable to create an event log in " + Dir + ": " +
+                                 EC.message(),
+                             false);
+
+  static std::ofstream EventLog;
+  EventLog.open(LogPath.c_str(), std::ios::out | std::ios::binary);
+  if (!EventLog)
+    llvm::report_fatal_error("Unable to open the event log " + LogPath, false);
+  Logger::SetBinaryEventStream(&EventLog);
+  // Stop logging to the file before it is destroyed.
+  std::atexit([] {
+    Logger::SetBinaryEventStream(nullptr);
+    EventLog.close();
+  });
+  return true;
+}
+
 static std::unique_ptr<GraphTrans>
 createStaticNodeSupTrans(DataDepGraph *DataDepGraph, bool IsMultiPass = false) {
   return llvm::make_unique<StaticNodeSupTrans>(DataDepGraph, IsMultiPass);
@@ -618,6 +666,9 @@ void ScheduleDAGOptSched::loadOptSchedConfig() {
     randomSeed = time(NULL);
   RandomGen::SetSeed(randomSeed);
   HeurSchedType = parseListSchedType();
+  // Only the first scheduler of the process opens the event log.
+  static bool BinaryEventLog = openBinaryEventLog();
+  (void)BinaryEventLog;
 }
 
 bool ScheduleDAGOptSched::isOptSchedEnabled() const {
@@ -831,10 +882,6 @@ void ScheduleDAGOptSched::scheduleOptSchedMinRP() {
 
   schedule();
   Logger::Event("PassFinished", "num", 1);
-  // TODO(justin): Remove once relevant scripts have been updated:
-  // get-benchmark-stats.py, get-optsched-stats.py, get-sched-length.py,
-  // plaidbench-validation-test.py
-  Logger::Info("End of first pass through\n");
 }
 
 void ScheduleDAGOptSched::scheduleOptSchedBalanced() {
@@ -872,10 +919,6 @@ void ScheduleDAGOptSched::scheduleOptSchedBalanced() {
 
   schedule();
   Logger::Event("PassFinished", "num", 2);
-  // TODO(justin): Remove once relevant scripts have been updated:
-  // get-benchmark-stats.py, get-optsched-stats.py, get-sched-length.py,
-  // plaidbench-validation-test.py
-  Logger::Info("End of second pass through");
 }
 
 bool ScheduleDAGOptSched::isSimRegAllocEnabled() const {
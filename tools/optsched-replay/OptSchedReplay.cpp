@@ -0,0 +1,368 @@
+//===- OptSchedReplay.cpp - Schedule dumped DDGs without LLVM -------------===//
+//
+// Reads DDGs in the format written by DataDepGraph::WriteToFile (e.g. the
+// files written with DUMP_DDGS) and schedules every DAG with the same
+// SchedRegion code that the optimizing scheduler uses, driven by a
+// machine_model.cfg and a sched.ini. The log output, including the EVENT:
+// records, has the same format as the compiler's, so the scripts that read
+// scheduler logs work on it too.
+//
+// The dumps have no register information, so the spill cost of every schedule
+// is zero, and only the first (latency) pass of the two-pass scheduler is
+// replayed.
+//
+//===----------------------------------------------------------------------===//
+#include "opt-sched/Scheduler/OptSchedTarget.h"
+#include "opt-sched/Scheduler/bb_spill.h"
+#include "opt-sched/Scheduler/buffers.h"
+#include "opt-sched/Scheduler/config.h"
+#include "opt-sched/Scheduler/data_dep.h"
+#include "opt-sched/Scheduler/graph_trans.h"
+#include "opt-sched/Scheduler/graph_trans_ilp.h"
+#include "opt-sched/Scheduler/logger.h"
+#include "opt-sched/Scheduler/machine_model.h"
+#include "opt-sched/Scheduler/random.h"
+#include "opt-sched/Scheduler/sched_region.h"
+#include "opt-sched/Scheduler/utilities.h"
+#include "llvm/ADT/STLExtras.h"
+#include "llvm/Support/CommandLine.h"
+#include "llvm/Support/ErrorHandling.h"
+#include <chrono>
+#include <ctime>
+#include <fstream>
+#include <sstream>
+#include <string>
+
+using namespace llvm;
+using namespace llvm::opt_sched;
+
+static cl::list<std::string> DDGFiles(cl::Positional, cl::OneOrMore,
+                                      cl::desc("<ddg files>"));
+
+static cl::opt<std::string>
+    MachineModelPath("machine-model", cl::Required,
+                     cl::desc("Path to the machine_model.cfg to use"));
+
+static cl::opt<std::string>
+    SchedIniPath("sched-ini", cl::Required,
+                 cl::desc("Path to the sched.ini to use"));
+
+namespace {
+
+// The DDG of a dump. The graph is read from the file, so there is nothing to
+// convert from LLVM.
+class ReplayDDG : public DataDepGraph {
+public:
+  ReplayDDG(MachineModel *MM, LATENCY_PRECISION LatencyPrecision)
+      : DataDepGraph(MM, LatencyPrecision) {}
+
+  void convertSUnits(bool IgnoreRealEdges,
+                     bool IgnoreArtificialEdges) override {}
+  void convertRegFiles() override {}
+};
+
+// A machine model from a machine_model.cfg, extended with a default type for
+// the instructions it does not describe. In the compiler, these types are
+// generated from the LLVM machine model instead.
+class ReplayMachineModel : public MachineModel {
+public:
+  ReplayMachineModel(const std::string &ModelFile) : MachineModel(ModelFile) {
+    addInstType("Default");
+    addInstType("artificial");
+  }
+
+  // Adds an instruction type with the given name and the properties of the
+  // default type, unless the model already has one.
+  void addInstType(const std::string &Name) {
+    if (GetInstTypeByName(Name) != INVALID_INST_TYPE)
+      return;
+
+    InstTypeInfo InstType;
+    InstType.name = Name;
+    InstType.isCntxtDep = false;
+    InstType.issuType = 0;
+    InstType.ltncy = 1;
+    InstType.pipelined = true;
+    InstType.sprtd = true;
+    InstType.blksCycle = false;
+    AddInstType(InstType);
+  }
+};
+
+// The sched.ini settings used to schedule a region.
+struct ReplayOptions {
+  LATENCY_PRECISION LatencyPrecision;
+  LB_ALG LowerBoundAlgorithm;
+  SchedPriorities HeuristicPriorities;
+  SchedPriorities EnumPriorities;
+  SPILL_COST_FUNCTION SCF;
+  SchedulerType HeurSchedType;
+  Pruning PruningStrategy;
+  int16_t HistTableHashBits;
+  bool VerifySchedule;
+  bool EnumStalls;
+  bool SchedForRPOnly;
+  bool FilterByPerp;
+  bool StaticNodeSup;
+  bool MultiPassStaticNodeSup;
+  bool ILPStaticNodeSup;
+  int SCW;
+  int RegionTimeout;
+  int LengthTimeout;
+  bool IsTimeoutPerInst;
+  BLOCKS_TO_KEEP BlocksToKeep;
+};
+
+} // end anonymous namespace
+
+// The parsers below accept the same values as the ones in
+// OptimizingScheduler.cpp.
+
+static LATENCY_PRECISION parseLatencyPrecision(const Config &SchedIni) {
+  std::string Name = SchedIni.GetString("LATENCY_PRECISION");
+  if (Name == "FILE" || Name == "PRECISE")
+    return LTP_PRECISE;
+  if (Name == "LLVM" || Name == "ROUGH")
+    return LTP_ROUGH;
+  if (Name == "UNIT" || Name == "UNITY")
+    return LTP_UNITY;
+
+  report_fatal_error("Unrecognized option for LATENCY_PRECISION setting: " +
+                         Name,
+                     false);
+}
+
+static LB_ALG parseLowerBoundAlgorithm(const Config &SchedIni) {
+  std::string Name = SchedIni.GetString("LB_ALG");
+  if (Name == "RJ")
+    return LBA_RJ;
+  if (Name == "LC")
+    return LBA_LC;
+
+  report_fatal_error("Unrecognized option for LB_ALG setting: " + Name, false);
+}
+
+static SchedPriorities parseHeuristic(const std::string &Str) {
+  static constexpr struct {
+    const char *Name;
+    LISTSCHED_HEURISTIC HID;
+  } HeuristicNames[] = {
+      {"CP", LSH_CP},   {"LUC", LSH_LUC}, {"UC", LSH_UC},
+      {"NID", LSH_NID}, {"CPR", LSH_CPR}, {"ISO", LSH_ISO},
+      {"SC", LSH_SC},   {"LS", LSH_LS},   {"LLVM", LSH_LLVM},
+  };
+
+  SchedPriorities Priorities;
+  Priorities.cnt = 0;
+  Priorities.isDynmc = false;
+  std::stringstream Names(Str);
+  std::string Name;
+  while (std::getline(Names, Name, '_')) {
+    bool Found = false;
+    for (const auto &LSH : HeuristicNames)
+      if (Name == LSH.Name) {
+        Priorities.vctr[Priorities.cnt++] = LSH.HID;
+        Priorities.isDynmc |= LSH.HID == LSH_LUC;
+        Found = true;
+        break;
+      }
+    // The LLVM heuristic needs LLVM's schedule, which the dumps don't have.
+    if (!Found || Name == "LLVM")
+      report_fatal_error("Unrecognized heuristic used: " + Str, false);
+  }
+  return Priorities;
+}
+
+static SchedulerType parseListSchedType(const Config &SchedIni) {
+  std::string Name = SchedIni.GetString("HEUR_SCHED_TYPE");
+  if (Name == "LIST")
+    return SCHED_LIST;
+  if (Name == "SEQ")
+    return SCHED_SEQ;
+
+  report_fatal_error("Unrecognized option for HEUR_SCHED_TYPE: " + Name,
+                     false);
+}
+
+static BLOCKS_TO_KEEP parseBlocksToKeep(const Config &SchedIni) {
+  const auto &Setting = SchedIni.GetString("BLOCKS_TO_KEEP");
+  if (Setting == "ZERO_COST")
+    return BLOCKS_TO_KEEP::ZERO_COST;
+  if (Setting == "OPTIMAL")
+    return BLOCKS_TO_KEEP::OPTIMAL;
+  if (Setting == "IMPROVED")
+    return BLOCKS_TO_KEEP::IMPROVED;
+  if (Setting == "IMPROVED_OR_OPTIMAL")
+    return BLOCKS_TO_KEEP::IMPROVED_OR_OPTIMAL;
+
+  return BLOCKS_TO_KEEP::ALL;
+}
+
+static ReplayOptions loadReplayOptions(const Config &SchedIni) {
+  ReplayOptions Options;
+  Options.LatencyPrecision = parseLatencyPrecision(SchedIni);
+  Options.LowerBoundAlgorithm = parseLowerBoundAlgorithm(SchedIni);
+  Options.HeuristicPriorities = parseHeuristic(SchedIni.GetString("HEURISTIC"));
+  Options.EnumPriorities = parseHeuristic(SchedIni.GetString("ENUM_HEURISTIC"));
+  Options.SCF = ParseSCFName(SchedIni.GetString("SPILL_COST_FUNCTION"));
+  Options.HeurSchedType = parseListSchedType(SchedIni);
+  Options.PruningStrategy.rlxd = SchedIni.GetBool("APPLY_RELAXED_PRUNING");
+  Options.PruningStrategy.nodeSup = SchedIni.GetBool("DYNAMIC_NODE_SUPERIORITY");
+  Options.PruningStrategy.histDom = SchedIni.GetBool("APPLY_HISTORY_DOMINATION");
+  Options.PruningStrategy.spillCost =
+      SchedIni.GetBool("APPLY_SPILL_COST_PRUNING");
+  Options.PruningStrategy.useSuffixConcatenation =
+      SchedIni.GetBool("ENABLE_SUFFIX_CONCATENATION");
+  Options.HistTableHashBits =
+      static_cast<int16_t>(SchedIni.GetInt("HIST_TABLE_HASH_BITS"));
+  Options.VerifySchedule = SchedIni.GetBool("VERIFY_SCHEDULE");
+  Options.EnumStalls = SchedIni.GetBool("ENUMERATE_STALLS");
+  Options.SchedForRPOnly = SchedIni.GetBool("SCHEDULE_FOR_RP_ONLY");
+  Options.FilterByPerp = SchedIni.GetBool("FILTER_BY_PERP");
+  Options.StaticNodeSup = SchedIni.GetBool("STATIC_NODE_SUPERIORITY", false);
+  Options.MultiPassStaticNodeSup =
+      SchedIni.GetBool("MULTI_PASS_NODE_SUPERIORITY", false);
+  Options.ILPStaticNodeSup =
+      SchedIni.GetBool("STATIC_NODE_SUPERIORITY_ILP", false);
+  Options.SCW = SchedIni.GetInt("SPILL_COST_WEIGHT");
+  Options.RegionTimeout = SchedIni.GetInt("REGION_TIMEOUT");
+  Options.LengthTimeout = SchedIni.GetInt("LENGTH_TIMEOUT");
+  Options.IsTimeoutPerInst = SchedIni.GetString("TIMEOUT_PER") == "INSTR";
+  Options.BlocksToKeep = parseBlocksToKeep(SchedIni);
+
+  int RandomSeed = SchedIni.GetInt("RANDOM_SEED", 0);
+  if (RandomSeed == 0)
+    RandomSeed = time(NULL);
+  RandomGen::SetSeed(RandomSeed);
+  return Options;
+}
+
+// Instruction types have to be known before a DAG is created, so add a type
+// for every instruction name in the file that the machine model lacks.
+static bool addInstTypes(ReplayMachineModel &MM, const std::string &Path) {
+  std::ifstream File(Path);
+  if (!File)
+    return false;
+
+  std::string Line;
+  while (std::getline(File, Line)) {
+    std::istringstream Tokens(Line);
+    std::string Key, Number, Name;
+    if (!(Tokens >> Key >> Number >> Name) || Key != "node")
+      continue;
+    if (Name.size() >= 2 && Name.front() == '"' && Name.back() == '"')
+      Name = Name.substr(1, Name.size() - 2);
+    MM.addInstType(Name);
+  }
+  return true;
+}
+
+static void scheduleDAG(ReplayDDG &DDG, const OptSchedTarget &OST,
+                        const ReplayOptions &Options, long RegionNum) {
+  Config &SchedIni = SchedulerOptions::getInstance();
+
+  // This log output is parsed by scripts. Keep it in sync with
+  // ScheduleDAGOptSched::schedule().
+  Logger::Info("********** Opt Scheduling **********");
+
+  auto *GraphTransformations = DDG.GetGraphTrans();
+  if (Options.StaticNodeSup) {
+    if (Options.LatencyPrecision == LTP_UNITY)
+      GraphTransformations->push_back(llvm::make_unique<StaticNodeSupTrans>(
+          &DDG, Options.MultiPassStaticNodeSup));
+    else
+      Logger::Info("Skipping RP-only graph transforms for non-unity pass.");
+  }
+  if (Options.ILPStaticNodeSup)
+    GraphTransformations->push_back(
+        llvm::make_unique<StaticNodeSupILPTrans>(&DDG));
+
+  auto Region = llvm::make_unique<BBWithSpill>(
+      &OST, &DDG, RegionNum, Options.HistTableHashBits,
+      Options.LowerBoundAlgorithm, Options.HeuristicPriorities,
+      Options.EnumPriorities, Options.VerifySchedule, Options.PruningStrategy,
+      Options.SchedForRPOnly, Options.EnumStalls, Options.SCW, Options.SCF,
+      Options.HeurSchedType);
+
+  if (SchedIni.GetBool("ACO_ENABLED") &&
+      SchedIni.GetString("ACO_DUAL_COST_FN_ENABLE", "OFF") != "OFF") {
+    std::string CostFn = SchedIni.GetString("ACO_DUAL_COST_FN");
+    if (CostFn != "NONE")
+      Region->addRecordedCost(ParseSCFName(CostFn));
+  }
+
+  int RegionTimeout = Options.RegionTimeout;
+  int LengthTimeout = Options.LengthTimeout;
+  if (Options.IsTimeoutPerInst) {
+    RegionTimeout *= DDG.GetInstCnt();
+    LengthTimeout *= DDG.GetInstCnt();
+  }
+
+  bool IsEasy = false;
+  InstCount NormBestCost = 0;
+  InstCount BestSchedLngth = 0;
+  InstCount NormHurstcCost = 0;
+  InstCount HurstcSchedLngth = 0;
+  InstSchedule *Sched = NULL;
+
+  Utilities::startTime = std::chrono::high_resolution_clock::now();
+  FUNC_RESULT Rslt = Region->FindOptimalSchedule(
+      RegionTimeout, LengthTimeout, IsEasy, NormBestCost, BestSchedLngth,
+      NormHurstcCost, HurstcSchedLngth, Sched, Options.FilterByPerp,
+      Options.BlocksToKeep);
+
+  if (!(Rslt == RES_SUCCESS || Rslt == RES_TIMEOUT) || Sched == NULL)
+    Logger::Info("OptSched run failed: rslt=%d, sched=%p.", Rslt,
+                 (void *)Sched);
+}
+
+// Schedules every DAG in the file. Returns the number of DAGs that could not
+// be read.
+static int replayFile(ReplayMachineModel &MM, const OptSchedTarget &OST,
+                      const ReplayOptions &Options, const std::string &Path,
+                      long &RegionNum) {
+  SpecsBuffer Buf;
+  if (!addInstTypes(MM, Path) || Buf.Load(Path.c_str()) != RES_SUCCESS) {
+    Logger::Error("Could not read DDG file %s.", Path.c_str());
+    return 1;
+  }
+
+  bool EndOfFileReached = false;
+  while (!EndOfFileReached) {
+    ReplayDDG DDG(&MM, Options.LatencyPrecision);
+    FUNC_RESULT Rslt = DDG.ReadFrmFile(&Buf, EndOfFileReached);
+    if (Rslt == RES_END)
+      break;
+    if (Rslt != RES_SUCCESS) {
+      Logger::Error("Invalid DDG in file %s.", Path.c_str());
+      return 1;
+    }
+    scheduleDAG(DDG, OST, Options, RegionNum++);
+  }
+  return 0;
+}
+
+int main(int argc, char **argv) {
+  cl::ParseCommandLineOptions(
+      argc, argv,
+      "Schedule DDGs written by DataDepGraph::WriteToFile with OptSched\n");
+
+  Config &SchedIni = SchedulerOptions::getInstance();
+  SchedIni.Load(SchedIniPath);
+  ReplayOptions Options = loadReplayOptions(SchedIni);
+
+  ReplayMachineModel MM(MachineModelPath);
+  // The generic target only needs the machine model; it computes the cost of
+  // the register pressure as the total peak pressure.
+  auto TargetFactory =
+      OptSchedTargetRegistry::Registry.getFactoryWithName("generic");
+  std::unique_ptr<OptSchedTarget> OST = TargetFactory();
+  OST->initRegion(nullptr, &MM);
+
+  int Failures = 0;
+  long RegionNum = 0;
+  for (const std::string &Path : DDGFiles)
+    Failures += replayFile(MM, *OST, Options, Path, RegionNum);
+
+  return Failures ? 1 : 0;
+}
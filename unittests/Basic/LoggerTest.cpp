@@ -38,4 +38,42 @@ TEST_F(LoggerTest, EmptyEventIncludesOnlyTime) {
                   R"(EVENT: \{"event_id": "SomeEventID", "time": [0-9]+\})"
                   "\n"));
 }
+
+class BinaryEventTest : public LoggerTest {
+protected:
+  BinaryEventTest() { Logger::SetBinaryEventStream(&events); }
+
+  ~BinaryEventTest() override { Logger::SetBinaryEventStream(nullptr); }
+
+  std::string getEvents() const { return events.str(); }
+
+private:
+  std::ostringstream events;
+};
+
+TEST_F(BinaryEventTest, EventsAreNotLoggedAsText) {
+  Logger::Event("SomeEventID", "key", 42);
+  EXPECT_EQ(getLog(), "");
+  EXPECT_EQ(getEvents().substr(0, 6), std::string("OSEV\x01\x00", 6));
+}
+
+TEST_F(BinaryEventTest, StringsAreWrittenOnce) {
+  Logger::Event("SomeEventID", "key", 42, "key2", "value2", "key3", true);
+  const std::string First = getEvents();
+  // The event ID and every key come first, each in its own record.
+  EXPECT_EQ(First.substr(6, 20),
+            std::string("\x01\x0f\x00\x00\x00"
+                        "\x00\x00\x00\x00SomeEventID",
+                        20));
+
+  Logger::Event("SomeEventID", "key", 42, "key2", "value2", "key3", true);
+  const std::string Second = getEvents().substr(First.size());
+  // Kind and size, event ID and time, then the key, type and value of "key",
+  // "key2" and "key3".
+  EXPECT_EQ(Second.size(), 5u + 12u + 13u + 15u + 6u);
+  EXPECT_EQ(Second[0], '\x02');
+  EXPECT_EQ(Second.substr(5, 4), std::string("\x00\x00\x00\x00", 4));
+  EXPECT_EQ(Second.substr(Second.size() - 6),
+            std::string("\x03\x00\x00\x00\x03\x01", 6));
+}
 } // namespace
@@ -3,11 +3,22 @@
 Process benchmark results generated by the running the CPU2006 benchmarks with
 the RunCPU2006CrossARM script.
 Example: ./RunCPU2006CrossARM 2>&1 | ./GenCPU2006CrossARM > result
-TODO: Error checking on number of iterations. Make this value automatically discoverable.
+
+The results are processed as they come in. After every run of a benchmark the
+script decides whether it has to run again: once the bootstrap confidence
+interval of its median user time is within --target-ci percent of the median
+it stops, and otherwise continues until --max-iterations runs. The decisions
+are printed to stderr, and with --decisions written to a file which the run
+script reads to skip the benchmarks which stopped. The run script then runs
+the benchmarks up to ITER times, which has to equal --max-iterations (20 in
+both by default):
+Example: DECISIONS=$HOME/decisions.txt ITER=20 ./RunCPU2006CrossARM 2>&1 | ./GenCPU2006CrossARM --decisions $HOME/decisions.txt > result
 """
 from __future__ import print_function
 from optparse import OptionParser
 from statistics import median, stdev
+import os
+import random
 import sys
 import re
 from functools import reduce
@@ -24,6 +35,10 @@ class BenchData:
         self.userTimes = []
         self.userTimeMedian = None
         self.userTimeStdev = None
+        # Bootstrap confidence interval of the median, (low, high)
+        self.userTimeCI = None
+        # "continue" or "stop", see IterationController
+        self.decision = None
 
     # Find the median runtime
     def findUserMedianTime(self):
@@ -31,19 +46,106 @@ class BenchData:
 
     # Find the standard deviation of the user times
     def findUserStdev(self):
-        self.userTimeStdev = stdev(self.userTimes)
+        self.userTimeStdev = stdev(self.userTimes) if len(self.userTimes) > 1 else 0.0
 
     # Find all statistics for user time
     def findAllUserTimeStats(self):
         self.findUserMedianTime()
         self.findUserStdev()
 
+# Decides after every run of a benchmark whether it has to run again, from the
+# bootstrap confidence interval of its median user time.
+class IterationController:
+    def __init__(self, targetCI, confidence, minIterations, maxIterations, bootstrapSamples, decisionsFile=None):
+        # Largest half-width of the confidence interval, in % of the median
+        self.targetCI = targetCI
+        self.confidence = confidence
+        self.minIterations = minIterations
+        self.maxIterations = maxIterations
+        self.bootstrapSamples = bootstrapSamples
+        self.decisionsFile = decisionsFile
+        # The same resamples for the same times in every run of the script
+        self.random = random.Random(0)
+        self.benchesData = OrderedDict()
+
+    # Bootstrap confidence interval of the median of "times"
+    def bootstrapMedianCI(self, times):
+        medians = sorted(median(self.random.choices(times, k=len(times)))
+                         for _ in range(self.bootstrapSamples))
+        tail = (1.0 - self.confidence) / 2.0
+        low = medians[int(tail * (len(medians) - 1))]
+        high = medians[int(round((1.0 - tail) * (len(medians) - 1)))]
+        return low, high
+
+    # Half-width of the confidence interval of "benchData" in % of its median
+    def relativeHalfWidth(self, benchData):
+        low, high = benchData.userTimeCI
+        if benchData.userTimeMedian == 0:
+            return 0.0
+        return (high - low) / 2.0 / benchData.userTimeMedian * 100
+
+    # Decide whether the benchmark of "benchData" has to run again, after a new
+    # user time was added to it
+    def update(self, benchData):
+        benchData.findAllUserTimeStats()
+        benchData.userTimeCI = self.bootstrapMedianCI(benchData.userTimes)
+        runs = len(benchData.userTimes)
+        halfWidth = self.relativeHalfWidth(benchData)
+        if runs >= self.maxIterations or (runs >= self.minIterations and halfWidth <= self.targetCI):
+            benchData.decision = 'stop'
+        else:
+            benchData.decision = 'continue'
+        self.benchesData[benchData.name] = benchData
+
+        print('%s: %s after %d runs, median %.2f s, %g%% CI %.2f-%.2f s (+-%.2f%%)'
+              % (benchData.name, benchData.decision, runs, benchData.userTimeMedian, self.confidence * 100,
+                 benchData.userTimeCI[0], benchData.userTimeCI[1], halfWidth), file=sys.stderr)
+        sys.stderr.flush()
+        if self.decisionsFile:
+            self.writeDecisions()
+
+    # Write the decision of every benchmark seen so far as "<benchmark> <decision>"
+    # lines, replacing the file at once so that the run script never reads half of it
+    def writeDecisions(self):
+        tempFile = self.decisionsFile + '.tmp'
+        with open(tempFile, 'w') as f:
+            for entry in self.benchesData:
+                f.write(entry + ' ' + self.benchesData[entry].decision + '\n')
+        os.replace(tempFile, self.decisionsFile)
+
 # Abstract class for printing benchmark stats.
 class BenchStatsPrinter(metaclass=ABCMeta):
     @abstractmethod
     def printBenchStatsCSV(self):
         pass
 
+    # Print the runtimes of every iteration, leaving out the iterations which
+    # a benchmark did not run
+    def printRuntimes(self, benchesData):
+        for i in range(self.iterations):
+            print("\n,", end='')
+            for entry in benchesData:
+                userTimes = benchesData[entry].userTimes
+                print(',' + (str(round(userTimes[i], 2)) if i < len(userTimes) else ''), end='')
+
+    # Print the confidence intervals of the medians and the iteration decisions
+    def printDecisions(self, benchesData):
+        print ("\nCI Low:,", end='')
+        for entry in benchesData:
+            print(',' + str(round(benchesData[entry].userTimeCI[0], 2)), end='')
+
+        print ("\nCI High:,", end='')
+        for entry in benchesData:
+            print(',' + str(round(benchesData[entry].userTimeCI[1], 2)), end='')
+
+        print ("\nRuns:,", end='')
+        for entry in benchesData:
+            print(',' + str(len(benchesData[entry].userTimes)), end='')
+
+        print ("\nDecision:,", end='')
+        for entry in benchesData:
+            print(',' + benchesData[entry].decision, end='')
+
 # Print benchmark stats in csv format without comparing to a base set of results.
 class BasicBenchStatsPrinter(BenchStatsPrinter):
     def __init__(self, iterations, peakBenchesData):
@@ -61,10 +163,7 @@ class BasicBenchStatsPrinter(BenchStatsPrinter):
             print (',' + self.peakBenchesData[entry].name, end='')
 
         # Print benchmark runtimes
-        for i in range(self.iterations):
-            print("\n,", end='')
-            for entry in self.peakBenchesData:
-                print(',' + str(round(self.peakBenchesData[entry].userTimes[i], 2)), end='')
+        self.printRuntimes(self.peakBenchesData)
 
         # Print median runtime
         print("\nMedian:,", end='')
@@ -82,6 +181,9 @@ class BasicBenchStatsPrinter(BenchStatsPrinter):
         for entry in self.peakBenchesData:
             print(',' + str(round(self.peakBenchesData[entry].userTimeStdev / self.peakBenchesData[entry].userTimeMedian * 100, 2)) + '%', end='')
 
+        # Print the confidence intervals and decisions
+        self.printDecisions(self.peakBenchesData)
+
         # Print geomean of medians
         print ("\nGeomean:,,", end='')
         print (round(reduce(lambda x, y: x*y, medians)**(1.0/len(medians)), 2), end='')
@@ -109,10 +211,7 @@ class BCBenchStatsPrinter(BenchStatsPrinter):
             print (',' + self.peakBenchesData[entry].name, end='')
 
         # Print benchmark runtimes
-        for i in range(self.iterations):
-            print("\n,", end='')
-            for entry in self.peakBenchesData:
-                print(',' + str(round(self.peakBenchesData[entry].userTimes[i], 2)), end='')
+        self.printRuntimes(self.peakBenchesData)
 
         # Print median runtime
         print("\nMedian:,", end='')
@@ -137,6 +236,9 @@ class BCBenchStatsPrinter(BenchStatsPrinter):
         for entry in self.peakBenchesData:
             print(',' + str(round(self.peakBenchesData[entry].userTimeStdev / self.peakBenchesData[entry].userTimeMedian * 100, 2)) + '%', end='')
 
+        # Print the confidence intervals and decisions
+        self.printDecisions(self.peakBenchesData)
+
         peakGeomean = reduce(lambda x, y: x*y, peakMedians)**(1.0/len(peakMedians))
         baseGeomean = reduce(lambda x, y: x*y, baseMedians)**(1.0/len(baseMedians))
 
@@ -166,19 +268,21 @@ def parseTime(time):
     return 60.0 * minutes + seconds
 
 # Find "BenchData" for a single benchmark
-def parseBench(linesIter, benchData):
+def parseBench(linesIter, benchData, controller):
     for line in linesIter:
         # Look for the user runtime for the benchmark
         findBenchUserTime = BENCH_USER_TIME_REGEX.findall(line)
         if (findBenchUserTime != []):
             userTime = findBenchUserTime[0]
             benchData.userTimes.append(parseTime(userTime))
+            controller.update(benchData)
             return
 
     raise Exception("Could not find runtime for benchmark \"" + benchData.name + "\"")
 
-# Find "BenchData" for all benchmarks within "inData"
-def parseData(inData):
+# Find "BenchData" for all benchmarks within "inData", letting "controller"
+# decide on the iterations after every run
+def parseData(inData, controller):
     benchesData = OrderedDict()
     linesIter = iter(inData)
     for line in linesIter:
@@ -189,7 +293,7 @@ def parseData(inData):
             if benchName not in benchesData:
                 benchData = BenchData(benchName)
                 benchesData[benchName] = benchData
-            benchData = parseBench(linesIter, benchesData[benchName])
+            benchData = parseBench(linesIter, benchesData[benchName], controller)
 
     return benchesData
 
@@ -212,7 +316,9 @@ def main(args):
             inData = sys.stdin
 
         # Extract benchmark data
-        peakBenchesData = parseData(inData)
+        controller = IterationController(args.targetCI, args.confidence, args.minIterations, args.maxIterations,
+                                         args.bootstrapSamples, args.decisions)
+        peakBenchesData = parseData(inData, controller)
 
         inData.close
     except IOError:
@@ -225,27 +331,24 @@ def main(args):
             baseData = open(args.basefile)
 
             # Extract benchmark data
-            baseBenchesData = parseData(baseData)
+            baseController = IterationController(args.targetCI, args.confidence, args.minIterations,
+                                                 args.maxIterations, args.bootstrapSamples)
+            baseBenchesData = parseData(baseData, baseController)
             baseData.close()
         except IOError:
             print ("Unable to parse basefile input data.")
             raise
 
-    # Find usertime stats for peak bench data
-    for entry in peakBenchesData:
-        peakBenchesData[entry].findAllUserTimeStats()
-
-    # Find usertime stats for base bench data
-    if (baseBenchesData is not None):
-        for entry in baseBenchesData:
-            baseBenchesData[entry].findAllUserTimeStats()
+    # The usertime stats were found by the controller after every run. The
+    # benchmarks may have run a different number of times.
+    iterations = max(len(peakBenchesData[entry].userTimes) for entry in peakBenchesData)
 
     # Print stats in csv format
     csvPrinter = None
     if (baseBenchesData is not None):
-        csvPrinter = BCBenchStatsPrinter(3, peakBenchesData, baseBenchesData)
+        csvPrinter = BCBenchStatsPrinter(iterations, peakBenchesData, baseBenchesData)
     else:
-        csvPrinter = BasicBenchStatsPrinter(3, peakBenchesData)
+        csvPrinter = BasicBenchStatsPrinter(iterations, peakBenchesData)
 
     assert isinstance(csvPrinter, BenchStatsPrinter)
     csvPrinter.printBenchStatsCSV()
@@ -259,5 +362,32 @@ if __name__ == '__main__':
     parser.add_option('-b', '--basefile',
                       metavar='filepath',
                       help='Where to find base test results for comparison')
+    parser.add_option('--target-ci',
+                      dest='targetCI',
+                      type='float',
+                      default=2.0,
+                      help='Stop a benchmark once the half-width of the confidence interval of its median user time is within this %% of the median (%default).')
+    parser.add_option('--confidence',
+                      type='float',
+                      default=0.95,
+                      help='The confidence level of the intervals (%default).')
+    parser.add_option('--min-iterations',
+                      dest='minIterations',
+                      type='int',
+                      default=3,
+                      help='Run every benchmark at least this many times (%default).')
+    parser.add_option('--max-iterations',
+                      dest='maxIterations',
+                      type='int',
+                      default=20,
+                      help='Stop a benchmark after this many runs whatever its interval (%default).')
+    parser.add_option('--bootstrap-samples',
+                      dest='bootstrapSamples',
+                      type='int',
+                      default=2000,
+                      help='The number of bootstrap resamples for the confidence intervals (%default).')
+    parser.add_option('--decisions',
+                      metavar='filepath',
+                      help='Where to write the decision for every benchmark for the run script to read.')
 
     main(parser.parse_args()[0])
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Generate a hotfuncs.ini from the results of previous runspec-wrapper runs.
+
+Every function is given a payoff and a cost:
+
+    payoff  The weighted spills of the function (weighted-spills.dat), averaged
+            over the given runs. With --reference (a run with optimal
+            scheduling enabled everywhere), the payoff is instead the weighted
+            spills that the reference run actually saved.
+    cost    The time the scheduler spent on the regions of the function, taken
+            from the logs of the reference run, or of the given runs without
+            one. Runs which were not built with -w contribute no cost.
+
+If execution profiles are given, the payoff is scaled by the share of the
+execution time spent in the function, so functions which never show up in the
+profile are dropped. Both `perf report --stdio --no-children` output and
+gprof flat profiles are understood: the first column is read as the
+percentage and the last column as the symbol.
+
+The functions of each benchmark are ranked by payoff, or by payoff per second
+of scheduling with --time-budget, and selected until --coverage of the
+benchmark's payoff is covered or the budget runs out. Use the output with
+`USE_OPT_SCHED HOT_ONLY`.
+
+Example:
+    ./gen-hotfuncs.py heuristic/ -r optsched/ -p mcf=mcf.perf -o hotfuncs.ini
+"""
+
+import argparse
+import os
+import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import *
+
+WEIGHTED_SPILLS_FILENAME = 'weighted-spills.dat'
+LOG_DIR = 'logs'
+
+# The first column is the percentage of the execution time, the last one the symbol.
+PROFILE_LINE_REGEX = re.compile(r'^\s*(\d+(?:\.\d+)?)%?\s.*\s(\S+)\s*$')
+
+
+class FunctionStats:
+    def __init__(self, name):
+        self.name = name
+        self.payoff = 0.0
+        # Scheduling time in ms.
+        self.cost = 0.0
+        # Percentage of the execution time, None without a profile.
+        self.profileShare = None
+
+    def density(self):
+        # Per second of scheduling, with a floor so that free functions are
+        # not infinitely attractive.
+        return self.payoff / max(self.cost / 1000.0, 0.001)
+
+
+def readWeightedSpills(runDir):
+    with open(os.path.join(runDir, WEIGHTED_SPILLS_FILENAME)) as f:
+        return parse_spills_dat(f.read())
+
+
+def readSchedulingTimes(runDir):
+    '''
+    Returns a `dict[benchmark --> dict[function --> ms]]` from the logs the
+    wrapper wrote with -w. Region names are `<function>:<region number>`.
+    '''
+    times = {}
+    logDir = os.path.join(runDir, LOG_DIR)
+    if not os.path.isdir(logDir):
+        return times
+
+    for path in find_log_files([logDir]):
+        bench = os.path.splitext(os.path.basename(path))[0]
+        benchTimes = times.setdefault(bench, {})
+        with open(path) as f:
+            log = f.read()
+        for block in split_blocks(log):
+            events = parse_events(block)
+            if 'ProcessDag' not in events:
+                continue
+            function = events['ProcessDag'][0]['name'].rsplit(':', 1)[0]
+            benchTimes[function] = benchTimes.get(function, 0) + block_duration(events)
+    return times
+
+
+def average(runs, bench, function):
+    values = [run[bench].get(function, 0) for run in runs if bench in run]
+    return sum(values) / len(values) if values else 0.0
+
+
+def parseProfile(text):
+    '''
+    Returns a `dict[symbol --> percentage]` from a perf or gprof profile.
+    '''
+    profile = {}
+    for line in text.splitlines():
+        match = PROFILE_LINE_REGEX.match(line)
+        if not match:
+            continue
+        share, symbol = match.groups()
+        # Skip the gprof call graph, which references functions as [n].
+        if symbol.startswith('['):
+            continue
+        profile[symbol] = max(profile.get(symbol, 0.0), float(share))
+    return profile
+
+
+def readProfiles(specs):
+    '''
+    Returns a `dict[benchmark or None --> profile]` from `[BENCH=]FILE` specs.
+    The profile under None applies to every benchmark.
+    '''
+    profiles = {}
+    for spec in specs:
+        bench, _, path = spec.rpartition('=')
+        with open(path) as f:
+            profile = parseProfile(f.read())
+        merged = profiles.setdefault(bench if bench else None, {})
+        for symbol, share in profile.items():
+            merged[symbol] = max(merged.get(symbol, 0.0), share)
+    return profiles
+
+
+def collectStats(args):
+    '''
+    Returns a `dict[benchmark --> list[FunctionStats]]`.
+    '''
+    spills = [readWeightedSpills(runDir) for runDir in args.runs]
+    reference = readWeightedSpills(args.reference) if args.reference else None
+    timeDirs = [args.reference] if args.reference else args.runs
+    times = [readSchedulingTimes(runDir) for runDir in timeDirs]
+    profiles = readProfiles(args.profile)
+
+    # The functions which spilled in any of the runs, in the order they were
+    # first seen.
+    functions = {}
+    for run in spills:
+        for bench in run:
+            functions.setdefault(bench, {}).update(dict.fromkeys(run[bench]))
+
+    stats = {}
+    for bench in functions:
+        profile = profiles.get(bench, profiles.get(None))
+        benchStats = []
+        for function in functions[bench]:
+            func = FunctionStats(function)
+            func.payoff = average(spills, bench, function)
+            if reference is not None:
+                func.payoff = max(0.0, func.payoff - reference.get(bench, {}).get(function, func.payoff))
+            func.cost = average(times, bench, function)
+            if profile is not None:
+                func.profileShare = profile.get(function, 0.0)
+                func.payoff *= func.profileShare / 100.0
+            benchStats.append(func)
+        stats[bench] = benchStats
+    return stats
+
+
+def selectFunctions(funcs, coverage, timeBudget, maxFuncs):
+    '''
+    Returns the functions to schedule optimally, best first.
+    '''
+    candidates = [func for func in funcs if func.payoff > 0]
+    if timeBudget is not None:
+        candidates.sort(key=lambda func: (-func.density(), func.name))
+    else:
+        candidates.sort(key=lambda func: (-func.payoff, func.cost, func.name))
+
+    totalPayoff = sum(func.payoff for func in candidates)
+    selected = []
+    payoff = 0.0
+    time = 0.0
+    for func in candidates:
+        if payoff >= coverage * totalPayoff or (maxFuncs and len(selected) >= maxFuncs):
+            break
+        if timeBudget is not None and time + func.cost > timeBudget * 1000:
+            continue
+        selected.append(func)
+        payoff += func.payoff
+        time += func.cost
+    return selected
+
+
+def writeHotFunctions(path, stats, selections):
+    with open(path, 'w') as f:
+        f.write('# A list of functions that we should apply optimizing scheduling to.\n')
+        f.write('# Only applies when the \'USE_OPT_SCHED\' option is set to \'HOT_ONLY\'.\n')
+        f.write('# Generated by gen-hotfuncs.py: payoff in weighted spills, scheduling time in ms.\n')
+
+        for bench in stats:
+            selected = selections[bench]
+            totalPayoff = sum(func.payoff for func in stats[bench])
+            selectedPayoff = sum(func.payoff for func in selected)
+            coverage = selectedPayoff / totalPayoff if totalPayoff else 0.0
+            f.write('\n#{} ({} of {} functions, {:.1%} of the payoff, {:.0f} ms)\n'.format(
+                bench, len(selected), len(stats[bench]), coverage, sum(func.cost for func in selected)))
+            for func in selected:
+                share = '' if func.profileShare is None else ', {:.2f}% of run time'.format(func.profileShare)
+                f.write('{} YES  # payoff {:.1f}, {:.0f} ms{}\n'.format(func.name, func.payoff, func.cost, share))
+
+
+def main(args):
+    stats = collectStats(args)
+    selections = {bench: selectFunctions(funcs, args.coverage, args.time_budget, args.max_funcs)
+                  for bench, funcs in stats.items()}
+    writeHotFunctions(args.output, stats, selections)
+
+    for bench in stats:
+        print('{:>12}: {:>4} of {:>5} functions'.format(bench, len(selections[bench]), len(stats[bench])))
+    print('Wrote {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Generate a hotfuncs.ini from spill history and scheduling times.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('runs', nargs='+',
+                        help='Results directories of runspec-wrapper runs (one test run each).')
+    parser.add_argument('-r', '--reference', default=None,
+                        help='Results of a run with optimal scheduling enabled for all functions. '
+                             'The payoff becomes the weighted spills it saved.')
+    parser.add_argument('-p', '--profile', action='append', default=[], metavar='[BENCH=]FILE',
+                        help='An execution profile, optionally restricted to one benchmark. Can be repeated.')
+    parser.add_argument('--coverage', type=float, default=0.9,
+                        help='The fraction of each benchmark\'s payoff to cover.')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='The maximum scheduling time in seconds for the selected functions of each benchmark.')
+    parser.add_argument('--max-funcs', type=int, default=0,
+                        help='The maximum number of functions per benchmark, 0 for no limit.')
+    parser.add_argument('-o', '--output', default='hotfuncs.ini',
+                        help='Where to write the hotfuncs.ini.')
+
+    main(parser.parse_args())
@@ -4,16 +4,24 @@
 # compiling the CPU2006 benchmarks.
 
 from __future__ import division
+import fcntl
+import gzip
+import hashlib
+import json
 import optparse
 import re
 import subprocess
 import sys
 import os
 import shutil
+import time
 import pdb
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from readlogs import *
+from readlogs import profiling
+from specbuild import limit_memory, wait_for_usage
+from workqueue import WorkQueue, worker_name
 
 ## Configuration
 
@@ -483,6 +491,11 @@ specVersions = {
 
 DETECT_COMMAND = 'if ! . shrc &> /dev/null; then  echo "NX_INSTALL";  elif runspec -h &> /dev/null; then echo "CPU2006"; elif runcpu -h &> /dev/null; then echo "CPU2017"; else echo "SPEC_AUTODETECT_ERROR"; fi'
 LOG_DIR = 'logs/'
+CHECKPOINT_DIR = 'checkpoints/'
+# How often the coordinator and idle workers look at the work queue, in seconds.
+QUEUE_POLL_INTERVAL = 10
+# The lock a worker holds on its SPEC directory and OptSchedCfg directory.
+WORKER_LOCK = '.optsched-worker.lock'
 
 # Regular expressions.
 SETTING_REGEX = re.compile(r'\bUSE_OPT_SCHED\b.*')
@@ -500,9 +513,16 @@ def writeStats(stats, spills, weighted, times, blocks, trackOptSchedSpills):
             for benchName in stats:
                 time = stats[benchName]['time']
                 total_time += time
-                times_file.write('%10s:%5d seconds\n' % (benchName, time))
+                times_file.write('%10s:%5d seconds' % (benchName, time))
+                if 'usage' in stats[benchName]:
+                    times_file.write(format_usage(stats[benchName]['usage']))
+                times_file.write('\n')
             times_file.write('---------------------------\n')
-            times_file.write('     Total:%5d seconds\n' % total_time)
+            times_file.write('     Total:%5d seconds' % total_time)
+            usages = [stats[benchName]['usage'] for benchName in stats if 'usage' in stats[benchName]]
+            if usages:
+                times_file.write(format_usage(total_usage(usages)))
+            times_file.write('\n')
 
     # Write spill stats.
     if spills:
@@ -854,11 +874,11 @@ def calculateBlockStats(output, trackOptSchedSpills, normalized):
                     isOptimal = False
                     improvement = 0
 
-            if 'ACO_sched_complete' in events:
-                acoImprovement = events['AcoSchedComplete']['improvement']
+            if 'ACOSchedComplete' in events:
+                acoImprovement = events['ACOSchedComplete']['improvement']
             else:
                 acoImprovement = 0
-            if 'ACOpost_sched_complete' in events:
+            if 'AcoPostSchedComplete' in events:
                 acoPostImprovement = events['AcoPostSchedComplete']['improvement']
             else:
                 acoPostImprovement = 0
@@ -932,12 +952,13 @@ Defining this function makes it easier to parse files.
 
 def getBenchmarkResult(output, trackOptSchedSpills, normalized):
     # Handle parsing log files that were not generated by runspec and have no time information.
-    time = int(TIMES_REGEX.findall(output)[1]) if len(TIMES_REGEX.findall(output)) > 0 else -1
-    return {
-        'time': time,
-        'spills': calculateSpills(output),
-        'blocks': calculateBlockStats(output, trackOptSchedSpills, normalized),
-    }
+    with profiling.phase('aggregate'):
+        time = int(TIMES_REGEX.findall(output)[1]) if len(TIMES_REGEX.findall(output)) > 0 else -1
+        return {
+            'time': time,
+            'spills': calculateSpills(output),
+            'blocks': calculateBlockStats(output, trackOptSchedSpills, normalized),
+        }
 
 def detectSPECInstall():
     try:
@@ -957,32 +978,50 @@ def detectSPECInstall():
 
     return output
 
-def runBenchmarks(benchmarks, testOutDir, shouldWriteLogs, config, trackOptSchedSpills, normalized):
+def buildBenchmark(version, config, bench, memoryLimit=None):
+    """
+    Scrubs and builds one benchmark and returns its output and resource usage.
+    """
+    with profiling.phase('build'):
+        p = subprocess.Popen('/bin/bash', stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE,
+                             preexec_fn=limit_memory(memoryLimit))
+        p.stdin.write("source shrc" + "\n")
+        p.stdin.write(specVersions[version]['SCRUB_COMMAND'] % (config, bench) + "\n")
+        p.stdin.write(specVersions[version]['BUILD_COMMAND'] % (config, bench))
+        p.stdin.close()
+        output = p.stdout.read()
+        usage = wait_for_usage(p)
+    profiling.count('bytes_read', len(output))
+    return output, usage
+
+def printUsage(usage):
+    print '  user %.1f s, sys %.1f s, max RSS %d MiB' % (usage['user'], usage['sys'], usage['max_rss'] // 1024)
+
+def runBenchmarks(benchmarks, testOutDir, shouldWriteLogs, config, trackOptSchedSpills, normalized, memoryLimit=None,
+                  checkpointKey=None, resume=False):
     # Detect Install
     version = detectSPECInstall()
-    BUILD_COMMAND = specVersions[version]['BUILD_COMMAND']
-    SCRUB_COMMAND = specVersions[version]['SCRUB_COMMAND']
 
     results = {}
     for bench in benchmarks:
+        if resume and resumeBenchmark(results, testOutDir, bench, checkpointKey, shouldWriteLogs):
+            continue
+
         print 'Running', bench
         try:
-            p = subprocess.Popen('/bin/bash', stdin=subprocess.PIPE,
-                                 stdout=subprocess.PIPE)
-            p.stdin.write("source shrc" + "\n")
-            p.stdin.write(SCRUB_COMMAND % (config, bench) + "\n")
-            p.stdin.write(BUILD_COMMAND % (config, bench))
-            p.stdin.close()
-            output = p.stdout.read()
-
+            output, usage = buildBenchmark(version, config, bench, memoryLimit)
         except subprocess.CalledProcessError as e:
             print '  WARNING: Benchmark command failed: %s.' % e
         else:
             results[bench] = getBenchmarkResult(output, trackOptSchedSpills, normalized)
+            results[bench]['usage'] = usage
+            printUsage(usage)
 
             # Optionally write log files to results directory.
             if shouldWriteLogs is True:
                 writeLogs(output, testOutDir, bench)
+            saveCheckpoint(testOutDir, bench, checkpointKey, results[bench], output)
 
     return results
 
@@ -993,16 +1032,209 @@ def writeLogs(output, testOutDir, bench):
     with open(os.path.join(testOutDir,  LOG_DIR + bench + '.log'), 'w') as log:
         log.write(output)
 
+"""
+Every finished build is saved to the checkpoints directory of its test right
+away: its parsed result in <bench>.json and its log in <bench>.log.gz. With
+--resume, the builds which have a checkpoint are not built again. The
+checkpoint is keyed by everything which changes the result (the runspec
+config, the sched.ini and the parsing options), so a test whose settings
+changed is rebuilt.
+"""
+
+def getCheckpointKey(config, ini, trackOptSchedSpills, normalized):
+    key = hashlib.sha1()
+    key.update('%s %s %s\n' % (config, trackOptSchedSpills, normalized))
+    if ini:
+        with open(ini) as iniFile:
+            key.update(iniFile.read())
+    return key.hexdigest()
+
+def checkpointPath(testOutDir, bench, suffix):
+    return os.path.join(testOutDir, CHECKPOINT_DIR + bench + suffix)
+
+def saveCheckpoint(testOutDir, bench, checkpointKey, result, output):
+    directory = os.path.join(testOutDir, CHECKPOINT_DIR)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    # The log goes first and the result is renamed into place last, so that
+    # a result is only found once the checkpoint is complete.
+    logPath = checkpointPath(testOutDir, bench, '.log.gz')
+    with gzip.open(logPath + '.tmp', 'wb') as logFile:
+        logFile.write(output)
+    os.rename(logPath + '.tmp', logPath)
+    resultPath = checkpointPath(testOutDir, bench, '.json')
+    with open(resultPath + '.tmp', 'w') as resultFile:
+        json.dump({'key': checkpointKey, 'result': result}, resultFile)
+    os.rename(resultPath + '.tmp', resultPath)
+
+def loadCheckpoint(testOutDir, bench, checkpointKey):
+    """
+    Returns the saved result of a build, or None if there is none for the
+    current settings.
+    """
+    try:
+        with open(checkpointPath(testOutDir, bench, '.json')) as resultFile:
+            checkpoint = json.load(resultFile)
+    except (IOError, ValueError):
+        return None
+    if checkpoint.get('key') != checkpointKey:
+        print '  WARNING: The settings of %s changed since its checkpoint, building it again.' % bench
+        return None
+    return checkpoint['result']
+
+def resumeBenchmark(results, testOutDir, bench, checkpointKey, shouldWriteLogs):
+    """
+    Adds the checkpointed result of a build to results. Returns whether there
+    was one.
+    """
+    result = loadCheckpoint(testOutDir, bench, checkpointKey)
+    if result is None:
+        return False
+    print 'Skipping %s, it finished in an earlier run.' % bench
+    results[bench] = result
+    logPath = os.path.join(testOutDir, LOG_DIR + bench + '.log')
+    if shouldWriteLogs and not os.path.exists(logPath):
+        with gzip.open(checkpointPath(testOutDir, bench, '.log.gz'), 'rb') as logFile:
+            writeLogs(logFile.read(), testOutDir, bench)
+    return True
+
+def runQueued(args, tests, benchmarks):
+    """
+    Enqueues the builds of every test in the work queue at args.queue and
+    waits for the workers to finish them. Returns the results of every test,
+    in the form of runBenchmarks().
+    """
+    queue = WorkQueue(args.queue)
+    jobs = {}
+    results = [{} for _ in tests]
+    for index, (testOutDir, ini, checkpointKey) in enumerate(tests):
+        iniText = None
+        if ini:
+            with open(ini) as iniFile:
+                iniText = iniFile.read()
+        testName = os.path.basename(os.path.normpath(testOutDir))
+        for bench in sorted(benchmarks):
+            if args.resume and resumeBenchmark(results[index], testOutDir, bench, checkpointKey, args.writelogs):
+                continue
+            # With the settings in the id, a result of a queue which was used
+            # with other settings before is not taken for this one.
+            jobId = '%d.%s.%s.%s' % (index, testName, bench, checkpointKey[:12])
+            queue.enqueue(jobId, {
+                'config': args.config,
+                'bench': bench,
+                'ini': iniText,
+                'trackOptSchedSpills': args.trackOptSchedSpills,
+                'normalized': args.normalized,
+            })
+            jobs[jobId] = (index, bench)
+    queue.close()
+    print 'Enqueued %d builds in %s.' % (len(jobs), args.queue)
+
+    waiting = set(jobs)
+    while waiting:
+        for jobId in sorted(waiting):
+            index, bench = jobs[jobId]
+            result = queue.result(jobId)
+            if result is None:
+                error = queue.error(jobId)
+                if error is not None:
+                    print '  WARNING: Benchmark build %s failed: %s.' % (jobId, error)
+                    waiting.remove(jobId)
+                continue
+            print 'Finished', jobId
+            printUsage(result['usage'])
+            results[index][bench] = result
+            testOutDir, _, checkpointKey = tests[index]
+            if args.writelogs:
+                queue.copy_log(jobId, os.path.join(testOutDir, LOG_DIR + bench + '.log'))
+            saveCheckpoint(testOutDir, bench, checkpointKey, result, queue.read_log(jobId) or '')
+            waiting.remove(jobId)
+        if waiting:
+            for jobId in queue.requeue_stale(args.staleAfter):
+                print '  WARNING: The worker of %s stopped responding, building it again.' % jobId
+            time.sleep(QUEUE_POLL_INTERVAL)
+    return results
+
+def lockWorkerDirectory(directory):
+    """
+    Takes the lock of a worker on a directory, which it holds until it exits.
+    Returns None if another worker holds it.
+    """
+    lockFile = open(os.path.join(directory, WORKER_LOCK), 'a')
+    try:
+        fcntl.flock(lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        lockFile.close()
+        return None
+    return lockFile
+
+def runWorker(args):
+    """
+    Builds the benchmarks enqueued in the work queue at args.worker until the
+    queue is closed and empty. Has to be run in the SPEC directory, like the
+    wrapper itself. Every job writes the sched.ini and builds in the SPEC
+    directory, so every worker needs a SPEC directory and OptSchedCfg
+    directory of its own.
+    """
+    locks = []
+    for directory in [os.getcwd()] + ([args.cfg] if args.cfg else []):
+        lock = lockWorkerDirectory(directory)
+        if lock is None:
+            print 'Fatal: Another worker uses %s. Every worker needs its own SPEC and OptSchedCfg directory.' % directory
+            sys.exit(1)
+        locks.append(lock)
+
+    queue = WorkQueue(args.worker)
+    version = detectSPECInstall()
+    name = worker_name()
+    print 'Worker %s building the jobs in %s.' % (name, args.worker)
+    while True:
+        job = queue.claim(name)
+        if job is None:
+            if queue.finished():
+                break
+            time.sleep(QUEUE_POLL_INTERVAL)
+            continue
+
+        if job['ini'] is not None:
+            if not args.cfg:
+                queue.release(job)
+                print 'Fatal: The jobs have a sched.ini but no OptSchedCfg directory was given. Use option "-g" to specify the path.'
+                sys.exit(1)
+            with open(os.path.join(args.cfg, 'sched.ini'), 'w') as iniFile:
+                iniFile.write(job['ini'])
+
+        print 'Running', job['id']
+        try:
+            with queue.heartbeat(job):
+                output, usage = buildBenchmark(version, job['config'], job['bench'], args.memoryLimit)
+                result = getBenchmarkResult(output, job['trackOptSchedSpills'], job['normalized'])
+                result['usage'] = usage
+        except Exception as e:
+            print '  WARNING: Benchmark build failed: %s.' % e
+            queue.fail(job, str(e))
+            continue
+        printUsage(usage)
+        queue.complete(job, result, output)
+    print 'No more jobs in %s.' % args.worker
+
 
 def main(args):
+    if args.worker:
+        runWorker(args)
+        return
+
     # Parse a log file or multiple log files instead of running benchmark
     results = {}
+    exceededMaxRss = False
     if args.logfile is not None:
         logfiles = [f for f in os.listdir(args.logfile) if os.path.isfile(os.path.join(args.logfile, f)) and f[-4:]=='.log']
 
         for log in logfiles:
             with open(os.path.join(args.logfile, f)) as log_file:
-                output = log_file.read()
+                with profiling.phase('read'):
+                    output = log_file.read()
+                profiling.count('bytes_read', len(output))
                 results[log] = getBenchmarkResult(output, args.trackOptSchedSpills, args.normalized)
 
                 spills = os.path.join(args.outdir, args.spills)
@@ -1011,7 +1243,8 @@ def main(args):
                 blocks = os.path.join(args.outdir, args.blocks)
 
                 # Write out the results from the logfile.
-                writeStats(results, spills, weighted, times, blocks, args.trackOptSchedSpills)
+                with profiling.phase('report'):
+                    writeStats(results, spills, weighted, times, blocks, args.trackOptSchedSpills)
 
         # Run the benchmarks and collect results.
     else:
@@ -1039,18 +1272,20 @@ def main(args):
             os.makedirs(args.outdir)
 
         # Run "testruns" TODO(guess the number of tests) number of tests. Try to find a seperate ini file for each test.
+        # The output directory and sched.ini of every test.
+        tests = []
         for i in range(int(args.testruns)):
             testOutDir = args.outdir
+            ini = None
 
             if args.ini:
-                if not args.cfg:
+                # With a work queue, the workers install the sched.ini.
+                if not args.cfg and not args.queue:
                     print('Fatal: No path to the OptSchedCfg directory found. Use option "-g" to specify the path.')
                     sys.exit(1)
                 else:
                     iniFileName = [filename for filename in os.listdir(args.ini) if filename.split('.')[0] == str(i)]
-
-                    # Move test ini file to OptSchedCfg directroy so the compiler uses it for this test.
-                    shutil.copy(os.path.join(args.ini, iniFileName[0]), os.path.join(args.cfg, 'sched.ini'))
+                    ini = os.path.join(args.ini, iniFileName[0])
 
                     # Create a directory for this test run.
                     testOutDir = args.outdir
@@ -1069,8 +1304,22 @@ def main(args):
                 if not os.path.exists(os.path.join(testOutDir, LOG_DIR)):
                     os.makedirs(os.path.join(testOutDir, LOG_DIR))
 
-            # Run the benchmarks
-            results = runBenchmarks(benchmarks, testOutDir, args.writelogs, args.config, args.trackOptSchedSpills, args.normalized)
+            tests.append((testOutDir, ini, getCheckpointKey(args.config, ini, args.trackOptSchedSpills, args.normalized)))
+
+        if args.queue:
+            queuedResults = runQueued(args, tests, benchmarks)
+
+        for i, (testOutDir, ini, checkpointKey) in enumerate(tests):
+            if args.queue:
+                results = queuedResults[i]
+            else:
+                if ini:
+                    # Move test ini file to OptSchedCfg directroy so the compiler uses it for this test.
+                    shutil.copy(ini, os.path.join(args.cfg, 'sched.ini'))
+
+                # Run the benchmarks
+                results = runBenchmarks(benchmarks, testOutDir, args.writelogs, args.config, args.trackOptSchedSpills, args.normalized, args.memoryLimit,
+                                        checkpointKey, args.resume)
 
             spills = os.path.join(testOutDir, args.spills)
             weighted = os.path.join(testOutDir, args.weighted)
@@ -1078,7 +1327,19 @@ def main(args):
             blocks = os.path.join(testOutDir, args.blocks)
 
             # Write out the results for this test.
-            writeStats(results, spills, weighted, times, blocks, args.trackOptSchedSpills)
+            with profiling.phase('report'):
+                writeStats(results, spills, weighted, times, blocks, args.trackOptSchedSpills)
+
+            # Flag the builds which used more memory than allowed.
+            if args.maxRss:
+                for bench in sorted(results):
+                    maxRss = results[bench]['usage']['max_rss'] // 1024
+                    if maxRss > int(args.maxRss):
+                        print 'WARNING: %s used %d MiB, more than the allowed %s MiB.' % (bench, maxRss, args.maxRss)
+                        exceededMaxRss = True
+
+    if exceededMaxRss:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -1142,5 +1403,37 @@ if __name__ == '__main__':
                       dest="normalized",
                       default=False,
                       help='Output normalized/relative costs to blocks.dat instead of absolute costs (%default).')
-
-    main(parser.parse_args()[0])
+    parser.add_option('--max-rss',
+                      metavar='MiB',
+                      dest='maxRss',
+                      default=None,
+                      help='Exit with an error if the largest process of a benchmark build used more memory (%default).')
+    parser.add_option('--memory-limit',
+                      metavar='MiB',
+                      dest='memoryLimit',
+                      default=None,
+                      help='Limit the address space of every process of the benchmark builds (%default).')
+    parser.add_option('--resume',
+                      action='store_true',
+                      default=False,
+                      help='Do not build the benchmarks again which finished in an earlier run into the same output directory (%default).')
+    parser.add_option('--queue',
+                      metavar='directory',
+                      default=None,
+                      help='Enqueue the builds in a work queue directory shared with workers on other machines instead of building them here (%default).')
+    parser.add_option('--worker',
+                      metavar='directory',
+                      default=None,
+                      help='Build the benchmarks enqueued in a work queue directory until it is empty. Every worker, also on the same machine, needs its own SPEC directory and OptSchedCfg directory (%default).')
+    parser.add_option('--stale-after',
+                      metavar='seconds',
+                      dest='staleAfter',
+                      type=int,
+                      default=600,
+                      help='Build a queued benchmark again if its worker has not been heard from for this long (%default).')
+    profiling.add_profile_option(parser)
+
+    args = parser.parse_args()[0]
+    if args.profile:
+        profiling.enable_profiling()
+    main(args)
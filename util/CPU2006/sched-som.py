@@ -8,19 +8,31 @@ file must exist in each of those directories.
 Options:
 -o: The output directory for the results generated by this script.
 -i: The input directory where the test run directoires are located.
+-s: A state file which keeps the spills of every test run seen so far,
+    together with the per-function minimum. Only test runs that are new or
+    whose spills.dat changed since the last invocation are read and folded
+    into the minimum, so the report can be updated quickly as runs are added.
 """
 
 from __future__ import division
 import os
 import sys
-import statistics
+import pickle
 import collections
 import optparse
+from array import array
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import parse_spills_dat
 
 # Constants
 SPILLS_FILENAME = 'spills.dat'
 SPILLS_MIN_FILE_SUFFIX = '_spills_min.dat'
 SPILLS_STATS_FILE_SUFFIX = '_som_summary.dat'
+STATE_VERSION = 1
+# Marks a function that is missing from a test run. It is larger than any
+# spill count, so it never becomes the minimum.
+MISSING = 2 ** 62
 
 # Track metrics for each benchmark.
 class BenchStats:
@@ -65,61 +77,136 @@ class TestTotals:
             self.totalTestSpills[testName] = 0
             self.totalMaxExtraFunc[testName] = (0, 0)
 
-# Process all benchmarks for one test run.
-def processSpillsFile(spillsFile):
-    spillsResult = collections.OrderedDict()
-    data = spillsFile.readlines()
-    dataItr = iter(data)
-
-    done = False
-    while not done:
-        line = next(dataItr).strip()
-
-        # End of file
-        if line == '------------':
-            done = True
-
-        else:
-            benchName = line.split(':')[0]
-            spillsResult[benchName] = processBenchmark(dataItr)
-
-    return spillsResult
-
-# Process spill stats for one benchmark.
-def processBenchmark(dataItr):
-    benchResult = {}
-    done = False
-    while not done:
-        line = next(dataItr).strip()
-
-        # End of benchmark
-        if line == "---------":
-            # seek 2 forward from the current position
-            for i in range(2):
-                next(dataItr)
-            done = True
+# A function x test matrix of spill counts. Every test run is a column, and
+# the per-function minimum and the set of tests at the minimum (a bitmask of
+# column indices) are updated one column at a time.
+class SpillsTable:
+    def __init__(self):
+        self.version = STATE_VERSION
+        # (benchmark, function) of each row, in the order they were first seen.
+        self.rows = []
+        self.rowIndex = {}
+        # Test names in column order.
+        self.tests = []
+        # Dict with test names as keys of (mtime, size) of the spills file.
+        self.stamps = {}
+        # Dict with test names as keys of the spills of each row.
+        self.columns = {}
+        self.minimum = array('q')
+        self.argmin = []
+
+    def addTest(self, testName, stamp, spillsResult):
+        for benchName in spillsResult:
+            for funcName in spillsResult[benchName]:
+                if (benchName, funcName) not in self.rowIndex:
+                    self.rowIndex[(benchName, funcName)] = len(self.rows)
+                    self.rows.append((benchName, funcName))
+                    self.minimum.append(MISSING)
+                    self.argmin.append(0)
+                    for column in self.columns.values():
+                        column.append(MISSING)
+
+        column = array('q', [MISSING]) * len(self.rows)
+        for benchName in spillsResult:
+            for funcName, spills in spillsResult[benchName].items():
+                column[self.rowIndex[(benchName, funcName)]] = spills
+
+        self.tests.append(testName)
+        self.stamps[testName] = stamp
+        self.columns[testName] = column
+        self.foldColumn(len(self.tests) - 1)
+
+    def removeTest(self, testName):
+        self.tests.remove(testName)
+        del self.stamps[testName]
+        del self.columns[testName]
+        # Drop the rows which only the removed test had.
+        keep = [row for row in range(len(self.rows))
+                if any(column[row] != MISSING for column in self.columns.values())]
+        if len(keep) != len(self.rows):
+            self.rows = [self.rows[row] for row in keep]
+            self.rowIndex = dict((key, row) for row, key in enumerate(self.rows))
+            for name, column in self.columns.items():
+                self.columns[name] = array('q', [column[row] for row in keep])
+        # The column indices changed, recompute the minimum from scratch.
+        self.minimum = array('q', [MISSING]) * len(self.rows)
+        self.argmin = [0] * len(self.rows)
+        for index in range(len(self.tests)):
+            self.foldColumn(index)
+
+    def foldColumn(self, index):
+        column = self.columns[self.tests[index]]
+        bit = 1 << index
+        oldMinimum = self.minimum
+        self.minimum = array('q', map(min, oldMinimum, column))
+        self.argmin = [bit if spills < old else (mask | bit if spills == new and spills != MISSING else mask)
+                       for old, new, spills, mask in zip(oldMinimum, self.minimum, column, self.argmin)]
+
+    def benchmarks(self):
+        benchRows = collections.OrderedDict()
+        for row, (benchName, funcName) in enumerate(self.rows):
+            benchRows.setdefault(benchName, []).append(row)
+        return benchRows
+
+def loadState(statePath):
+    try:
+        with open(statePath, 'rb') as stateFile:
+            table = pickle.load(stateFile)
+        if getattr(table, 'version', None) == STATE_VERSION:
+            return table
+        print ('Warning: Ignoring state file ' + statePath + ' from another version.')
+    except IOError:
+        pass
+    return SpillsTable()
+
+def saveState(table, statePath):
+    tmpPath = statePath + '.tmp'
+    with open(tmpPath, 'wb') as stateFile:
+        pickle.dump(table, stateFile, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpPath, statePath)
+
+# Fold the test runs in the input directory into the table, reading only the
+# spills files which were not seen before.
+def updateTable(table, testRunsDirectory):
+    found = {}
+    for dirName in sorted(os.listdir(testRunsDirectory)):
+        spillsPath = os.path.join(testRunsDirectory, dirName, SPILLS_FILENAME)
+        # Verify this is a directory.
+        if not os.path.isdir(os.path.join(testRunsDirectory, dirName)):
+            continue
+        try:
+            status = os.stat(spillsPath)
+        except OSError as error:
+            print ('Error: Could not open spills file.')
+            print (error)
+            continue
+        found[dirName] = (status.st_mtime_ns, status.st_size, spillsPath)
 
-        else:
-            spills, funcName = line.split(' ')
-            benchResult[funcName] = spills;
+    for testName in list(table.tests):
+        if testName not in found or found[testName][:2] != table.stamps[testName]:
+            table.removeTest(testName)
 
-    return benchResult
+    added = 0
+    for testName, (mtime, size, spillsPath) in found.items():
+        if testName in table.stamps:
+            continue
+        with open(spillsPath) as spillsFile:
+            table.addTest(testName, (mtime, size), parse_spills_dat(spillsFile.read()))
+        added += 1
+    return added
 
 # Collect SOM stats and generate output files.
-def generateSOMFiles(somData, outDir, inDir):
+def generateSOMFiles(table, outDir, inDir):
     try:
         inputDirectoryBase = os.path.basename(os.path.abspath(inDir))
         spillsStatsFileName = inputDirectoryBase + SPILLS_STATS_FILE_SUFFIX
         spillsMinFileName = inputDirectoryBase + SPILLS_MIN_FILE_SUFFIX
         with open(os.path.join(outDir, spillsMinFileName), 'w') as minSpillsFile, \
         open(os.path.join(outDir, spillsStatsFileName), 'w') as spillsStatsFile:
-            # Iterate through benchmarks using a random entry in somData,
-            # all tests must have the same benchmarks.
-            testName = next(iter(somData))
-            totals = TestTotals(iter(somData))
+            totals = TestTotals(sorted(table.tests))
             # Collect stats for each benchmark, add totals for all tests
-            for bench in somData[testName]:
-                benchData = generateBenchStats(bench, somData)
+            for bench, rows in table.benchmarks().items():
+                benchData = generateBenchStats(bench, rows, table)
                 # Wrtie minimums for each function to min spills file.
                 minSpillsFile.write(benchData.benchDataStr)
 
@@ -129,7 +216,7 @@ def generateSOMFiles(somData, outDir, inDir):
                 totals.totalFuncsWithSpills += benchData.funcsWithSpills
 
                 # Calculate aggregate stats for each benchmarks.
-                for testName in iter(somData):
+                for testName in table.tests:
                     totals.totalFuncsAtMin[testName] += benchData.funcsAtMin[testName]
                     totals.totalTestSpills[testName] += benchData.testSpills[testName]
                     totals.totalFuncsWithBestRes[testName] += benchData.funcsWithBestRes[testName]
@@ -162,7 +249,7 @@ def generateSOMFiles(somData, outDir, inDir):
 
                 maxExtraPerFuncStr = 'inf' if maxExtraSpillsP == -1 else "{:.2%}".format(maxExtraSpillsP)
 
-                #stdev = findStdev(somData[testName])
+                #stdev = findStdev(table.columns[testName])
                 testStr += "{:<40}{:>17}{:>9}{:>20}{:>18}{:>9}{:>30}\n\n".format(testName, \
                                                          "{:,}".format(extraSpills), \
                                                          "({})".format(extraSpillsP), \
@@ -189,53 +276,49 @@ def generateSOMFiles(somData, outDir, inDir):
         print ('Fatal: Could not create function min spills file.')
         raise
 
-def findStdev(data):
-    spillsList = []
-    for bench in data:
-        for func in data[bench]:
-            # Get spills for this function
-            spillsList.append(int(data[bench][func]))
+def findStdev(column):
+    import statistics
+    spillsList = [spills for spills in column if spills != MISSING]
     return statistics.stdev(spillsList)
 
 # Find min spills for this benchmarks across all tests.
-def generateBenchStats(benchName, somData):
+def generateBenchStats(benchName, rows, table):
     # Verify that this benchmark exists in all tests, and that the benchmark
     # has the same number of functions in each test.
-    testName = next(iter(somData))
-    numberOfFunctions = len(somData[testName][benchName])
-    for test in somData:
-        if somData[test][benchName] is None:
-            print ('Error: Benchmark ' + benchName + ' does not exist in test ' + testName)
-        if len(somData[test][benchName]) != numberOfFunctions:
-            print ('Error: Benchmark ' + benchName + ' does not have the same number of functions in ' + test + ' as in ' + testName)
-
-    benchData = BenchStats(benchName, iter(somData))
-    benchData.totalFuncs = numberOfFunctions
-    for func in somData[testName][benchName]:
-        # Tests which generated the minimum number of spills.
-        minTests = []
-        # The minimum number of spills for this function.
-        minSpills = sys.maxsize
-        for test in somData:
-            spills = int(somData[test][benchName][func])
-            benchData.testSpills[test]+=spills
-            # Is this the minimum number of spills for this function
-            if spills == minSpills:
-                minTests.append(test)
-            elif spills < minSpills:
-                minTests = []
-                minTests.append(test)
-                minSpills = spills
+    for test in table.tests:
+        column = table.columns[test]
+        missing = sum(1 for row in rows if column[row] == MISSING)
+        if missing == len(rows):
+            print ('Error: Benchmark ' + benchName + ' does not exist in test ' + test)
+        elif missing:
+            print ('Error: Benchmark ' + benchName + ' is missing ' + str(missing) + ' functions in ' + test)
+
+    benchData = BenchStats(benchName, table.tests)
+    benchData.totalFuncs = len(rows)
+    allTests = (1 << len(table.tests)) - 1
+
+    for test in table.tests:
+        column = table.columns[test]
+        spillsList = [column[row] for row in rows if column[row] != MISSING]
+        benchData.testSpills[test] = sum(spillsList)
 
         # Check for Max extra spills above min in a function
-        for test in somData:
-            spills = int(somData[test][benchName][func])
-            diff = spills - minSpills
+        for row in rows:
+            if column[row] == MISSING:
+                continue
+            diff = column[row] - table.minimum[row]
             if (diff > benchData.maxExtraFunc[test][0]):
-                benchData.maxExtraFunc[test] = (diff, minSpills)
+                benchData.maxExtraFunc[test] = (diff, table.minimum[row])
+
+    for row in rows:
+        funcName = table.rows[row][1]
+        minSpills = table.minimum[row]
+        mask = table.argmin[row]
+        # Tests which generated the minimum number of spills.
+        minTests = sorted(test for index, test in enumerate(table.tests) if mask >> index & 1)
 
         # Format output data for this function
-        bestTests = '[All]' if len(minTests) == len(somData) else str(minTests)
+        bestTests = '[All]' if mask == allTests else str(minTests)
 
         if len(minTests) == 1:
             benchData.funcsWithBestRes[minTests[0]] += 1
@@ -248,7 +331,7 @@ def generateBenchStats(benchName, somData):
             for test in minTests:
                 benchData.funcsAtMin[test]+=1
 
-        benchData.benchDataStr += ' '*10 + str(minSpills) + ' ' + func + ' ' + bestTests + '\n'
+        benchData.benchDataStr += ' '*10 + str(minSpills) + ' ' + funcName + ' ' + bestTests + '\n'
         # Add function spills to total.
         benchData.totalSpills += minSpills
 
@@ -256,26 +339,20 @@ def generateBenchStats(benchName, somData):
     return benchData
 
 def main(args):
-    somData = {}
-    # Find all test run direcotires.
+    table = loadState(args.state) if args.state else SpillsTable()
+    # Find all test run direcotires and gather spill data for the new ones.
     testRunsDirectory = os.path.abspath(args.indir)
-    dirNames = os.listdir(testRunsDirectory)
-    # Gather spill data for each test run.
-    for dirName in dirNames:
-        # Verify this is a directory.
-        if not os.path.isdir(os.path.join(testRunsDirectory, dirName)):
-            continue
-
-        try:
-            with open(os.path.join(testRunsDirectory, dirName, SPILLS_FILENAME)) as spillsFile:
-                somData[dirName] = processSpillsFile(spillsFile)
+    added = updateTable(table, testRunsDirectory)
+    if args.state:
+        print ('Folded ' + str(added) + ' new test runs into ' + str(len(table.tests)) + ' known runs.')
+        saveState(table, args.state)
 
-        except IOError as error:
-            print ('Error: Could not open spills file.')
-            print (error)
+    if not table.tests:
+        print ('Fatal: No test runs found in ' + testRunsDirectory)
+        sys.exit(1)
 
     # Find SOM stats and generate SOM spills and stats files.
-    generateSOMFiles(somData, args.outdir, args.indir)
+    generateSOMFiles(table, args.outdir, args.indir)
 
 
 if __name__ == '__main__':
@@ -289,5 +366,9 @@ if __name__ == '__main__':
                       metavar='filepath',
                       default='./',
                       help='Where to find the test run direcotires (%default).')
+    parser.add_option('-s', '--state',
+                      metavar='filepath',
+                      default=None,
+                      help='Keep the spills of the test runs in this file and only read new runs.')
 
     main(parser.parse_args()[0])
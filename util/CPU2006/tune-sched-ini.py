@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Tune sched.ini settings with successive halving on top of the runspec wrapper.
+
+A search space file lists the settings to tune and their candidate values in
+the sched.ini format, with every alternative on the same line:
+
+    ACO_ANT_PER_ITERATION 10 20 40
+    ACO_DECAY_FACTOR 0.1 0.2 0.5
+    HEURISTIC LUC_CP_NID CP_NID
+    REGION_TIMEOUT 5 10
+
+A random sample of configurations is drawn from the space. All of them are
+built with the benchmarks of the first (cheapest) rung. Only the best
+1/eta of them are promoted to the next rung, and so on until the last rung,
+which should be the full suite. The unmodified sched.ini is built on every
+rung as the reference that scores are normalized against:
+
+    score = spill weight * spills / base spills + time weight * time / base time
+
+Every rung is a normal runspec-wrapper run (one test per candidate), so the
+per-rung results directories can be inspected with the usual tools. The
+sched.ini of every candidate is kept next to its results, and rungs which
+already have results for a candidate built with the same sched.ini are not
+rebuilt.
+
+Example:
+    ./tune-sched-ini.py -g ~/.optsched-cfg -c optsched.cfg -s space.ini \\
+        --rung mcf,lbm,milc --rung INT --rung ALL -o tuning/
+"""
+
+import argparse
+import itertools
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import parse_spills_dat, parse_times_dat
+from schedini import parse_settings, update_settings
+
+WRAPPER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runspec-wrapper-optsched.py')
+BASE_NAME = 'base'
+RESULTS_FILENAME = 'tuning.dat'
+BEST_INI_FILENAME = 'best.ini'
+# The sched.ini a candidate's results in a rung were built with.
+SETTINGS_FILENAME = 'candidate.ini'
+
+
+class Candidate:
+    def __init__(self, name, overrides):
+        self.name = name
+        # Dict of the sched.ini settings that differ from the base config.
+        self.overrides = overrides
+        # Dict[rung index --> (spills, time, score)]
+        self.results = {}
+
+    def describe(self):
+        if not self.overrides:
+            return '(base sched.ini)'
+        return ' '.join('{}={}'.format(k, v) for k, v in sorted(self.overrides.items()))
+
+
+def parseSearchSpace(text):
+    '''
+    Returns a `dict[setting --> list[value]]` from the search space text.
+    '''
+    space = {}
+    for line in text.splitlines():
+        tokens = line.split('#', 1)[0].split()
+        if len(tokens) >= 2:
+            space[tokens[0]] = tokens[1:]
+    return space
+
+
+def sampleCandidates(space, count, seed):
+    '''
+    Draws up to `count` distinct configurations from the search space. The
+    space is only enumerated when it is no larger than the sample.
+    '''
+    names = sorted(space)
+    spaceSize = 1
+    for name in names:
+        spaceSize *= len(space[name])
+
+    if spaceSize <= count:
+        choices = list(itertools.product(*(space[name] for name in names)))
+    else:
+        rng = random.Random(seed)
+        seen = set()
+        choices = []
+        # Give up eventually if the sample is close to the size of the space.
+        for _ in range(count * 100):
+            choice = tuple(rng.choice(space[name]) for name in names)
+            if choice not in seen:
+                seen.add(choice)
+                choices.append(choice)
+                if len(choices) == count:
+                    break
+
+    return [Candidate('cand{:03d}'.format(i), dict(zip(names, choice)))
+            for i, choice in enumerate(choices)]
+
+
+def resultsDir(outDir, rung):
+    return os.path.join(outDir, 'rung-{}'.format(rung))
+
+
+def resultFiles(rungDir, candidate, spillsFileName):
+    candidateDir = os.path.join(rungDir, candidate.name)
+    return [os.path.join(candidateDir, spillsFileName), os.path.join(candidateDir, 'times.dat')]
+
+
+def hasResults(rungDir, candidate, spillsFileName, ini):
+    '''
+    Whether the candidate has results for the rung which were built with the
+    sched.ini `ini`.
+    '''
+    try:
+        with open(os.path.join(rungDir, candidate.name, SETTINGS_FILENAME)) as f:
+            if f.read() != ini:
+                return False
+    except IOError:
+        return False
+    return all(os.path.isfile(path) for path in resultFiles(rungDir, candidate, spillsFileName))
+
+
+def runRung(args, baseIni, rung, bench, candidates):
+    '''
+    Builds `bench` once for every candidate that does not have results for
+    this rung yet, using one runspec-wrapper test run per candidate.
+    '''
+    rungDir = resultsDir(args.outdir, rung)
+    spillsFileName = 'weighted-spills.dat' if args.weighted else 'spills.dat'
+    inis = dict((c.name, update_settings(baseIni, c.overrides)) for c in candidates)
+    missing = [c for c in candidates if not hasResults(rungDir, c, spillsFileName, inis[c.name])]
+    if not missing:
+        print('Rung {}: all {} candidates already have results.'.format(rung, len(candidates)))
+        return
+
+    # Remove the results built with other settings, so that they are not
+    # scored if the build fails.
+    for candidate in missing:
+        for path in resultFiles(rungDir, candidate, spillsFileName) + \
+                [os.path.join(rungDir, candidate.name, SETTINGS_FILENAME)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    iniDir = os.path.join(rungDir, 'ini')
+    if os.path.exists(iniDir):
+        shutil.rmtree(iniDir)
+    os.makedirs(iniDir)
+
+    # The wrapper expects the ini files to be named <test number>.<test name>.ini
+    for index, candidate in enumerate(missing):
+        with open(os.path.join(iniDir, '{}.{}.ini'.format(index, candidate.name)), 'w') as f:
+            f.write(inis[candidate.name])
+
+    print('Rung {}: building {} with {} candidates.'.format(rung, bench, len(missing)))
+    command = [args.wrapper,
+               '-c', args.config,
+               '-g', args.cfg,
+               '-i', iniDir,
+               '-m', str(len(missing)),
+               '-b', bench,
+               '-o', rungDir]
+    if args.writelogs:
+        command.append('-w')
+    subprocess.call(command)
+
+    for candidate in missing:
+        if all(os.path.isfile(path) for path in resultFiles(rungDir, candidate, spillsFileName)):
+            with open(os.path.join(rungDir, candidate.name, SETTINGS_FILENAME), 'w') as f:
+                f.write(inis[candidate.name])
+
+
+def smoothedRatio(value, reference):
+    # Add-one smoothing keeps configurations comparable when the reference
+    # has no spills at all.
+    return (value + 1.0) / (reference + 1.0)
+
+
+def scoreRung(args, rung, candidates, base):
+    rungDir = resultsDir(args.outdir, rung)
+    spillsFileName = 'weighted-spills.dat' if args.weighted else 'spills.dat'
+
+    totals = {}
+    for candidate in candidates + [base]:
+        candidateDir = os.path.join(rungDir, candidate.name)
+        try:
+            with open(os.path.join(candidateDir, spillsFileName)) as f:
+                spills = parse_spills_dat(f.read())
+            with open(os.path.join(candidateDir, 'times.dat')) as f:
+                times = parse_times_dat(f.read())
+        except IOError:
+            print('  WARNING: No results for {} on rung {}.'.format(candidate.name, rung))
+            continue
+
+        if not times or any(time < 0 for time in times.values()):
+            print('  WARNING: Missing compile times for {} on rung {}.'.format(candidate.name, rung))
+            continue
+
+        totalSpills = sum(sum(funcs.values()) for funcs in spills.values())
+        totals[candidate.name] = (totalSpills, sum(times.values()))
+
+    if base.name not in totals:
+        print('Fatal: The base configuration failed on rung {}, cannot score candidates.'.format(rung))
+        sys.exit(1)
+
+    baseSpills, baseTime = totals[base.name]
+    for candidate in candidates + [base]:
+        if candidate.name not in totals:
+            candidate.results[rung] = (None, None, float('inf'))
+            continue
+        spills, time = totals[candidate.name]
+        score = args.spill_weight * smoothedRatio(spills, baseSpills) + \
+            args.time_weight * smoothedRatio(time, baseTime)
+        candidate.results[rung] = (spills, time, score)
+
+
+def writeResults(args, rungs, candidates, base):
+    with open(os.path.join(args.outdir, RESULTS_FILENAME), 'w') as f:
+        for rung, bench in enumerate(rungs):
+            f.write('Rung {} ({}):\n'.format(rung, bench))
+            ranked = sorted((c for c in candidates + [base] if rung in c.results),
+                            key=lambda c: c.results[rung][2])
+            for candidate in ranked:
+                spills, time, score = candidate.results[rung]
+                if spills is None:
+                    f.write('  {:>8} {:>10} {:>8} {:>8}  {}\n'.format(
+                        candidate.name, 'failed', '-', '-', candidate.describe()))
+                else:
+                    f.write('  {:>8} {:>10} {:>8} {:>8.4f}  {}\n'.format(
+                        candidate.name, spills, time, score, candidate.describe()))
+            f.write('\n')
+
+
+def main(args):
+    if not os.path.exists(args.outdir):
+        os.makedirs(args.outdir)
+
+    cfgIni = os.path.join(args.cfg, 'sched.ini')
+    baseIniPath = args.base if args.base else cfgIni
+    with open(baseIniPath) as f:
+        baseIni = f.read()
+    with open(args.space) as f:
+        space = parseSearchSpace(f.read())
+
+    baseSettings = parse_settings(baseIni)
+    for name in space:
+        if name not in baseSettings:
+            print('WARNING: {} is not set in {}, it will be appended.'.format(name, baseIniPath))
+
+    base = Candidate(BASE_NAME, {})
+    candidates = sampleCandidates(space, args.candidates, args.seed)
+    print('Sampled {} candidates.'.format(len(candidates)))
+    # Every candidate that was evaluated on at least one rung.
+    evaluated = list(candidates)
+
+    # The wrapper copies every test's ini file over the sched.ini in the cfg
+    # directory, so restore the original once we are done.
+    with open(cfgIni) as f:
+        originalCfgIni = f.read()
+
+    try:
+        for rung, bench in enumerate(args.rung):
+            runRung(args, baseIni, rung, bench, candidates + [base])
+            scoreRung(args, rung, candidates, base)
+            candidates.sort(key=lambda c: c.results[rung][2])
+
+            if rung != len(args.rung) - 1:
+                keep = max(1, int(math.ceil(len(candidates) / args.eta)))
+                candidates = candidates[:keep]
+                print('Rung {}: promoting {}.'.format(rung, ', '.join(c.name for c in candidates)))
+    finally:
+        with open(cfgIni, 'w') as f:
+            f.write(originalCfgIni)
+
+    writeResults(args, args.rung, evaluated, base)
+
+    lastRung = len(args.rung) - 1
+    best = min(candidates + [base], key=lambda c: c.results[lastRung][2])
+    with open(os.path.join(args.outdir, BEST_INI_FILENAME), 'w') as f:
+        f.write(update_settings(baseIni, best.overrides))
+
+    print('Best configuration: {} with score {:.4f} {}'.format(
+        best.name, best.results[lastRung][2], best.describe()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Tune sched.ini settings with successive halving using the runspec wrapper.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-s', '--space', required=True,
+                        help='The search space file: one sched.ini setting per line followed by its candidate values.')
+    parser.add_argument('-g', '--cfg', required=True,
+                        help='The OptSchedCfg directory used by the compiler.')
+    parser.add_argument('--base', default=None,
+                        help='The sched.ini the candidates are based on. Defaults to the sched.ini in the cfg directory.')
+    parser.add_argument('-c', '--config', default='default.cfg',
+                        help='The runspec config file.')
+    parser.add_argument('-r', '--rung', action='append', required=True,
+                        help='The benchmarks to build for a rung, as passed to the wrapper\'s -b option. '
+                             'Repeat from the cheapest subset to the full suite.')
+    parser.add_argument('-n', '--candidates', type=int, default=27,
+                        help='The number of configurations to sample from the search space.')
+    parser.add_argument('--eta', type=float, default=3,
+                        help='Only the best 1/eta of the candidates are promoted to the next rung.')
+    parser.add_argument('--spill-weight', type=float, default=1.0,
+                        help='The weight of the normalized spill count in the score.')
+    parser.add_argument('--time-weight', type=float, default=0.2,
+                        help='The weight of the normalized compile time in the score.')
+    parser.add_argument('--weighted', action='store_true',
+                        help='Score on weighted spills instead of spill counts.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='The seed used to sample the candidates.')
+    parser.add_argument('-o', '--outdir', default='./',
+                        help='Where to write the results for each rung.')
+    parser.add_argument('-w', '--writelogs', action='store_true',
+                        help='Keep the raw build logs of every candidate.')
+    parser.add_argument('--wrapper', default=WRAPPER,
+                        help='The runspec wrapper to run.')
+
+    main(parser.parse_args())
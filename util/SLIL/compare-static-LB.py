@@ -44,7 +44,7 @@ with open(bruteForceFile) as bff:
 with open(bbFile) as bbf:
     bbfm = mmap.mmap(bbf.fileno(), 0, access=mmap.ACCESS_READ)
     dagResults = {}
-    for match in re.finditer(r'EVENT: ({"event_id": "StaticLowerBoundDebugInfo".*)', bffm):
+    for match in re.finditer(r'EVENT: ({"event_id": "StaticLowerBoundDebugInfo".*)', bbfm):
         info = json.loads(match.group(1))
         dagResults[info['name']] = int(info['spill_cost_lb'])
     bbfm.close()
@@ -7,6 +7,10 @@ import subprocess
 import sys
 import os
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import format_usage, profiling, total_usage
+from specbuild import wait_for_usage
+
 # Configuration.
 INT_BENCHMARKS = [
   'perlbench',
@@ -80,9 +84,16 @@ def writeStats(stats, args, dagSizesPerBenchmark):
         for benchName in stats:
             time = stats[benchName]['time']
             total_time += time
-            times_file.write('%10s:%5d seconds\n' % (benchName, time))
+            times_file.write('%10s:%5d seconds' % (benchName, time))
+            if 'usage' in stats[benchName]:
+                times_file.write(format_usage(stats[benchName]['usage']))
+            times_file.write('\n')
         times_file.write('---------------------------\n')
-        times_file.write('     Total:%5d seconds\n' % total_time)
+        times_file.write('     Total:%5d seconds' % total_time)
+        usages = [stats[benchName]['usage'] for benchName in stats if 'usage' in stats[benchName]]
+        if usages:
+            times_file.write(format_usage(total_usage(usages)))
+        times_file.write('\n')
 
     # Write spill stats.
     with open(os.path.join(statsFolder, args.spills), 'w') as spills_file:
@@ -394,12 +405,13 @@ def writeStats(stats, args, dagSizesPerBenchmark):
                         slilCsvFile.write('%d' % spills[functionName])
 
 def calculateDagSizes(output):
-    dagSizes = None
-    matches = BLOCK_NAME_AND_SIZE_REGEX.findall(output)
-    if len(matches) > 0:
-        dagSizes = {}
-        for dagName, instCountString in matches:
-            dagSizes[dagName] = int(instCountString)
+    with profiling.phase('aggregate'):
+        dagSizes = None
+        matches = BLOCK_NAME_AND_SIZE_REGEX.findall(output)
+        if len(matches) > 0:
+            dagSizes = {}
+            for dagName, instCountString in matches:
+                dagSizes[dagName] = int(instCountString)
     return dagSizes
 
 def calculateSLIL(output):
@@ -499,13 +511,14 @@ def calculateSpills(output):
 Defining this function makes it easier to parse files.
 """
 def getBenchmarkResult(output):
-    return {
-      'time': int(TIMES_REGEX.findall(output)[0]),
-      'spills': calculateSpills(output),
-      'blocks': calculateBlockStats(output),
-      'regpressure': calculatePeakPressureStats(output),
-      'slil': calculateSLIL(output)
-    }
+    with profiling.phase('aggregate'):
+        return {
+          'time': int(TIMES_REGEX.findall(output)[0]),
+          'spills': calculateSpills(output),
+          'blocks': calculateBlockStats(output),
+          'regpressure': calculatePeakPressureStats(output),
+          'slil': calculateSLIL(output)
+        }
 
 def runBenchmarks(benchmarks, config):
     results = {}
@@ -518,13 +531,16 @@ def runBenchmarks(benchmarks, config):
     for bench in benchmarks:
         print 'Running', bench
         try:
-            p = subprocess.Popen('/bin/bash', stdin=subprocess.PIPE,
-                                 stdout=subprocess.PIPE)
-            p.stdin.write("source shrc" + "\n");
-            p.stdin.write(COMMAND % (config, bench) + "\n")
-            p.stdin.write("runspec --loose -size=ref -iterations=1 -config=%s --tune=base -r 1 -I -a scrub %s" % (config,bench))
-            p.stdin.close()
-            output = p.stdout.read()
+            with profiling.phase('build'):
+                p = subprocess.Popen('/bin/bash', stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE)
+                p.stdin.write("source shrc" + "\n");
+                p.stdin.write(COMMAND % (config, bench) + "\n")
+                p.stdin.write("runspec --loose -size=ref -iterations=1 -config=%s --tune=base -r 1 -I -a scrub %s" % (config,bench))
+                p.stdin.close()
+                output = p.stdout.read()
+                usage = wait_for_usage(p)
+            profiling.count('bytes_read', len(output))
             logFilePath = os.path.join(LOG_FOLDER, bench + ".log")
             with open(logFilePath, 'w') as logFile:
                 logFile.write(output)
@@ -534,6 +550,7 @@ def runBenchmarks(benchmarks, config):
             print '  WARNING: Benchmark command failed: %s.' % e
         else:
             results[bench] = getBenchmarkResult(output)
+            results[bench]['usage'] = usage
             dagSizesPerBenchmark[bench] = calculateDagSizes(output)
 
     return results, dagSizesPerBenchmark
@@ -570,8 +587,10 @@ def main(args):
                     if not os.path.isfile(logFilePath): continue
                     print("Parsing log file %s" % logFilePath)
                     output = None
-                    with open(logFilePath) as logFile:
-                        output = logFile.read()
+                    with profiling.phase('read'):
+                        with open(logFilePath) as logFile:
+                            output = logFile.read()
+                    profiling.count('bytes_read', len(output))
                     results[benchName] = getBenchmarkResult(output)
                     dagSizesPerBenchmark[benchName] = calculateDagSizes(output)
             else:
@@ -580,8 +599,10 @@ def main(args):
                     benchName = filename.split(".")[0]
                     logFilePath = os.path.join(args.readlogs, filename)
                     output = None
-                    with open(logFilePath) as logFile:
-                        output = logFile.read()
+                    with profiling.phase('read'):
+                        with open(logFilePath) as logFile:
+                            output = logFile.read()
+                    profiling.count('bytes_read', len(output))
                     results[benchName] = getBenchmarkResult(output)
                     dagSizesPerBenchmark[benchName] = calculateDagSizes(output)
 
@@ -600,7 +621,8 @@ def main(args):
         results, dagSizesPerBenchmark = runBenchmarks(benchmarks, args.config)
 
     # Write out the results.
-    writeStats(results, args, dagSizesPerBenchmark)
+    with profiling.phase('report'):
+        writeStats(results, args, dagSizesPerBenchmark)
 
 
 if __name__ == '__main__':
@@ -658,4 +680,9 @@ if __name__ == '__main__':
                      type=int,
                      help='Minimum PERP count to write PERP and SLIL stats for.')
     parser.add_option('--nodirwalk', action='store_true')
-    main(parser.parse_args()[0])
+    profiling.add_profile_option(parser)
+
+    args = parser.parse_args()[0]
+    if args.profile:
+        profiling.enable_profiling()
+    main(args)
@@ -0,0 +1,276 @@
+'''
+Reading and analysing DDGs in the format written by
+`DataDepGraph::WriteToFile`, e.g. the files written with `DUMP_DDGS`:
+
+    dag 4 "model"
+    {
+    dag_id func:0
+    dag_weight 1.000000
+    compiler LLVM
+    dag_lb 0
+    dag_ub 0
+    nodes
+      node 0 "artificial"
+      node 1 "ADD"  "ADD"
+        sched_order 0
+        issue_cycle 0
+      ...
+    dependencies
+      dep 0 1 "other" 0
+      ...
+    }
+
+Nodes are stored as lists and edges as parallel `array`s in file order, so
+that a DAG can be written back exactly with format_ddg().
+'''
+
+import os
+from array import array
+
+DEP_TYPES = ('data', 'anti', 'output', 'other')
+# Marks the sched_order/issue_cycle of nodes that have none (artificial nodes).
+NO_VALUE = -2 ** 31
+
+
+class Dag(object):
+    def __init__(self):
+        self.model = ''
+        self.dag_id = ''
+        self.weight = 0.0
+        self.compiler = ''
+        self.lower_bound = 0
+        self.upper_bound = 0
+        self.names = []
+        # The opcode of each node, None for the entry and exit nodes.
+        self.opcodes = []
+        self.sched_orders = array('i')
+        self.issue_cycles = array('i')
+        self.edge_from = array('i')
+        self.edge_to = array('i')
+        # Index into DEP_TYPES of each edge.
+        self.edge_types = array('b')
+        self.edge_latencies = array('i')
+        self._successors = None
+        self._predecessors = None
+
+    @property
+    def node_count(self):
+        return len(self.names)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_from)
+
+    def successors(self):
+        '''
+        Returns the successors in CSR form: `(offsets, edges)`, where
+        `edges[offsets[n]:offsets[n + 1]]` are the indices of the edges out of n.
+        '''
+        if self._successors is None:
+            self._successors = _csr(self.node_count, self.edge_from)
+        return self._successors
+
+    def predecessors(self):
+        '''
+        Returns the predecessors in the same form as successors().
+        '''
+        if self._predecessors is None:
+            self._predecessors = _csr(self.node_count, self.edge_to)
+        return self._predecessors
+
+    def topological_order(self):
+        offsets, edges = self.successors()
+        in_degree = [0] * self.node_count
+        for to in self.edge_to:
+            in_degree[to] += 1
+        ready = [n for n in range(self.node_count) if in_degree[n] == 0]
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for e in edges[offsets[node]:offsets[node + 1]]:
+                to = self.edge_to[e]
+                in_degree[to] -= 1
+                if in_degree[to] == 0:
+                    ready.append(to)
+        if len(order) != self.node_count:
+            raise ValueError('DAG {} has a cycle'.format(self.dag_id))
+        return order
+
+    def asap_cycles(self):
+        '''
+        Returns the earliest cycle of every node given the edge latencies,
+        i.e. the length of the longest path from the roots.
+        '''
+        offsets, edges = self.successors()
+        cycles = [0] * self.node_count
+        for node in self.topological_order():
+            for e in edges[offsets[node]:offsets[node + 1]]:
+                to = self.edge_to[e]
+                cycles[to] = max(cycles[to], cycles[node] + self.edge_latencies[e])
+        return cycles
+
+    def alap_cycles(self, length=None):
+        '''
+        Returns the latest cycle of every node such that all paths to the
+        leaves fit into `length` (the critical path length by default).
+        '''
+        if length is None:
+            length = max(self.asap_cycles()) if self.node_count else 0
+        offsets, edges = self.predecessors()
+        cycles = [length] * self.node_count
+        for node in reversed(self.topological_order()):
+            for e in edges[offsets[node]:offsets[node + 1]]:
+                frm = self.edge_from[e]
+                cycles[frm] = min(cycles[frm], cycles[node] - self.edge_latencies[e])
+        return cycles
+
+
+def _csr(node_count, endpoints):
+    offsets = array('i', [0]) * (node_count + 1)
+    for n in endpoints:
+        offsets[n + 1] += 1
+    for n in range(node_count):
+        offsets[n + 1] += offsets[n]
+    position = array('i', offsets[:-1])
+    edges = array('i', [0]) * len(endpoints)
+    for e, n in enumerate(endpoints):
+        edges[position[n]] = e
+        position[n] += 1
+    return offsets, edges
+
+
+def _unquote(token):
+    return token[1:-1] if len(token) >= 2 and token[0] == '"' and token[-1] == '"' else token
+
+
+def parse_ddgs(text):
+    '''
+    Parses all DAGs in the text, yielding a Dag for each one.
+    '''
+    dag = None
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+        key = tokens[0]
+        if key == 'dep':
+            dag.edge_from.append(int(tokens[1]))
+            dag.edge_to.append(int(tokens[2]))
+            dag.edge_types.append(DEP_TYPES.index(_unquote(tokens[3])))
+            dag.edge_latencies.append(int(tokens[4]))
+        elif key == 'node':
+            if int(tokens[1]) != len(dag.names):
+                raise ValueError('Unexpected node {} in DAG {}'.format(tokens[1], dag.dag_id))
+            dag.names.append(_unquote(tokens[2]))
+            dag.opcodes.append(_unquote(tokens[3]) if len(tokens) > 3 else None)
+            dag.sched_orders.append(NO_VALUE)
+            dag.issue_cycles.append(NO_VALUE)
+        elif key == 'sched_order':
+            dag.sched_orders[-1] = int(tokens[1])
+        elif key == 'issue_cycle':
+            dag.issue_cycles[-1] = int(tokens[1])
+        elif key == 'dag':
+            dag = Dag()
+            dag.model = _unquote(tokens[2]) if len(tokens) > 2 else ''
+        elif key == 'dag_id':
+            dag.dag_id = tokens[1]
+        elif key == 'dag_weight':
+            dag.weight = float(tokens[1])
+        elif key == 'compiler':
+            dag.compiler = tokens[1]
+        elif key == 'dag_lb':
+            dag.lower_bound = int(tokens[1])
+        elif key == 'dag_ub':
+            dag.upper_bound = int(tokens[1])
+        elif key == '}':
+            yield dag
+            dag = None
+
+
+def parse_ddg(text):
+    '''
+    Parses the first DAG in the text.
+    '''
+    for dag in parse_ddgs(text):
+        return dag
+    raise ValueError('No DAG found')
+
+
+def read_ddg(path):
+    with open(path) as f:
+        return parse_ddg(f.read())
+
+
+def format_ddg(dag):
+    '''
+    Returns the DAG in the format of `DataDepGraph::WriteToFile`.
+    '''
+    lines = [
+        'dag {} "{}"'.format(dag.node_count, dag.model),
+        '{',
+        'dag_id {}'.format(dag.dag_id),
+        'dag_weight {:f}'.format(dag.weight),
+        'compiler {}'.format(dag.compiler),
+        'dag_lb {} '.format(dag.lower_bound),
+        'dag_ub {} '.format(dag.upper_bound),
+        'nodes',
+    ]
+    for n in range(dag.node_count):
+        if dag.opcodes[n] is None:
+            lines.append('  node {} "{}"'.format(n, dag.names[n]))
+        else:
+            lines.append('  node {} "{}"  "{}"'.format(n, dag.names[n], dag.opcodes[n]))
+        if dag.sched_orders[n] != NO_VALUE:
+            lines.append('    sched_order {}'.format(dag.sched_orders[n]))
+            lines.append('    issue_cycle {}'.format(dag.issue_cycles[n]))
+    lines.append('dependencies')
+    for e in range(dag.edge_count):
+        lines.append('  dep {} {} "{}" {}'.format(
+            dag.edge_from[e], dag.edge_to[e], DEP_TYPES[dag.edge_types[e]], dag.edge_latencies[e]))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def find_ddg_files(paths, suffix='.ddg'):
+    '''
+    Expands the given list of DDG files and directories into a sorted list of
+    files. Directories contribute every file ending in `suffix`.
+    '''
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result += sorted(os.path.join(path, f) for f in os.listdir(path)
+                             if f.endswith(suffix) and os.path.isfile(os.path.join(path, f)))
+        else:
+            result.append(path)
+    return result
+
+
+def is_transformed_dump(path, dag):
+    '''
+    Whether the file is a dump taken after a graph transformation, which
+    `DUMP_DDGS` names `<dag id>.<transformation>.ddg`.
+    '''
+    return os.path.basename(path) != dag.dag_id.replace(':', '.') + '.ddg'
+
+
+def dump_name(path, dag):
+    '''
+    Returns a unique name for a dump: the dag_id, followed by the name of the
+    graph transformation for dumps taken after one (e.g. `func:3.ILP`).
+    '''
+    stem = os.path.basename(path)[:-len('.ddg')]
+    prefix = dag.dag_id.replace(':', '.')
+    if stem == prefix:
+        return dag.dag_id
+    if stem.startswith(prefix + '.'):
+        return dag.dag_id + stem[len(prefix):]
+    return stem
+
+
+def dump_filename(name):
+    '''
+    Returns the file name `DUMP_DDGS` uses for the dump named by dump_name().
+    '''
+    return name.replace(':', '.') + '.ddg'
@@ -0,0 +1,328 @@
+'''
+A single-file corpus of DDGs with random access by name.
+
+Layout (little-endian, every array 4-byte aligned):
+
+    header      magic, version, DAG count, offsets of the string table and
+                of the index (HEADER)
+    records     one per DAG, at 8-byte aligned offsets:
+                  RECORD header: node count n, edge count e, string ids of
+                  the dag_id, model and compiler, dag_lb, dag_ub, flags and
+                  dag_weight
+                  int32[n]      string id of each node's name
+                  int32[n]      string id of each node's opcode, -1 for none
+                  int32[n]      sched_order, NO_VALUE if none
+                  int32[n]      issue_cycle, NO_VALUE if none
+                  int32[n + 1]  CSR offsets of the successors of each node
+                  int32[e]      edge targets, in CSR order
+                  int32[e]      edge latencies, in CSR order
+                  int32[e]      file position of each edge, only if
+                                FLAG_EDGE_ORDER is set (the file did not list
+                                the edges grouped by their source node)
+                  int8[e]       index of each edge's type into DEP_TYPES
+    strings     uint32 count, uint32[count + 1] offsets, UTF-8 data
+    index       (uint32 name string id, uint32 padding, uint64 record offset)
+                for every DAG, sorted by name
+
+Every string is stored once in the corpus, so node names and opcodes cost 4
+bytes per use. Names are looked up by a binary search over the index on the
+memory-mapped file, so opening a corpus and loading one DAG does not touch
+the rest of it. The arrays of a record can be wrapped with `numpy.frombuffer`
+without copying, see Corpus.record_arrays().
+'''
+
+import bisect
+import mmap
+import struct
+from array import array
+
+from . import Dag
+
+MAGIC = b'OSDDGCRP'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQ')
+RECORD = struct.Struct('<8id')
+INDEX_ENTRY = struct.Struct('<IIQ')
+FLAG_EDGE_ORDER = 1
+
+
+def _align(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _int_bytes(values):
+    data = array('i', values)
+    if data.itemsize != 4:
+        raise ValueError('int32 arrays are not supported on this platform')
+    if struct.pack('=i', 1) != struct.pack('<i', 1):
+        data.byteswap()
+    return data.tobytes()
+
+
+def _read_ints(buffer, offset, count):
+    data = array('i')
+    data.frombytes(buffer[offset:offset + 4 * count])
+    if struct.pack('=i', 1) != struct.pack('<i', 1):
+        data.byteswap()
+    return data
+
+
+class CorpusWriter(object):
+    '''
+    Writes a corpus incrementally: add() every DAG, then close(). Only the
+    string table and the index are kept in memory.
+    '''
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(b'\0' * HEADER.size)
+        self._offset = HEADER.size
+        self._strings = {}
+        self._string_list = []
+        # list[(name, name string id, record offset)]
+        self._index = []
+        self._names = set()
+
+    def _string_id(self, string):
+        sid = self._strings.get(string)
+        if sid is None:
+            sid = self._strings[string] = len(self._string_list)
+            self._string_list.append(string)
+        return sid
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+    def _pad(self, alignment):
+        padding = _align(self._offset, alignment) - self._offset
+        if padding:
+            self._write(b'\0' * padding)
+
+    def add(self, name, dag):
+        if name in self._names:
+            raise ValueError('Duplicate DAG name {}'.format(name))
+        self._names.add(name)
+        n = dag.node_count
+        e = dag.edge_count
+
+        # Group the edges by their source node, keeping the order in the file.
+        order = sorted(range(e), key=lambda i: dag.edge_from[i])
+        flags = 0 if all(order[i] == i for i in range(e)) else FLAG_EDGE_ORDER
+        offsets = [0] * (n + 1)
+        for frm in dag.edge_from:
+            offsets[frm + 1] += 1
+        for node in range(n):
+            offsets[node + 1] += offsets[node]
+
+        self._pad(8)
+        self._index.append((name, self._string_id(name), self._offset))
+        self._write(RECORD.pack(
+            n, e, self._string_id(dag.dag_id), self._string_id(dag.model), self._string_id(dag.compiler),
+            dag.lower_bound, dag.upper_bound, flags, dag.weight))
+        self._write(_int_bytes(self._string_id(s) for s in dag.names))
+        self._write(_int_bytes(-1 if s is None else self._string_id(s) for s in dag.opcodes))
+        self._write(_int_bytes(dag.sched_orders))
+        self._write(_int_bytes(dag.issue_cycles))
+        self._write(_int_bytes(offsets))
+        self._write(_int_bytes(dag.edge_to[i] for i in order))
+        self._write(_int_bytes(dag.edge_latencies[i] for i in order))
+        if flags & FLAG_EDGE_ORDER:
+            self._write(_int_bytes(order))
+        self._write(array('b', (dag.edge_types[i] for i in order)).tobytes())
+
+    def close(self):
+        self._pad(8)
+        strings_offset = self._offset
+        encoded = [s.encode('utf-8') for s in self._string_list]
+        string_offsets = [0]
+        for data in encoded:
+            string_offsets.append(string_offsets[-1] + len(data))
+        self._write(struct.pack('<I', len(encoded)))
+        self._write(struct.pack('<{}I'.format(len(string_offsets)), *string_offsets))
+        self._write(b''.join(encoded))
+
+        self._pad(8)
+        index_offset = self._offset
+        # Sort by the encoded name, which is what Corpus compares against.
+        for _, sid, offset in sorted(self._index, key=lambda entry: entry[0].encode('utf-8')):
+            self._write(INDEX_ENTRY.pack(sid, 0, offset))
+
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(self._index), strings_offset, index_offset))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+class Corpus(object):
+    '''
+    A memory-mapped corpus. DAGs are looked up by the name they were added
+    with; `len()` and iteration give the names in sorted order.
+    '''
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count, self._strings_offset, self._index_offset = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a DDG corpus'.format(path))
+        if version != VERSION:
+            raise ValueError('Unsupported DDG corpus version {}'.format(version))
+        (self._string_count,) = struct.unpack_from('<I', self._map, self._strings_offset)
+        self._string_data = self._strings_offset + 4 * (self._string_count + 2)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _string_bytes(self, sid):
+        start, end = struct.unpack_from('<II', self._map, self._strings_offset + 4 + 4 * sid)
+        return self._map[self._string_data + start:self._string_data + end]
+
+    def string(self, sid):
+        return self._string_bytes(sid).decode('utf-8')
+
+    def _index_entry(self, i):
+        sid, _, offset = INDEX_ENTRY.unpack_from(self._map, self._index_offset + INDEX_ENTRY.size * i)
+        return sid, offset
+
+    def names(self):
+        for i in range(self._count):
+            yield self.string(self._index_entry(i)[0])
+
+    __iter__ = names
+
+    def _find(self, name):
+        key = name.encode('utf-8')
+
+        class Keys(object):
+            def __getitem__(_, i):
+                return self._string_bytes(self._index_entry(i)[0])
+
+            def __len__(_):
+                return self._count
+
+        i = bisect.bisect_left(Keys(), key)
+        if i == self._count or self._string_bytes(self._index_entry(i)[0]) != key:
+            raise KeyError(name)
+        return self._index_entry(i)[1]
+
+    def __contains__(self, name):
+        try:
+            self._find(name)
+            return True
+        except KeyError:
+            return False
+
+    def _layout(self, offset):
+        '''
+        Returns the record header and `dict[array name --> (offset, count, typecode)]`.
+        '''
+        header = RECORD.unpack_from(self._map, offset)
+        n, e, flags = header[0], header[1], header[7]
+        layout = {}
+        position = offset + RECORD.size
+        fields = [('names', n), ('opcodes', n), ('sched_orders', n), ('issue_cycles', n),
+                  ('offsets', n + 1), ('targets', e), ('latencies', e)]
+        if flags & FLAG_EDGE_ORDER:
+            fields.append(('edge_order', e))
+        for field, count in fields:
+            layout[field] = (position, count, 'i')
+            position += 4 * count
+        layout['types'] = (position, e, 'b')
+        return header, layout
+
+    def counts(self, name):
+        '''
+        Returns the (node count, edge count) of a DAG without loading it.
+        '''
+        return RECORD.unpack_from(self._map, self._find(name))[:2]
+
+    def record_arrays(self, name):
+        '''
+        Returns `dict[array name --> memoryview]` of the raw arrays of a DAG,
+        without copying. Wrap them with `numpy.frombuffer(view, '<i4')` (or
+        `'i1'` for `types`) to use them with NumPy.
+        '''
+        _, layout = self._layout(self._find(name))
+        view = memoryview(self._map)
+        return {field: view[offset:offset + count * (4 if code == 'i' else 1)]
+                for field, (offset, count, code) in layout.items()}
+
+    def get(self, name):
+        '''
+        Loads the DAG with the given name as a `Dag`.
+        '''
+        header, layout = self._layout(self._find(name))
+        n, e, dag_id, model, compiler, lower_bound, upper_bound, flags, weight = header
+
+        def ints(field):
+            offset, count, _ = layout[field]
+            return _read_ints(self._map, offset, count)
+
+        dag = Dag()
+        dag.dag_id = self.string(dag_id)
+        dag.model = self.string(model)
+        dag.compiler = self.string(compiler)
+        dag.lower_bound = lower_bound
+        dag.upper_bound = upper_bound
+        dag.weight = weight
+
+        strings = {}
+
+        def string(sid):
+            if sid not in strings:
+                strings[sid] = self.string(sid)
+            return strings[sid]
+
+        dag.names = [string(sid) for sid in ints('names')]
+        dag.opcodes = [None if sid < 0 else string(sid) for sid in ints('opcodes')]
+        dag.sched_orders = ints('sched_orders')
+        dag.issue_cycles = ints('issue_cycles')
+
+        offsets = ints('offsets')
+        sources = array('i', [0]) * e
+        for node in range(n):
+            for i in range(offsets[node], offsets[node + 1]):
+                sources[i] = node
+        targets = ints('targets')
+        latencies = ints('latencies')
+        offset, _, _ = layout['types']
+        types = array('b')
+        types.frombytes(self._map[offset:offset + e])
+
+        if flags & FLAG_EDGE_ORDER:
+            # Put the edges back into the order of the file.
+            order = ints('edge_order')
+            for field, values in (('edge_from', sources), ('edge_to', targets),
+                                  ('edge_latencies', latencies), ('edge_types', types)):
+                restored = array(values.typecode, values)
+                for i, position in enumerate(order):
+                    restored[position] = values[i]
+                setattr(dag, field, restored)
+        else:
+            dag.edge_from = sources
+            dag.edge_to = targets
+            dag.edge_latencies = latencies
+            dag.edge_types = types
+        return dag
+
+    __getitem__ = get
@@ -0,0 +1,74 @@
+'''
+Running DAGs through the `optsched-replay` tool, which schedules DDG dumps
+without the compiler and writes a scheduler log (see
+tools/optsched-replay/).
+'''
+
+import os
+import subprocess
+import threading
+import time
+
+
+class ReplayResult(object):
+    def __init__(self, log, returncode, wall_time, usage, timed_out):
+        # The log written by the process, stdout and stderr combined.
+        self.log = log
+        # The exit code, or minus the signal that killed the process.
+        self.returncode = returncode
+        # The wall time of the process in seconds.
+        self.wall_time = wall_time
+        # The `resource.struct_rusage` of the process.
+        self.usage = usage
+        self.timed_out = timed_out
+
+    @property
+    def max_rss(self):
+        '''
+        The peak resident set size of the process in KiB.
+        '''
+        return self.usage.ru_maxrss
+
+    @property
+    def error(self):
+        '''
+        A description of why the process failed, None if it did not.
+        '''
+        if self.timed_out:
+            return 'timed out'
+        if self.returncode < 0:
+            return 'killed by signal {}'.format(-self.returncode)
+        if self.returncode > 0:
+            return 'exit code {}'.format(self.returncode)
+        return None
+
+
+def run_replay(replay, machine_model, sched_ini, files, timeout=None):
+    '''
+    Schedules the DAGs in `files` with the `replay` binary and returns a
+    ReplayResult. The resource usage is that of this process alone, not of
+    every child of the caller.
+    '''
+    command = [replay, '-machine-model', machine_model, '-sched-ini', sched_ini] + list(files)
+    start = time.time()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    timed_out = []
+
+    def kill():
+        timed_out.append(True)
+        process.kill()
+
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer:
+        timer.start()
+    try:
+        log = process.stdout.read()
+        process.stdout.close()
+        # Reap the process ourselves, Popen.wait() does not give its usage.
+        _, status, usage = os.wait4(process.pid, 0)
+    finally:
+        if timer:
+            timer.cancel()
+    wall_time = time.time() - start
+    process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    return ReplayResult(log, process.returncode, wall_time, usage, bool(timed_out))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+'''
+Check the event schemas of readlogs (readlogs.schema.EVENT_SCHEMAS) against
+the `Logger::Event(...)` call sites in the C++ sources.
+
+Every call site has to be in the registry with the same attributes in the
+same order, or the log readers fall back to parsing its events as JSON.
+Exits with 1 and lists the differences otherwise. The types of the attributes
+cannot be told from the sources and are not checked.
+
+With `--print`, the registry entries of the events which are not registered
+are printed, with every attribute an `int`, to be corrected and added to
+EVENT_SCHEMAS.
+
+Example:
+    ./check-event-schemas.py
+'''
+
+import argparse
+import os
+import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs.schema import EVENT_SCHEMAS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SOURCE_DIRS = ('lib', 'tools')
+SOURCE_SUFFIXES = ('.cpp', '.h')
+RE_CALL = re.compile(r'\bLogger::Event\(')
+RE_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"')
+RE_COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+
+def split_arguments(text, start):
+    '''
+    Returns the top level arguments of the call whose argument list starts at
+    `start`.
+    '''
+    args = []
+    depth = 0
+    current = start
+    i = start
+    while True:
+        c = text[i]
+        if c == '"':
+            i = RE_STRING.match(text, i).end()
+            continue
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            if depth == 0:
+                args.append(text[current:i].strip())
+                return args
+            depth -= 1
+        elif c == ',' and depth == 0:
+            args.append(text[current:i].strip())
+            current = i + 1
+        i += 1
+
+
+def scan_call_sites(root):
+    '''
+    Returns `list[(file:line, event ids, attribute names)]` of the call sites.
+    A call site has more than one event id when it chooses between them.
+    '''
+    sites = []
+    for directory in SOURCE_DIRS:
+        for dirpath, _, files in os.walk(os.path.join(root, directory)):
+            for name in sorted(files):
+                if not name.endswith(SOURCE_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, name)
+                with open(path) as f:
+                    # Blank out the comments but keep the line numbers.
+                    text = RE_COMMENT.sub(lambda m: '\n' * m.group().count('\n'), f.read())
+                for match in RE_CALL.finditer(text):
+                    args = split_arguments(text, match.end())
+                    event_ids = RE_STRING.findall(args[0])
+                    keys = [RE_STRING.match(arg).group(1) if RE_STRING.match(arg) else arg for arg in args[1::2]]
+                    location = '{}:{}'.format(os.path.relpath(path, root), text.count('\n', 0, match.start()) + 1)
+                    sites.append((location, event_ids, keys))
+    return sites
+
+
+def main(args):
+    sites = scan_call_sites(args.root)
+    if not sites:
+        print('Fatal: No Logger::Event calls under {}.'.format(args.root))
+        sys.exit(1)
+
+    problems = []
+    unregistered = {}
+    seen = set()
+    for location, event_ids, keys in sites:
+        for event_id in event_ids:
+            seen.add(event_id)
+            if event_id not in EVENT_SCHEMAS:
+                problems.append('{}: {} is not registered'.format(location, event_id))
+                unregistered.setdefault(event_id, keys)
+                continue
+            expected = [key for key, _ in EVENT_SCHEMAS[event_id]]
+            if keys != expected:
+                problems.append('{}: {} logs {} but is registered with {}'.format(
+                    location, event_id, ', '.join(keys) or '(nothing)', ', '.join(expected) or '(nothing)'))
+
+    for event_id in sorted(set(EVENT_SCHEMAS) - seen):
+        problems.append('{} is registered but never logged'.format(event_id))
+
+    for problem in problems:
+        print(problem)
+    if args.print and unregistered:
+        print('')
+        for event_id in sorted(unregistered):
+            print('    {!r}: ({}),'.format(event_id, ''.join('({!r}, int), '.format(key)
+                                                            for key in unregistered[event_id]).rstrip()))
+    if problems:
+        sys.exit(1)
+    print('{} call sites match the {} registered events.'.format(len(sites), len(EVENT_SCHEMAS)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the event schemas of readlogs against the C++ sources.')
+    parser.add_argument('--root', default=ROOT, help='The root of the OptSched sources (default: %(default)s).')
+    parser.add_argument('--print', action='store_true',
+                        help='Print registry entries for the events which are not registered.')
+    main(parser.parse_args())
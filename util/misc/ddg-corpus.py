@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+'''
+Pack DUMP_DDGS directories into a single corpus file and back.
+
+    pack      Parses the .ddg files and writes them to a corpus, keyed by their
+              dump name: the dag_id, plus the graph transformation for dumps
+              taken after one (e.g. `func:3.ILP`).
+    unpack    Writes the DAGs of a corpus back as .ddg files, byte for byte
+              as the scheduler wrote them.
+    list      Lists the DAGs in a corpus with their size.
+    show      Prints DAGs from a corpus in the WriteToFile format.
+
+See ddg/corpus.py for the file layout.
+
+Example:
+    ./ddg-corpus.py pack ddg-dumps/ -o dumps.ddgc --verify
+    ./ddg-corpus.py show dumps.ddgc 'mainGtU:4'
+'''
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ddg import dump_filename, dump_name, find_ddg_files, format_ddg, parse_ddg
+from ddg.corpus import Corpus, CorpusWriter
+
+
+def parse_file(path):
+    with open(path) as f:
+        text = f.read()
+    try:
+        dag = parse_ddg(text)
+    except ValueError as error:
+        return path, None, str(error), None
+    return path, dump_name(path, dag), dag, text
+
+
+def pack(args):
+    files = find_ddg_files(args.dumps)
+    total_size = 0
+    mismatches = 0
+    pool = multiprocessing.Pool(args.jobs)
+    try:
+        with CorpusWriter(args.output) as writer:
+            # Keep the order of the files so that the corpus is deterministic.
+            for path, name, dag, text in pool.imap(parse_file, files, chunksize=64):
+                if name is None:
+                    print('WARNING: Skipping {}: {}'.format(path, dag))
+                    continue
+                if args.verify and format_ddg(dag) != text:
+                    mismatches += 1
+                    print('WARNING: {} does not round-trip exactly.'.format(path))
+                writer.add(name, dag)
+                total_size += len(text)
+    finally:
+        pool.close()
+        pool.join()
+
+    corpus_size = os.path.getsize(args.output)
+    print('Packed {} files ({:,} bytes) into {} ({:,} bytes, {:.1%}).'.format(
+        len(files), total_size, args.output, corpus_size, corpus_size / total_size if total_size else 0))
+    if mismatches:
+        sys.exit(1)
+
+
+def get_dag(corpus, name):
+    try:
+        return corpus.get(name)
+    except KeyError:
+        print('Fatal: No DAG named {} in the corpus.'.format(name))
+        sys.exit(1)
+
+
+def unpack(args):
+    if not os.path.exists(args.outdir):
+        os.makedirs(args.outdir)
+    with Corpus(args.corpus) as corpus:
+        names = args.names if args.names else corpus.names()
+        count = 0
+        for name in names:
+            with open(os.path.join(args.outdir, dump_filename(name)), 'w') as f:
+                f.write(format_ddg(get_dag(corpus, name)))
+            count += 1
+    print('Wrote {} DDGs to {}'.format(count, args.outdir))
+
+
+def list_corpus(args):
+    with Corpus(args.corpus) as corpus:
+        for name in corpus.names():
+            print('{:<50} {:>6} nodes {:>8} edges'.format(name, *corpus.counts(name)))
+
+
+def show(args):
+    with Corpus(args.corpus) as corpus:
+        for name in args.names:
+            sys.stdout.write(format_ddg(get_dag(corpus, name)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pack DDG dumps into a single corpus file and back.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    pack_parser = subparsers.add_parser('pack', help='Pack .ddg files into a corpus.')
+    pack_parser.add_argument('dumps', nargs='+', help='The .ddg files or DUMP_DDGS directories.')
+    pack_parser.add_argument('-o', '--output', required=True, help='The corpus file to write.')
+    pack_parser.add_argument('--verify', action='store_true',
+                             help='Check that every file can be written back exactly.')
+    pack_parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                             help='The number of parser processes (default: %(default)s).')
+    pack_parser.set_defaults(func=pack)
+
+    unpack_parser = subparsers.add_parser('unpack', help='Write the DAGs of a corpus back to .ddg files.')
+    unpack_parser.add_argument('corpus', help='The corpus file.')
+    unpack_parser.add_argument('names', nargs='*', help='The DAGs to unpack (default: all).')
+    unpack_parser.add_argument('-o', '--outdir', default='./', help='Where to write the files (default: %(default)s).')
+    unpack_parser.set_defaults(func=unpack)
+
+    list_parser = subparsers.add_parser('list', help='List the DAGs in a corpus.')
+    list_parser.add_argument('corpus', help='The corpus file.')
+    list_parser.set_defaults(func=list_corpus)
+
+    show_parser = subparsers.add_parser('show', help='Print DAGs from a corpus.')
+    show_parser.add_argument('corpus', help='The corpus file.')
+    show_parser.add_argument('names', nargs='+', help='The DAGs to print.')
+    show_parser.set_defaults(func=show)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+'''
+Structural features of the DDGs written with `DUMP_DDGS`, joined with the
+scheduling outcome of each region from the scheduler's log.
+
+Every dump is parsed (in parallel) and reduced to per-DAG features: node and
+edge counts, critical path length, the width of the ASAP schedule, slack,
+degrees, the latency histogram and the mix of dependence types. With --logs,
+each DAG is matched to its region in the logs by its dag_id, and its outcome
+and time are taken from the block of the region's first pass. The dumps are
+named by dag_id alone, so a dag_id logged by several benchmarks can not be
+matched and is left out. For the regions that were enumerated, every feature is ranked by how well it
+separates the regions that timed out from those solved optimally: the AUC of
+the feature as a timeout predictor, and the best single threshold on it.
+
+Dumps taken after graph transformations (`<dag id>.<transformation>.ddg`)
+are skipped unless --transformed is given, in which case only they are used.
+
+Example:
+    ./ddg-features.py ddg-dumps/ --logs logs/ -o features.csv
+'''
+
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ddg import DEP_TYPES, find_ddg_files, is_transformed_dump, read_ddg
+from readlogs import block_outcome, read_region_passes
+
+# Upper bounds (inclusive) of the latency histogram buckets.
+LATENCY_BUCKETS = (0, 1, 3, 7, 15)
+
+
+def latency_bucket_names():
+    names = []
+    low = 0
+    for high in LATENCY_BUCKETS:
+        names.append('lat_{}'.format(low) if low == high else 'lat_{}_{}'.format(low, high))
+        low = high + 1
+    names.append('lat_{}_plus'.format(low))
+    return names
+
+
+FEATURES = ['nodes', 'edges', 'edges_per_node', 'critical_path', 'max_width', 'avg_parallelism',
+            'zero_slack_fraction', 'mean_slack', 'max_out_degree', 'max_in_degree'] + \
+    latency_bucket_names() + ['dep_' + t for t in DEP_TYPES]
+
+
+def dag_features(dag):
+    nodes = dag.node_count
+    edges = dag.edge_count
+    asap = dag.asap_cycles()
+    critical_path = max(asap) if nodes else 0
+    alap = dag.alap_cycles(critical_path)
+    slack = [late - early for early, late in zip(asap, alap)]
+
+    width = {}
+    for cycle in asap:
+        width[cycle] = width.get(cycle, 0) + 1
+
+    out_offsets, _ = dag.successors()
+    in_offsets, _ = dag.predecessors()
+
+    features = {
+        'nodes': nodes,
+        'edges': edges,
+        'edges_per_node': edges / nodes if nodes else 0.0,
+        'critical_path': critical_path,
+        'max_width': max(width.values()) if width else 0,
+        'avg_parallelism': nodes / (critical_path + 1.0),
+        'zero_slack_fraction': sum(1 for s in slack if s == 0) / nodes if nodes else 0.0,
+        'mean_slack': sum(slack) / nodes if nodes else 0.0,
+        'max_out_degree': max(out_offsets[n + 1] - out_offsets[n] for n in range(nodes)) if nodes else 0,
+        'max_in_degree': max(in_offsets[n + 1] - in_offsets[n] for n in range(nodes)) if nodes else 0,
+    }
+
+    histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+    for latency in dag.edge_latencies:
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        histogram[bucket] += 1
+    for name, count in zip(latency_bucket_names(), histogram):
+        features[name] = count / edges if edges else 0.0
+
+    types = [0] * len(DEP_TYPES)
+    for t in dag.edge_types:
+        types[t] += 1
+    for name, count in zip(DEP_TYPES, types):
+        features['dep_' + name] = count / edges if edges else 0.0
+
+    return features
+
+
+def analyse_file(job):
+    path, transformed = job
+    try:
+        dag = read_ddg(path)
+    except (IOError, ValueError) as error:
+        return path, None, str(error)
+    if is_transformed_dump(path, dag) != transformed:
+        return path, None, None
+    return path, dag.dag_id, dag_features(dag)
+
+
+def auc(positives, negatives):
+    '''
+    The probability that a random positive has a larger value than a random
+    negative (Mann-Whitney U / (n_pos * n_neg)), counting ties as half.
+    '''
+    values = sorted([(v, 1) for v in positives] + [(v, 0) for v in negatives])
+    rank_sum = 0.0
+    i = 0
+    while i < len(values):
+        j = i
+        while j < len(values) and values[j][0] == values[i][0]:
+            j += 1
+        average_rank = (i + j + 1) / 2.0
+        rank_sum += average_rank * sum(label for _, label in values[i:j])
+        i = j
+    n_pos = len(positives)
+    n_neg = len(negatives)
+    return (rank_sum - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg)
+
+
+def best_threshold(positives, negatives, larger):
+    '''
+    Returns (threshold, balanced accuracy) of the best rule
+    `value >= threshold` (or `<=` when not `larger`) for predicting a positive.
+    '''
+    sign = 1 if larger else -1
+    values = sorted(set(sign * v for v in positives + negatives))
+    positives = sorted(sign * v for v in positives)
+    negatives = sorted(sign * v for v in negatives)
+    best = (None, 0.0)
+    p = n = 0
+    # Sweep the thresholds from the smallest; p and n count the values below.
+    for threshold in values:
+        while p < len(positives) and positives[p] < threshold:
+            p += 1
+        while n < len(negatives) and negatives[n] < threshold:
+            n += 1
+        recall = (len(positives) - p) / len(positives)
+        specificity = n / len(negatives)
+        accuracy = (recall + specificity) / 2
+        if accuracy > best[1]:
+            best = (sign * threshold, accuracy)
+    return best
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def report_predictors(rows):
+    timeouts = [row for row in rows if row.get('outcome') == 'timeout']
+    solved = [row for row in rows if row.get('outcome') == 'optimal']
+    print('\n{} enumerated regions: {} timed out, {} solved optimally.'.format(
+        len(timeouts) + len(solved), len(timeouts), len(solved)))
+    if not timeouts or not solved:
+        print('Need both timeouts and optimal regions to rank predictors.')
+        return
+
+    ranked = []
+    for feature in FEATURES:
+        positives = [row[feature] for row in timeouts]
+        negatives = [row[feature] for row in solved]
+        area = auc(positives, negatives)
+        threshold, accuracy = best_threshold(positives, negatives, area >= 0.5)
+        ranked.append((abs(area - 0.5), feature, area, median(positives), median(negatives),
+                       '>=' if area >= 0.5 else '<=', threshold, accuracy))
+    ranked.sort(reverse=True)
+
+    print('{:<22} {:>6} {:>14} {:>14}   {:<16} {:>9}'.format(
+        'Feature', 'AUC', 'Median timeout', 'Median optimal', 'Best rule', 'Bal. acc.'))
+    for _, feature, area, timeout_median, solved_median, op, threshold, accuracy in ranked:
+        print('{:<22} {:>6.3f} {:>14.3f} {:>14.3f}   {:<16} {:>9.1%}'.format(
+            feature, area, timeout_median, solved_median, '{} {:.4g}'.format(op, threshold), accuracy))
+
+
+def main(args):
+    files = find_ddg_files(args.dumps)
+    jobs = [(path, args.transformed) for path in files]
+    dags = {}
+    errors = 0
+    pool = multiprocessing.Pool(args.jobs)
+    try:
+        for path, dag_id, result in pool.imap_unordered(analyse_file, jobs, chunksize=64):
+            if dag_id is None:
+                if result is not None:
+                    errors += 1
+                    print('WARNING: Could not parse {}: {}'.format(path, result))
+                continue
+            dags[dag_id] = result
+    finally:
+        pool.close()
+        pool.join()
+    print('Analysed {} DAGs from {} files ({} errors).'.format(len(dags), len(files), errors))
+
+    # dict[region name --> list[(benchmark, (events, metrics) of the first pass)]]
+    regions = {}
+    if args.logs:
+        for (benchmark, name), passes in read_region_passes(args.logs).items():
+            first = passes[min(passes, key=lambda num: num or 0)]
+            regions.setdefault(name, []).append((benchmark, first))
+        matched = sum(1 for dag_id in dags if len(regions.get(dag_id, [])) == 1)
+        ambiguous = sum(1 for dag_id in dags if len(regions.get(dag_id, [])) > 1)
+        print('Matched {} DAGs with regions in the logs, {} are logged by several benchmarks.'.format(
+            matched, ambiguous))
+
+    rows = []
+    for dag_id in sorted(dags):
+        row = {'region': dag_id}
+        row.update(dags[dag_id])
+        if len(regions.get(dag_id, [])) == 1:
+            benchmark, (events, metrics) = regions[dag_id][0]
+            row['benchmark'] = benchmark
+            row['outcome'] = block_outcome(events)
+            row['time'] = metrics['time']
+            if 'DagSolvedOptimally' in events:
+                row['solution_time'] = events['DagSolvedOptimally']['solution_time']
+        rows.append(row)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, ['benchmark', 'region', 'outcome', 'time', 'solution_time'] + FEATURES,
+                                    restval='')
+            writer.writeheader()
+            writer.writerows(rows)
+        print('Wrote {}'.format(args.output))
+
+    if args.logs:
+        report_predictors(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Structural DDG features and timeout predictors.')
+    parser.add_argument('dumps', nargs='+', help='The .ddg files or DUMP_DDGS directories.')
+    parser.add_argument('-l', '--logs', nargs='+', help='The scheduler logs of the build that wrote the dumps.')
+    parser.add_argument('-o', '--output', help='Where to write the features of every DAG as CSV.')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of parser processes (default: %(default)s).')
+    parser.add_argument('--transformed', action='store_true',
+                        help='Analyse the dumps taken after graph transformations instead.')
+
+    main(parser.parse_args())
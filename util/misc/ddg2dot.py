@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 import argparse
+import os
 import sys
-import re
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ddg import DEP_TYPES, parse_ddg
 
 parser = argparse.ArgumentParser(description='Convert data_dep WriteToFile format to a .dot file')
 parser.add_argument('input', help='The WriteToFile format file to convert. Input a single hyphen (-) to read from stdin')
@@ -10,41 +13,180 @@ parser.add_argument('--filter-weights', nargs='*', default=[], help='filter out
 parser.add_argument(
     '--base', help='Consider the edges from this other .ddg when layouting. Those edges will be made invisible.')
 
-args = parser.parse_args()
+extract = parser.add_argument_group(
+    'subgraph extraction', 'Only show part of the graph. The selections of several options are combined.')
+extract.add_argument('--critical-path', type=int, metavar='K', default=None,
+                     help='the nodes on a critical path (no slack) and their neighbours up to K edges away')
+extract.add_argument('--ancestors', type=int, nargs='+', metavar='NODE', default=[],
+                     help='the given nodes and everything they depend on')
+extract.add_argument('--descendants', type=int, nargs='+', metavar='NODE', default=[],
+                     help='the given nodes and everything that depends on them')
+extract.add_argument('--reduce-order-edges', action='store_true',
+                     help='drop non-data edges which are implied by another path (ignoring latencies)')
+extract.add_argument('--collapse-chains', type=int, nargs='?', const=3, default=None, metavar='N',
+                     help='merge chains of at least N nodes (%(const)s if not given) linked by single latency-0 '
+                          'edges into one node')
 
-if args.input == '-':
-    infile = sys.stdin
-else:
-    infile = open(args.input, 'r')
 
-filtered_weights = set(int(x) for x in args.filter_weights)
+class Graph:
+    '''
+    The displayed graph: a set of nodes and a list of (from, to, type, latency)
+    edges, with adjacency lists built on demand.
+    '''
 
-text = infile.read()
-infile.close()
+    def __init__(self, nodes, edges):
+        self.nodes = nodes
+        self.edges = edges
 
-if args.base:
-    with open(args.base) as f:
-        basetext = f.read()
-else:
-    basetext = ''
+    def adjacency(self):
+        succs = {n: [] for n in self.nodes}
+        preds = {n: [] for n in self.nodes}
+        for i, (from_, to, _, _) in enumerate(self.edges):
+            succs[from_].append(i)
+            preds[to].append(i)
+        return succs, preds
 
-NODE_RE = re.compile(r'node (?P<number>\d+) "(?P<name>.*?)"(\s*"(?P<other_name>.*?)")?')
-EDGE_RE = re.compile(r'dep (?P<from>\d+) (?P<to>\d+) "(?P<type>.*?)" (?P<weight>\d+)')
 
-# Holds the resulting strings as a list of the lines.
-result = ['digraph G {\n']
+def load_graph(dag):
+    edges = [(dag.edge_from[e], dag.edge_to[e], DEP_TYPES[dag.edge_types[e]], dag.edge_latencies[e])
+             for e in range(dag.edge_count)]
+    return Graph(set(range(dag.node_count)), edges)
+
+
+def reachable(starts, step):
+    seen = set(starts)
+    stack = list(starts)
+    while stack:
+        node = stack.pop()
+        for next_ in step(node):
+            if next_ not in seen:
+                seen.add(next_)
+                stack.append(next_)
+    return seen
+
+
+def select_nodes(dag, graph, args):
+    '''
+    Returns the nodes selected by the extraction options, or all of them.
+    '''
+    if args.critical_path is None and not args.ancestors and not args.descendants:
+        return graph.nodes
+
+    succs, preds = graph.adjacency()
+    selected = set()
+    # An empty DAG has no critical path.
+    if args.critical_path is not None and graph.nodes:
+        asap = dag.asap_cycles()
+        alap = dag.alap_cycles(max(asap))
+        frontier = {n for n in graph.nodes if asap[n] == alap[n]}
+        selected |= frontier
+        for _ in range(args.critical_path):
+            # The entry and exit nodes neighbour everything, don't expand them.
+            frontier = {n for n in frontier if dag.names[n] != 'artificial'}
+            frontier = {graph.edges[e][1] for n in frontier for e in succs[n]} | \
+                       {graph.edges[e][0] for n in frontier for e in preds[n]}
+            frontier -= selected
+            selected |= frontier
+    if args.ancestors:
+        selected |= reachable(args.ancestors, lambda n: (graph.edges[e][0] for e in preds[n]))
+    if args.descendants:
+        selected |= reachable(args.descendants, lambda n: (graph.edges[e][1] for e in succs[n]))
+    return selected
+
+
+def induced_subgraph(graph, nodes):
+    return Graph(nodes, [edge for edge in graph.edges if edge[0] in nodes and edge[1] in nodes])
+
+
+def topological_order(graph):
+    succs, preds = graph.adjacency()
+    in_degree = {n: len(preds[n]) for n in graph.nodes}
+    ready = [n for n in graph.nodes if in_degree[n] == 0]
+    order = []
+    while ready:
+        node = ready.pop()
+        order.append(node)
+        for e in succs[node]:
+            to = graph.edges[e][1]
+            in_degree[to] -= 1
+            if in_degree[to] == 0:
+                ready.append(to)
+    return order
+
+
+def reduce_order_edges(graph):
+    '''
+    Drops the non-data edges (from, to) where `to` can also be reached through
+    another successor of `from`.
+    '''
+    succs, _ = graph.adjacency()
+    # Descendants of every node as a bitset, computed from the leaves up.
+    descendants = {}
+    for node in reversed(topological_order(graph)):
+        bits = 0
+        for e in succs[node]:
+            to = graph.edges[e][1]
+            bits |= descendants[to] | (1 << to)
+        descendants[node] = bits
+
+    kept = []
+    for from_ in graph.nodes:
+        targets = [graph.edges[e][1] for e in succs[from_]]
+        for e in succs[from_]:
+            to, type_ = graph.edges[e][1], graph.edges[e][2]
+            implied = type_ != 'data' and any(
+                other != to and descendants[other] >> to & 1 for other in targets)
+            if not implied:
+                kept.append(graph.edges[e])
+    return Graph(graph.nodes, kept)
 
-# Create the nodes in the graph
-for match in NODE_RE.finditer(text):
-    num = match['number']
-    name = match['name']
-    if name == 'artificial':  # Prettify entry/exit names
-        name = ['exit', 'entry'][match['other_name'] == '__optsched_entry']
 
-    # Add the node to the graph. Include a node to make it clear what this is
-    result.append(f'    n{num} [label="{name}:n{num}"];\n')
+def collapse_chains(graph, labels, min_length=2):
+    '''
+    Merges every chain a -> b -> ... of at least `min_length` nodes where each
+    link is the only edge out of its source and into its target and has
+    latency 0. The chain is shown as its first node. Returns the new graph and
+    updates the labels.
+    '''
+    succs, preds = graph.adjacency()
 
-result.append('\n')
+    def links_to_next(node):
+        if len(succs[node]) != 1:
+            return None
+        from_, to, _, latency = graph.edges[succs[node][0]]
+        if latency != 0 or len(preds[to]) != 1:
+            return None
+        return to
+
+    # The chain head each node is merged into.
+    head = {}
+    for node in topological_order(graph):
+        if node in head:
+            continue
+        chain = [node]
+        next_ = links_to_next(node)
+        while next_ is not None:
+            chain.append(next_)
+            next_ = links_to_next(next_)
+        if len(chain) < max(min_length, 2):
+            # Too short to collapse; its members may not start a longer one.
+            for member in chain:
+                head[member] = member
+            continue
+        for member in chain:
+            head[member] = node
+        labels[node] = '{}..{} ({} nodes)'.format(labels[chain[0]], labels[chain[-1]], len(chain))
+
+    edges = [(head[from_], head[to], type_, latency) for from_, to, type_, latency in graph.edges
+             if head[from_] != head[to]]
+    return Graph(set(head.values()), edges)
+
+
+def node_label(dag, num):
+    name = dag.names[num]
+    if name == 'artificial':  # Prettify entry/exit names
+        name = 'entry' if num == 0 or dag.opcodes[num] == '__optsched_entry' else 'exit'
+    return f'{name}:n{num}'
 
 
 def create_edge_attrs(**attrs):
@@ -57,7 +199,7 @@ def create_edge_attrs(**attrs):
 def create_label(filtered_weights, weight, type_):
     # The additional label text if we want to display the weight
     # (that is, if the weight is not filtered out)
-    weight_label = '' if int(weight) in filtered_weights else ':' + weight
+    weight_label = '' if int(weight) in filtered_weights else f':{weight}'
     # The actual label text
     return weight_label if type_ == 'data' else f'{type_}{weight_label}'
 
@@ -66,45 +208,73 @@ def create_edge(from_, to, **attrs):
     return f'    n{from_} -> n{to}{create_edge_attrs(**attrs)};\n'
 
 
-edges = set()
+def main(args):
+    if args.input == '-':
+        infile = sys.stdin
+    else:
+        infile = open(args.input, 'r')
 
-# Create the edges in the graph
-for match in EDGE_RE.finditer(text):
-    from_ = match['from']
-    to = match['to']
-    type_ = match['type']
-    weight = match['weight']
+    filtered_weights = set(int(x) for x in args.filter_weights)
 
-    result.append(
-        create_edge(
-            from_, to,
-            label=create_label(filtered_weights, weight, type_),
-        )
-    )
-    edges.add((from_, to))
+    text = infile.read()
+    infile.close()
+
+    dag = parse_ddg(text)
+    graph = load_graph(dag)
+    graph = induced_subgraph(graph, select_nodes(dag, graph, args))
+    if args.reduce_order_edges:
+        graph = reduce_order_edges(graph)
+    labels = {num: node_label(dag, num) for num in graph.nodes}
+    if args.collapse_chains is not None:
+        graph = collapse_chains(graph, labels, args.collapse_chains)
 
-for match in EDGE_RE.finditer(basetext):
-    from_ = match['from']
-    to = match['to']
-    type_ = match['type']
-    weight = match['weight']
+    # Holds the resulting strings as a list of the lines.
+    result = ['digraph G {\n']
 
-    if (from_, to) not in edges:
+    # Create the nodes in the graph
+    for num in sorted(graph.nodes):
+        # Add the node to the graph. Include a node to make it clear what this is
+        result.append(f'    n{num} [label="{labels[num]}"];\n')
+
+    result.append('\n')
+
+    edges = set()
+
+    # Create the edges in the graph
+    for from_, to, type_, weight in graph.edges:
         result.append(
             create_edge(
                 from_, to,
                 label=create_label(filtered_weights, weight, type_),
-                style="invis",
             )
         )
+        edges.add((from_, to))
+
+    if args.base:
+        with open(args.base) as f:
+            base = load_graph(parse_ddg(f.read()))
+        # Only the part of the base graph between the displayed nodes.
+        for from_, to, type_, weight in induced_subgraph(base, graph.nodes).edges:
+            if (from_, to) not in edges:
+                result.append(
+                    create_edge(
+                        from_, to,
+                        label=create_label(filtered_weights, weight, type_),
+                        style="invis",
+                    )
+                )
+
+    # Graph is now finished:
+    result.append('}\n')
+
+    filecontents = ''.join(result)
 
-# Graph is now finished:
-result.append('}\n')
+    if args.output:
+        with open(args.output, 'w') as f:
+            print(filecontents, file=f)
+    else:
+        print(filecontents)
 
-filecontents = ''.join(result)
 
-if args.output:
-    with open(args.output, 'w') as f:
-        print(filecontents, file=f)
-else:
-    print(filecontents)
+if __name__ == '__main__':
+    main(parser.parse_args())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+'''
+Report the cost and benefit of the node superiority graph transformations
+(STATIC_NODE_SUPERIORITY, MULTI_PASS_NODE_SUPERIORITY and
+STATIC_NODE_SUPERIORITY_ILP) per region size class.
+
+The cost of a transformation is the processor time between its start and
+finish events, and its effect the superior edges it added. For every size
+class the report gives the time spent in the transformations, the edges they
+added, and how the edges relate to the enumeration: the rank correlation of
+the edges per instruction with the nodes examined, and the solve rate of the
+regions with and without added edges.
+
+Whether the transformations pay for themselves can only be told against a run
+without them: with `--baseline`, the regions are matched by their benchmark
+(the name of the log file) and name, and a class
+pays when its regions take less time in total (including the
+transformations) without solving fewer of them. The report ends with the
+classes in which to enable the transformations.
+
+Example:
+    ./graph-trans-report.py logs-with-trans/ --baseline logs-without-trans/
+'''
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import block_duration, block_pass, log_benchmark, read_logs, size_class, size_class_key
+from readlogs import profiling
+
+# (start event, finish event) of every transformation.
+TRANSFORMATIONS = {
+    'static': ('GraphTransRPNodeSuperiority', 'GraphTransRPNodeSuperiorityFinished'),
+    'multi_pass': ('MultiPassGraphTransRPNodeSuperiority', 'MultiPassGraphTransRPNodeSuperiorityFinished'),
+    'ilp': ('GraphTransILPNodeSuperiority', 'GraphTransILPNodeSuperiorityFinished'),
+}
+
+
+def next_event_time(events, start):
+    '''
+    The time of the first event after `start` which is not part of a
+    transformation, for logs without the finish event of the multi-pass
+    transformation.
+    '''
+    ignored = set(event for pair in TRANSFORMATIONS.values() for event in pair)
+    times = [e['time'] for event_id, event in events.items() if event_id not in ignored
+             for e in event if e['time'] >= start]
+    return min(times) if times else start
+
+
+def transformation_costs(events):
+    '''
+    Returns `dict[transformation --> (time in ms, superior edges)]` of the
+    transformations applied in a block.
+    '''
+    result = {}
+    for name, (start_id, finish_id) in TRANSFORMATIONS.items():
+        starts = events.get(start_id, [])
+        finishes = events.get(finish_id, [])
+        if not starts:
+            continue
+        time = 0
+        edges = 0
+        for i, start in enumerate(starts):
+            if i < len(finishes):
+                time += finishes[i]['time'] - start['time']
+                edges += finishes[i]['superior_edges']
+            else:
+                time += next_event_time(events, start['time']) - start['time']
+        result[name] = (time, edges)
+    return result
+
+
+def read_regions(paths, jobs=None):
+    '''
+    Returns `dict[(benchmark, region name) --> dict]` with the size,
+    transformation time and edges, enumeration nodes, outcome and time of every
+    region, adding up the passes of two-pass scheduling (see block_pass()). A
+    function compiled more than once logs its regions again; only the first
+    block of a region in each pass is counted.
+    '''
+    regions = {}
+    for path, blocks in read_logs(paths, jobs):
+        benchmark = log_benchmark(path)
+        for events in blocks:
+            if 'ProcessDag' not in events:
+                continue
+            dag = events['ProcessDag'][0]
+            region = regions.setdefault((benchmark, dag['name']), {
+                'size': dag['num_instructions'], 'trans_time': 0, 'edges': 0, 'transformed': False,
+                'nodes': 0, 'enumerated': False, 'solved': True, 'time': 0, 'passes': set(),
+            })
+            num = block_pass(events)
+            if num in region['passes']:
+                continue
+            region['passes'].add(num)
+            for time, edges in transformation_costs(events).values():
+                region['transformed'] = True
+                region['trans_time'] += time
+                region['edges'] += edges
+            region['nodes'] += sum(e['num_nodes'] for e in events.get('NodeExamineCount', []))
+            if 'DagSolvedOptimally' in events or 'DagTimedOut' in events:
+                region['enumerated'] = True
+                region['solved'] = region['solved'] and 'DagTimedOut' not in events
+            region['time'] += block_duration(events)
+    return regions
+
+
+def ranks(values):
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    result = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            result[order[k]] = (i + j) / 2.0
+        i = j + 1
+    return result
+
+
+def spearman(xs, ys):
+    '''
+    The rank correlation of two lists, None if it is undefined.
+    '''
+    if len(xs) < 3:
+        return None
+    rx, ry = ranks(xs), ranks(ys)
+    mx, my = sum(rx) / len(rx), sum(ry) / len(ry)
+    cov = sum((a - mx) * (b - my) for a, b in zip(rx, ry))
+    vx = sum((a - mx) ** 2 for a in rx)
+    vy = sum((b - my) ** 2 for b in ry)
+    return cov / (vx * vy) ** 0.5 if vx and vy else None
+
+
+def solve_rate(regions):
+    enumerated = [r for r in regions if r['enumerated']]
+    return float(sum(r['solved'] for r in enumerated)) / len(enumerated) if enumerated else None
+
+
+def format_rate(rate):
+    return '{:.1%}'.format(rate) if rate is not None else '-'
+
+
+def format_corr(corr):
+    return '{:+.2f}'.format(corr) if corr is not None else '-'
+
+
+def main(args):
+    with profiling.phase('aggregate'):
+        regions = read_regions(args.logs, args.jobs)
+    if not any(r['transformed'] for r in regions.values()):
+        print('Fatal: No graph transformation events in the logs.')
+        sys.exit(1)
+    with profiling.phase('aggregate'):
+        baseline = read_regions(args.baseline, args.jobs) if args.baseline else None
+
+    bounds = sorted(args.classes)
+    classes = {}
+    for key, region in regions.items():
+        classes.setdefault(size_class(region['size'], bounds), []).append((key, region))
+
+    print('{:<12} {:>7} {:>12} {:>7} {:>10} {:>11} {:>11} {:>12} {:>12}'.format(
+        'Size class', 'Regions', 'Trans. time', 'Share', 'Edges/rgn', 'With edges', 'Corr(nodes)',
+        'Solved w/ e.', 'Solved w/o e.'))
+    for label in sorted(classes, key=size_class_key):
+        members = [region for _, region in classes[label]]
+        trans_time = sum(r['trans_time'] for r in members)
+        total_time = sum(r['time'] for r in members)
+        with_edges = [r for r in members if r['edges'] > 0]
+        enumerated = [r for r in members if r['enumerated']]
+        corr = spearman([float(r['edges']) / r['size'] for r in enumerated], [r['nodes'] for r in enumerated])
+        print('{:<12} {:>7} {:>9} ms {:>6.1%} {:>10.1f} {:>11} {:>11} {:>12} {:>12}'.format(
+            label, len(members), trans_time, float(trans_time) / total_time if total_time else 0.0,
+            float(sum(r['edges'] for r in members)) / len(members), len(with_edges), format_corr(corr),
+            format_rate(solve_rate(with_edges)),
+            format_rate(solve_rate([r for r in members if r['edges'] == 0]))))
+
+    print('\nShare: the transformation time as a part of the region time.')
+    print('Corr(nodes): rank correlation of the edges per instruction with the nodes examined, '
+          'over the enumerated regions.')
+
+    if baseline is None:
+        print('\nGive a run without the transformations as --baseline to tell where they pay for themselves.')
+        return
+
+    print('\nAgainst the baseline (regions in both runs):')
+    print('{:<12} {:>7} {:>14} {:>14} {:>12} {:>12} {:>14} {:>8}'.format(
+        'Size class', 'Regions', 'Nodes before', 'Nodes after', 'Solved bef.', 'Solved aft.', 'Net time', 'Pays'))
+    paying = []
+    for label in sorted(classes, key=size_class_key):
+        matched = [(baseline[key], region) for key, region in classes[label] if key in baseline]
+        if not matched:
+            continue
+        before = [b for b, _ in matched]
+        after = [a for _, a in matched]
+        net_time = sum(r['time'] for r in after) - sum(r['time'] for r in before)
+        solved_before = solve_rate(before)
+        solved_after = solve_rate(after)
+        pays = net_time < 0 and (solved_before is None or (solved_after or 0.0) >= solved_before)
+        if pays:
+            paying.append(label)
+        print('{:<12} {:>7} {:>14} {:>14} {:>12} {:>12} {:>+11} ms {:>8}'.format(
+            label, len(matched), sum(r['nodes'] for r in before), sum(r['nodes'] for r in after),
+            format_rate(solved_before), format_rate(solved_after), net_time, 'yes' if pays else 'no'))
+
+    print('\nNet time: the change of the region time, including the transformations.')
+    if paying:
+        print('The transformations pay for themselves for regions of {} instructions.'.format(', '.join(paying)))
+    else:
+        print('The transformations do not pay for themselves in any size class.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report the cost and benefit of the graph transformations.')
+    parser.add_argument('logs', nargs='+', help='The scheduler logs of a run with the transformations, '
+                                                'or directories of .log files.')
+    parser.add_argument('--baseline', nargs='+', help='The logs of the same code scheduled without the '
+                                                      'transformations.')
+    parser.add_argument('--classes', type=int, nargs='+', default=[50, 100, 200, 500, 1000],
+                        help='The region sizes (in instructions) at which the classes start '
+                             '(default: %(default)s).')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of log files to parse at once (default: %(default)s).')
+    profiling.add_profile_option(parser)
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable_profiling()
+    with profiling.phase('report'):
+        main(args)
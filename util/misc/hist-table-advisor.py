@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+'''
+Recommend the HIST_TABLE_HASH_BITS setting from the HistTableStats events of
+scheduler logs.
+
+Every region which is enumerated with history domination logs the size of its
+history table: the entries and populated buckets of the fullest table, the
+longest chain, the lookups and domination hits and an estimate of the memory.
+The regions are grouped into classes by their number of instructions, and for
+every class the advisor recommends the fewest hash bits which keep the load
+(entries per bucket) of the `--percentile` region of the class under
+`--max-load`. Fewer bits save the bucket arrays, which are allocated for every
+enumerated region whether they are used or not.
+
+When the chains are much longer than hashing the entries at random would
+give, the signatures of the entries collide rather than their buckets, and
+more bits do not make the lookups faster.
+
+Example:
+    ./hist-table-advisor.py logs/ --classes 50 100 200 400
+'''
+
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import keep_only_first_event, read_logs, size_class, size_class_key
+from readlogs import profiling
+
+# The signature has 31 usable bits, a larger table cannot be addressed.
+MAX_HASH_BITS = 31
+# The bytes of the bucket arrays per bucket: the first and last entry
+# pointers and the list size.
+BUCKET_BYTES = 20
+
+
+def read_regions(paths, jobs=None):
+    '''
+    Returns `list[(name, num_instructions, HistTableStats event)]` of the
+    blocks which logged history table statistics.
+    '''
+    regions = []
+    for _, blocks in read_logs(paths, jobs):
+        for events in blocks:
+            events = keep_only_first_event(events)
+            if 'ProcessDag' not in events or 'HistTableStats' not in events:
+                continue
+            dag = events['ProcessDag']
+            regions.append((dag['name'], dag['num_instructions'], events['HistTableStats']))
+    return regions
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(math.ceil(p / 100.0 * len(values))) - 1)]
+
+
+def ideal_chain(load):
+    '''
+    The mean chain length of the populated buckets when `load` entries per
+    bucket are hashed at random.
+    '''
+    return load / (1 - math.exp(-load)) if load > 0 else 1.0
+
+
+def recommend_bits(entries, max_load):
+    if entries <= 0:
+        return 1
+    return max(1, min(MAX_HASH_BITS, int(math.ceil(math.log(entries / max_load, 2)))))
+
+
+def advise(stats, args):
+    entries = [s['entries'] for s in stats]
+    populated = sum(s['populated_buckets'] for s in stats)
+    lookups = sum(s['lookups'] for s in stats)
+    hash_bits = max(s['hash_bits'] for s in stats)
+    target = percentile(entries, args.percentile)
+    mean_chain = float(sum(entries)) / populated if populated else 0.0
+    mean_load = float(sum(entries)) / sum(s['buckets'] for s in stats)
+    bits = recommend_bits(target, args.max_load)
+    return {
+        'regions': len(stats),
+        'entries': target,
+        'mean_chain': mean_chain,
+        'ideal_chain': ideal_chain(mean_load),
+        'max_chain': max(s['max_chain'] for s in stats),
+        'traversed': float(sum(s['traversed_entries'] for s in stats)) / lookups if lookups else 0.0,
+        'hit_rate': float(sum(s['domination_hits'] for s in stats)) / lookups if lookups else 0.0,
+        'memory': max(s['memory_bytes'] for s in stats),
+        'hash_bits': hash_bits,
+        'bits': bits,
+        'saved': ((1 << hash_bits) - (1 << bits)) * BUCKET_BYTES,
+    }
+
+
+def format_bytes(n):
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(n) < 1024:
+            return '{:.0f} {}'.format(n, unit)
+        n /= 1024.0
+    return '{:.1f} GiB'.format(n)
+
+
+def main(args):
+    with profiling.phase('aggregate'):
+        regions = read_regions(args.logs, args.jobs)
+    if not regions:
+        print('Fatal: No HistTableStats events in the logs. Enumerate with history domination enabled.')
+        sys.exit(1)
+
+    bounds = sorted(args.classes)
+    classes = {}
+    for _, num_instructions, stats in regions:
+        classes.setdefault(size_class(num_instructions, bounds), []).append(stats)
+
+    print('{:<12} {:>7} {:>10} {:>10} {:>10} {:>9} {:>10} {:>8} {:>11} {:>5} {:>5} {:>11}'.format(
+        'Size class', 'Regions', 'Entries', 'Mean chain', 'Ideal', 'Max chain', 'Traversed', 'Hits',
+        'Max memory', 'Bits', 'Rec.', 'Saved'))
+    advice = {}
+    for label in sorted(classes, key=size_class_key):
+        row = advise(classes[label], args)
+        advice[label] = row
+        print('{:<12} {:>7} {:>10} {:>10.2f} {:>10.2f} {:>9} {:>10.2f} {:>7.1%} {:>11} {:>5} {:>5} {:>11}'.format(
+            label, row['regions'], row['entries'], row['mean_chain'], row['ideal_chain'], row['max_chain'],
+            row['traversed'], row['hit_rate'], format_bytes(row['memory']), row['hash_bits'], row['bits'],
+            format_bytes(row['saved'])))
+
+    print('\nEntries: the entries of the {}th percentile region of the class.'.format(args.percentile))
+    print('Ideal: the mean chain length if the entries were hashed at random.')
+    print('Rec.: the fewest hash bits which keep its load at most {} entries per bucket.'.format(args.max_load))
+
+    collisions = [label for label, row in advice.items() if row['mean_chain'] > args.collision_factor * row['ideal_chain']]
+    if collisions:
+        print('\nThe chains of {} are much longer than ideal: their signatures collide, more hash bits will '
+              'not shorten them.'.format(', '.join(sorted(collisions, key=size_class_key))))
+
+    # HIST_TABLE_HASH_BITS applies to every region, so it has to suit the
+    # largest class which enumerates.
+    overall = max(row['bits'] for row in advice.values())
+    print('\nRecommended HIST_TABLE_HASH_BITS for all regions: {} (now {})'.format(
+        overall, max(row['hash_bits'] for row in advice.values())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recommend history table hash bits per region size class.')
+    parser.add_argument('logs', nargs='+', help='The scheduler logs, or directories of .log files.')
+    parser.add_argument('--classes', type=int, nargs='+', default=[50, 100, 200, 500, 1000],
+                        help='The region sizes (in instructions) at which the classes start '
+                             '(default: %(default)s).')
+    parser.add_argument('--percentile', type=float, default=90,
+                        help='The region of a class to size the table for (default: %(default)s).')
+    parser.add_argument('--max-load', type=float, default=1.0,
+                        help='The most entries per bucket to allow (default: %(default)s).')
+    parser.add_argument('--collision-factor', type=float, default=2.0,
+                        help='How much longer than ideal the chains may be before the signatures are '
+                             'reported as colliding (default: %(default)s).')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of log files to parse at once (default: %(default)s).')
+    profiling.add_profile_option(parser)
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable_profiling()
+    with profiling.phase('report'):
+        main(args)
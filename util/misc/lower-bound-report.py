@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+'''
+Report how tight the cost lower bounds of the scheduler are.
+
+For every region the gap between its final cost and its lower bound is taken
+from the logs: `CostLowerBound` gives the bound and `BestResult` (or
+`HeuristicResult` when nothing else ran) the final cost above it. The static
+parts of the bound are taken from `StaticLowerBoundDebugInfo` and `SlilStats`
+when the scheduler was built to log them. Only the first pass of a region is
+used, as the second pass has a different cost function.
+
+The gaps are reported per run, region size class and benchmark (the name of
+the log file): the share of regions with no gap, the median, 90th percentile
+and largest gap, and the mean gap relative to the final cost. Only in regions
+which were proven optimal is the gap exactly the slack of the bound; in the
+others it is an upper bound on it, so both are shown.
+
+A run is a directory of logs or the output directory of a runspec wrapper
+test, given as `[NAME=]PATH`. The LB_ALG of the run is read from the sched.ini
+copied to the test directory, or can be given with `--lb-alg`. Log files are
+parsed in parallel.
+
+Example:
+    ./lower-bound-report.py lc=outdir/lc/ rj=outdir/rj/ --by size benchmark -o gaps.csv
+'''
+
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import LOG_SUFFIXES, find_log_files, keep_only_first_event, log_benchmark, read_log_blocks
+from readlogs import size_class, size_class_key
+from readlogs import profiling
+from schedini import read_settings
+
+
+def parse_run(spec, lb_alg):
+    '''
+    Returns (name, LB_ALG, log files) of a run given as `[NAME=]PATH`.
+    '''
+    name, sep, path = spec.partition('=')
+    if not sep:
+        path = spec
+        name = os.path.basename(spec.rstrip(os.sep))
+    logs = os.path.join(path, 'logs')
+    if os.path.isdir(logs):
+        inis = glob.glob(os.path.join(path, '*.ini'))
+        if inis:
+            lb_alg = read_settings(inis[0]).get('LB_ALG', lb_alg)
+        path = logs
+    return name, lb_alg or '?', find_log_files([path], LOG_SUFFIXES)
+
+
+def read_log(job):
+    '''
+    Returns `list[dict]` with the bounds and the final cost of every region in
+    a log file, and the profile of reading it.
+    '''
+    with profiling.phase('aggregate'):
+        regions = read_regions(job)
+    return regions, profiling.take_profile()
+
+
+def read_regions(job):
+    run, lb_alg, path = job
+    benchmark = log_benchmark(path)
+    regions = []
+    seen = set()
+    for events in read_log_blocks(path):
+        events = keep_only_first_event(events)
+        if 'ProcessDag' not in events or 'CostLowerBound' not in events:
+            continue
+        name = events['ProcessDag']['name']
+        if name in seen:
+            continue
+        seen.add(name)
+        if 'BestResult' in events:
+            gap = events['BestResult']['cost']
+            optimal = events['BestResult']['optimal']
+        elif 'HeuristicResult' in events:
+            gap = events['HeuristicResult']['cost']
+            optimal = gap == 0
+        else:
+            continue
+        static = events.get('StaticLowerBoundDebugInfo', {})
+        slil = events.get('SlilStats', {})
+        regions.append({
+            'run': run,
+            'lb_alg': lb_alg,
+            'benchmark': benchmark,
+            'region': name,
+            'size': events['ProcessDag']['num_instructions'],
+            'lower_bound': events['CostLowerBound']['cost'],
+            'spill_cost_lb': static.get('spill_cost_lb', ''),
+            'length_lb': static.get('length_lb', ''),
+            'static_lb': slil.get('static_lb', static.get('static_lb', '')),
+            'gap': gap,
+            'optimal': optimal,
+            'enumerated': slil.get('is_enumerated', ''),
+        })
+    return regions
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+def gap_stats(regions):
+    gaps = sorted(r['gap'] for r in regions)
+    relative = [float(r['gap']) / (r['lower_bound'] + r['gap']) for r in regions if r['lower_bound'] + r['gap']]
+    return {
+        'regions': len(gaps),
+        'zero': float(sum(1 for g in gaps if g == 0)) / len(gaps),
+        'median': percentile(gaps, 50),
+        'p90': percentile(gaps, 90),
+        'max': gaps[-1],
+        'relative': sum(relative) / len(relative) if relative else 0.0,
+    }
+
+
+def print_distribution(title, groups, sort_key):
+    print(title)
+    print('{:<36} {:>8} {:>7} {:>8} {:>8} {:>10} {:>8} | {:>8} {:>7} {:>8} {:>8}'.format(
+        '', 'Regions', 'No gap', 'Median', 'P90', 'Max', 'Rel.', 'Optimal', 'No gap', 'Median', 'P90'))
+    for key in sorted(groups, key=sort_key):
+        regions = groups[key]
+        s = gap_stats(regions)
+        line = '{:<36} {:>8} {:>7.1%} {:>8} {:>8} {:>10} {:>8.1%}'.format(
+            ' '.join(key), s['regions'], s['zero'], s['median'], s['p90'], s['max'], s['relative'])
+        optimal = [r for r in regions if r['optimal']]
+        if optimal:
+            o = gap_stats(optimal)
+            line += ' | {:>8} {:>7.1%} {:>8} {:>8}'.format(o['regions'], o['zero'], o['median'], o['p90'])
+        else:
+            line += ' | {:>8}'.format(0)
+        print(line)
+    print('')
+
+
+def main(args):
+    runs = [parse_run(spec, args.lb_alg) for spec in args.runs]
+    jobs = [(name, lb_alg, path) for name, lb_alg, paths in runs for path in paths]
+    if not jobs:
+        print('Fatal: No log files found.')
+        sys.exit(1)
+
+    regions = []
+    pool = multiprocessing.Pool(args.jobs, profiling.init_worker, (profiling.profiling_enabled(),))
+    try:
+        for result, profile in pool.imap_unordered(read_log, jobs):
+            regions += result
+            profiling.merge_profile(profile)
+    finally:
+        pool.close()
+        pool.join()
+    if not regions:
+        print('Fatal: No regions with a CostLowerBound in the logs.')
+        sys.exit(1)
+
+    bounds = sorted(args.classes)
+    dimensions = {
+        'size': (lambda r: size_class(r['size'], bounds), size_class_key),
+        'benchmark': (lambda r: r['benchmark'], lambda label: label),
+    }
+
+    def group(key_of):
+        groups = {}
+        for region in regions:
+            groups.setdefault(key_of(region), []).append(region)
+        return groups
+
+    print_distribution('By run:', group(lambda r: (r['run'], 'LB_ALG=' + r['lb_alg'])), lambda key: key)
+    for dimension in args.by:
+        label_of, label_key = dimensions[dimension]
+        print_distribution('By run and {}:'.format(dimension),
+                           group(lambda r: (r['run'], label_of(r))),
+                           lambda key: (key[0], label_key(key[1])))
+
+    print('Gaps are final cost - lower bound. Rel.: the mean gap relative to the final cost.')
+    print('Optimal: the regions proven optimal, where the gap is exactly the slack of the bound.')
+
+    if args.output:
+        fields = ['run', 'lb_alg', 'benchmark', 'region', 'size', 'lower_bound', 'spill_cost_lb', 'length_lb',
+                  'static_lb', 'gap', 'optimal', 'enumerated']
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fields)
+            writer.writeheader()
+            writer.writerows(sorted(regions, key=lambda r: (r['run'], r['benchmark'], r['region'])))
+        print('\nWrote {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report the gaps between final costs and lower bounds.')
+    parser.add_argument('runs', nargs='+', metavar='[NAME=]PATH',
+                        help='The runs: runspec wrapper test directories, log directories or log files.')
+    parser.add_argument('--lb-alg', help='The LB_ALG of the runs, if it cannot be read from their sched.ini.')
+    parser.add_argument('--by', nargs='*', choices=['size', 'benchmark'], default=['size', 'benchmark'],
+                        help='How to break down the gaps of every run (default: %(default)s).')
+    parser.add_argument('--classes', type=int, nargs='+', default=[50, 100, 200, 500, 1000],
+                        help='The region sizes (in instructions) at which the classes start '
+                             '(default: %(default)s).')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of log files to parse at once (default: %(default)s).')
+    parser.add_argument('-o', '--output', help='Where to write the bounds of every region as CSV.')
+    profiling.add_profile_option(parser)
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable_profiling()
+    with profiling.phase('report'):
+        main(args)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+'''
+Report how the time and the cost improvement of two-pass scheduling
+(USE_TWO_PASS) split between the first (occupancy) pass and the second (ILP)
+pass, per region size class and per benchmark (the name of the log file).
+
+The pass of every block is taken from its `PassFinished` event, see
+readlogs.block_pass(). The time of a pass is the processor time of its block
+and its improvement the cost improvement over the schedule it started from:
+the heuristic in the first pass and the first-pass schedule in the second.
+
+A second-pass region is wasted if it timed out without improving its cost:
+it used up its SECOND_PASS_REGION_TIMEOUT and bought nothing. With `--ini`,
+the budgets of the regions are computed from the FIRST_PASS_REGION_TIMEOUT,
+SECOND_PASS_REGION_TIMEOUT and TIMEOUT_PER of the sched.ini of the run, and
+only the regions which took at least their budget count as wasted. The size
+classes in which the second pass enumerated but improved nothing are listed at
+the end, as the places where its time can be cut. With `-o`, the passes of
+every region are written as CSV.
+
+Example:
+    ./pass-budget-report.py outdir/test/logs/ --ini outdir/test/sched.ini -o passes.csv
+'''
+
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import PASS_NAMES, block_duration, block_metrics, block_outcome, block_pass, keep_only_first_event
+from readlogs import log_benchmark, map_logs, read_log_blocks, size_class, size_class_key
+from readlogs import profiling
+from schedini import read_settings
+
+PASSES = sorted(PASS_NAMES)
+# The settings of the region time limit of each pass.
+TIMEOUT_SETTINGS = {1: 'FIRST_PASS_REGION_TIMEOUT', 2: 'SECOND_PASS_REGION_TIMEOUT'}
+
+
+def read_pass_blocks(path):
+    '''
+    Returns `list[dict]` with the region, size, pass, time, improvement and
+    outcome of every block of a log file scheduled in two passes.
+    '''
+    benchmark = log_benchmark(path)
+    blocks = []
+    for events in read_log_blocks(path):
+        events = keep_only_first_event(events)
+        num = block_pass(events)
+        if 'ProcessDag' not in events or num is None:
+            continue
+        blocks.append({
+            'benchmark': benchmark,
+            'name': events['ProcessDag']['name'],
+            'size': events['ProcessDag']['num_instructions'],
+            'pass': num,
+            'time': block_duration(events),
+            'improvement': max(block_metrics(events)['improvement'], 0),
+            'outcome': block_outcome(events),
+        })
+    return blocks
+
+
+def read_regions(paths, jobs=None):
+    '''
+    Returns `list[dict]` with the benchmark, size and the blocks of both
+    passes of every region, `passes[num] --> block`.
+    '''
+    regions = {}
+    for _, blocks in map_logs(read_pass_blocks, paths, jobs):
+        for block in blocks:
+            region = regions.setdefault((block['benchmark'], block['name']), {
+                'benchmark': block['benchmark'], 'name': block['name'], 'size': block['size'], 'passes': {},
+            })
+            region['passes'][block['pass']] = block
+    return list(regions.values())
+
+
+def read_budgets(path):
+    '''
+    Returns a function which gives the region time limit in ms of a pass for a
+    region size, or None without a limit, from the sched.ini at `path`.
+    '''
+    settings = read_settings(path)
+    per_instruction = settings.get('TIMEOUT_PER', 'INSTR') == 'INSTR'
+    timeouts = dict((num, int(settings[name])) for num, name in TIMEOUT_SETTINGS.items() if name in settings)
+
+    def budget(num, size):
+        if num not in timeouts:
+            return None
+        return timeouts[num] * size if per_instruction else timeouts[num]
+    return budget
+
+
+def is_wasted(block, budget=None):
+    '''
+    Whether a block timed out without improving the cost, after taking at
+    least its `budget` if it is known.
+    '''
+    if block['outcome'] != 'timeout' or block['improvement'] > 0:
+        return False
+    return budget is None or block['time'] >= budget
+
+
+def summarize(regions, budget=None):
+    '''
+    Returns `dict[pass --> dict]` with the runs, time, enumerated regions,
+    improvement and improved regions of each pass over the regions, and for
+    the second pass the timed out and wasted regions, the time of the wasted
+    ones and the total budget.
+    '''
+    summary = {}
+    for num in PASSES:
+        blocks = [(r['size'], r['passes'][num]) for r in regions if num in r['passes']]
+        budgets = [budget(num, size) for size, _ in blocks] if budget else []
+        wasted = [block for (size, block) in blocks
+                  if is_wasted(block, budget(num, size) if budget else None)]
+        summary[num] = {
+            'runs': len(blocks),
+            'time': sum(block['time'] for _, block in blocks),
+            'enumerated': sum(1 for _, block in blocks if block['outcome'] in ('optimal', 'timeout')),
+            'improvement': sum(block['improvement'] for _, block in blocks),
+            'improved': sum(1 for _, block in blocks if block['improvement'] > 0),
+            'timeouts': sum(1 for _, block in blocks if block['outcome'] == 'timeout'),
+            'wasted': len(wasted),
+            'wasted_time': sum(block['time'] for block in wasted),
+            'budget': sum(budgets) if budgets and None not in budgets else None,
+        }
+    return summary
+
+
+def share(part, total):
+    return float(part) / total if total else 0.0
+
+
+def print_table(title, groups, budget=None, sort_key=None):
+    print(title)
+    print('{:<20} {:>7} | {:>5} {:>9} {:>5} {:>9} | {:>5} {:>9} {:>5} {:>9} {:>6} {:>14} | {:>6}'.format(
+        '', 'Regions', '1st', 'ms', 'enum', 'improved', '2nd', 'ms', 'enum', 'improved', 'tmout',
+        'wasted', '2nd ms'))
+    print('{:<20} {:>7} | {:>5} {:>9} {:>5} {:>9} | {:>5} {:>9} {:>5} {:>9} {:>6} {:>14} | {:>6}'.format(
+        '', '', 'runs', '', '', 'cost/rgns', 'runs', '', '', 'cost/rgns', '', 'rgns/ms', 'share'))
+    for label in sorted(groups, key=sort_key):
+        regions = groups[label]
+        summary = summarize(regions, budget)
+        first, second = summary[1], summary[2]
+        print('{:<20} {:>7} | {:>5} {:>9} {:>5} {:>9} | {:>5} {:>9} {:>5} {:>9} {:>6} {:>14} | {:>6.1%}'.format(
+            label, len(regions),
+            first['runs'], first['time'], first['enumerated'],
+            '{}/{}'.format(first['improvement'], first['improved']),
+            second['runs'], second['time'], second['enumerated'],
+            '{}/{}'.format(second['improvement'], second['improved']), second['timeouts'],
+            '{}/{}'.format(second['wasted'], second['wasted_time']),
+            share(second['time'], first['time'] + second['time'])))
+    print('')
+
+
+def main(args):
+    with profiling.phase('aggregate'):
+        regions = read_regions(args.logs, args.jobs)
+    if not regions:
+        print('Fatal: No regions scheduled in two passes (no PassFinished events) in the logs.')
+        sys.exit(1)
+    budget = read_budgets(args.ini) if args.ini else None
+
+    bounds = sorted(args.classes)
+    by_size = {}
+    by_benchmark = {}
+    for region in regions:
+        by_size.setdefault(size_class(region['size'], bounds), []).append(region)
+        by_benchmark.setdefault(region['benchmark'], []).append(region)
+
+    print_table('By region size:', by_size, budget, size_class_key)
+    print_table('By benchmark:', by_benchmark, budget)
+    print_table('Total:', {'all': regions}, budget)
+    print('improved: the total cost improvement of the pass / the regions it improved.')
+    print('wasted: the second-pass regions which timed out without improvement / their time.')
+    print('2nd ms share: the part of the time of both passes spent in the second pass.')
+
+    second = summarize(regions, budget)[2]
+    print('\nSecond pass: {} of {} regions ({:.1%}) were wasted, {} of {} ms ({:.1%}).'.format(
+        second['wasted'], second['runs'], share(second['wasted'], second['runs']),
+        second['wasted_time'], second['time'], share(second['wasted_time'], second['time'])))
+    if second['budget'] is not None:
+        print('The second pass used {:.1%} of its budget of {} ms.'.format(
+            share(second['time'], second['budget']), second['budget']))
+
+    fruitless = [(label, summarize(by_size[label], budget)[2]) for label in sorted(by_size, key=size_class_key)]
+    fruitless = [(label, s) for label, s in fruitless if s['enumerated'] and not s['improved']]
+    if fruitless:
+        print('\nThe second pass enumerated but improved no region of size:')
+        for label, s in fruitless:
+            print('    {:<12} {:>6} regions {:>6} enumerated {:>9} ms'.format(
+                label, s['runs'], s['enumerated'], s['time']))
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            header = ['benchmark', 'region', 'size']
+            for num in PASSES:
+                header += ['{}_{}'.format(PASS_NAMES[num], value)
+                           for value in ('time', 'improvement', 'outcome', 'budget')]
+            writer.writerow(header + ['second_wasted'])
+            for region in sorted(regions, key=lambda r: (r['benchmark'], r['name'])):
+                row = [region['benchmark'], region['name'], region['size']]
+                for num in PASSES:
+                    block = region['passes'].get(num)
+                    limit = budget(num, region['size']) if budget else None
+                    row += [block['time'], block['improvement'], block['outcome']] if block else ['', '', '']
+                    row.append('' if limit is None else limit)
+                second_block = region['passes'].get(2)
+                row.append(is_wasted(second_block, budget(2, region['size']) if budget else None)
+                           if second_block else '')
+                writer.writerow(row)
+        print('\nWrote {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Split the time and improvement of two-pass scheduling by pass.')
+    parser.add_argument('logs', nargs='+', help='The scheduler logs, or directories of .log files.')
+    parser.add_argument('--ini', help='The sched.ini of the run, to compute the time limits of the regions.')
+    parser.add_argument('--classes', type=int, nargs='+', default=[50, 100, 200, 500, 1000],
+                        help='The region sizes (in instructions) at which the classes start '
+                             '(default: %(default)s).')
+    parser.add_argument('-o', '--output', help='Where to write the passes of every region as CSV.')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of log files to parse at once (default: %(default)s).')
+    profiling.add_profile_option(parser)
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable_profiling()
+    with profiling.phase('report'):
+        main(args)
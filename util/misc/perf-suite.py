@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+'''
+Performance regression suite for the scheduler, run on a fixed corpus of DDG
+dumps with the optsched-replay tool.
+
+    record    Schedules every region of the corpus several times and writes
+              the measurements to a baseline file.
+    check     Measures the regions again and compares them with a baseline.
+              Exits with 1 and prints the regressed regions if any region or
+              the whole corpus got slower or bigger than the noise allows.
+
+Every region is scheduled in its own process, `--repeat` times, with
+`RANDOM_SEED` fixed in the sched.ini so that the runs are repeatable. For each
+region the suite records the wall time of the process, the processor time of
+the region from its log, its peak RSS, and the deterministic work counters:
+the nodes examined by the enumerator (`NodeExamineCount`) and the ACO
+iterations (`ACOSchedComplete`, `AcoPostSchedComplete`).
+
+The time and memory of a region regress when even the fastest of the new
+runs exceeds the baseline median by more than the region's threshold: the
+spread of the baseline runs (`(max - min) / median`) times `--noise-factor`,
+but at least `--min-threshold`. Regions whose counters changed are listed as well,
+since with a fixed seed that means the search itself changed.
+
+The baseline stores a hash of every region, so a baseline can only be
+compared with the corpus version it was recorded on.
+
+Example:
+    ./perf-suite.py record perf-corpus.ddgc -o baseline.json \
+        --machine-model machine_model.cfg --sched-ini sched.ini
+    ./perf-suite.py check perf-corpus.ddgc baseline.json \
+        --machine-model machine_model.cfg --sched-ini sched.ini
+'''
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ddg import dump_name, find_ddg_files, format_ddg, read_ddg
+from ddg.corpus import Corpus
+from ddg.replay import run_replay
+from readlogs import block_duration, block_metrics, keep_only_first_event, parse_blocks
+from schedini import update_settings
+
+BASELINE_VERSION = 1
+# Measurements which vary from run to run, and the smallest change of each
+# that is reported, to ignore the noise of very short regions.
+TIMED_METRICS = {'wall_time': 0.005, 'time': 2, 'max_rss': 1024}
+# Measurements which are the same in every run with a fixed seed.
+COUNTERS = ('nodes', 'aco_iterations', 'cost')
+
+
+def load_corpus(path):
+    '''
+    Returns `list[(name, DDG text)]` of the regions in a corpus file or a
+    directory of .ddg files, sorted by name.
+    '''
+    if os.path.isdir(path):
+        regions = []
+        for ddg in find_ddg_files([path]):
+            dag = read_ddg(ddg)
+            regions.append((dump_name(ddg, dag), format_ddg(dag)))
+        return sorted(regions)
+    with Corpus(path) as corpus:
+        return [(name, format_ddg(corpus.get(name))) for name in corpus.names()]
+
+
+def region_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def measure(job):
+    '''
+    Schedules one region in its own process and returns its measurements, or
+    an error message.
+    '''
+    args, sched_ini, name, text = job
+    with tempfile.NamedTemporaryFile('w', suffix='.ddg') as ddg:
+        ddg.write(text)
+        ddg.flush()
+        result = run_replay(args.replay, args.machine_model, sched_ini, [ddg.name], args.timeout)
+    blocks = [events for events in parse_blocks(result.log) if 'ProcessDag' in events]
+    if result.error or len(blocks) != 1:
+        return name, result.error or 'no scheduling region in the log'
+
+    events = blocks[0]
+    return name, {
+        'wall_time': result.wall_time,
+        'time': block_duration(events),
+        'max_rss': result.max_rss,
+        'nodes': sum(e['num_nodes'] for e in events.get('NodeExamineCount', [])),
+        'aco_iterations': sum(e['iterations'] for e in
+                              events.get('ACOSchedComplete', []) + events.get('AcoPostSchedComplete', [])),
+        'cost': block_metrics(keep_only_first_event(events))['cost'],
+    }
+
+
+def run_suite(args, regions):
+    '''
+    Returns `dict[region --> dict[metric --> list of samples]]` for `--repeat`
+    runs of every region.
+    '''
+    with open(args.sched_ini) as f:
+        settings = update_settings(f.read(), {'RANDOM_SEED': args.seed})
+    with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+        f.write(settings)
+        sched_ini = f.name
+
+    jobs = [(args, sched_ini, name, text) for _ in range(args.repeat) for name, text in regions]
+    samples = {}
+    failed = set()
+    pool = multiprocessing.Pool(args.jobs)
+    try:
+        for name, result in pool.imap_unordered(measure, jobs):
+            if not isinstance(result, dict):
+                if name not in failed:
+                    print('WARNING: Could not schedule {}: {}'.format(name, result))
+                failed.add(name)
+                continue
+            region = samples.setdefault(name, {})
+            for metric, value in result.items():
+                region.setdefault(metric, []).append(value)
+    finally:
+        pool.close()
+        pool.join()
+        os.remove(sched_ini)
+
+    for name in failed:
+        samples.pop(name, None)
+    if failed:
+        print('Fatal: {} regions could not be scheduled.'.format(len(failed)))
+        sys.exit(1)
+    return samples
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def spread(values):
+    '''
+    The relative spread `(max - min) / median` of the samples.
+    '''
+    middle = median(values)
+    return (max(values) - min(values)) / middle if middle else 0.0
+
+
+def record(args):
+    regions = load_corpus(args.corpus)
+    samples = run_suite(args, regions)
+    baseline = {
+        'version': BASELINE_VERSION,
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'regions': {name: dict(samples[name], hash=region_hash(text)) for name, text in regions},
+    }
+    with open(args.output, 'w') as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+    total = sum(median(samples[name]['wall_time']) for name, _ in regions)
+    print('Recorded {} regions x {} runs ({:.2f} s per run of the corpus) to {}'.format(
+        len(regions), args.repeat, total, args.output))
+
+
+def compare_metric(name, metric, old, new, args):
+    '''
+    Returns a row for the report if the new samples are slower (or bigger)
+    than the baseline by more than the threshold, None otherwise.
+    '''
+    old_median = median(old)
+    new_median = median(new)
+    threshold = max(args.min_threshold, args.noise_factor * spread(old))
+    # Even the fastest of the new runs has to be slower, so that one
+    # disturbed run does not fail the check.
+    fastest = min(new)
+    if fastest - old_median <= max(threshold * old_median, TIMED_METRICS[metric]):
+        return None
+    change = (new_median - old_median) / old_median if old_median else 0.0
+    return (name, metric, old_median, new_median, change, threshold)
+
+
+def check(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        print('Fatal: Unsupported baseline version {}.'.format(baseline.get('version')))
+        sys.exit(1)
+    args.seed = baseline['seed']
+
+    regions = load_corpus(args.corpus)
+    mismatched = [name for name, text in regions
+                  if name in baseline['regions'] and baseline['regions'][name]['hash'] != region_hash(text)]
+    missing = sorted(set(baseline['regions']) - set(name for name, _ in regions))
+    if mismatched or missing:
+        print('Fatal: The corpus is not the one the baseline was recorded on '
+              '({} regions changed, {} missing).'.format(len(mismatched), len(missing)))
+        sys.exit(1)
+    new_regions = [name for name, _ in regions if name not in baseline['regions']]
+    if new_regions:
+        print('Ignoring {} regions which are not in the baseline.'.format(len(new_regions)))
+    regions = [(name, text) for name, text in regions if name in baseline['regions']]
+
+    samples = run_suite(args, regions)
+    regressions = []
+    changed = []
+    for name, _ in regions:
+        old = baseline['regions'][name]
+        for metric in TIMED_METRICS:
+            row = compare_metric(name, metric, old[metric], samples[name][metric], args)
+            if row:
+                regressions.append(row)
+        for metric in COUNTERS:
+            if median(old[metric]) != median(samples[name][metric]):
+                changed.append((name, metric, median(old[metric]), median(samples[name][metric])))
+
+    # The whole corpus, where the noise of the individual regions averages out.
+    totals = {}
+    for metric in ('wall_time', 'time'):
+        old = [sum(runs) for runs in zip(*(baseline['regions'][name][metric] for name, _ in regions))]
+        new = [sum(runs) for runs in zip(*(samples[name][metric] for name, _ in regions))]
+        totals[metric] = (median(old), median(new))
+        row = compare_metric('(total)', metric, old, new, args)
+        if row:
+            regressions.append(row)
+
+    print('Checked {} regions x {} runs.'.format(len(regions), args.repeat))
+    print('Total wall time: {:.3f} s -> {:.3f} s'.format(*totals['wall_time']))
+    print('Total region time: {} ms -> {} ms'.format(*totals['time']))
+
+    if changed:
+        print('\nWork counters changed in {} regions (the search is not the same as in the baseline):'.format(
+            len(set(name for name, _, _, _ in changed))))
+        print('{:<40} {:<16} {:>14} {:>14}'.format('Region', 'Counter', 'Baseline', 'Now'))
+        for name, metric, old, new in changed:
+            print('{:<40} {:<16} {:>14} {:>14}'.format(name, metric, old, new))
+
+    if regressions:
+        print('\n{} regressions:'.format(len(regressions)))
+        print('{:<40} {:<10} {:>12} {:>12} {:>9} {:>10}'.format(
+            'Region', 'Metric', 'Baseline', 'Now', 'Change', 'Threshold'))
+        for name, metric, old, new, change, threshold in sorted(regressions, key=lambda row: -row[4]):
+            print('{:<40} {:<10} {:>12.4g} {:>12.4g} {:>+9.1%} {:>10.1%}'.format(
+                name, metric, old, new, change, threshold))
+        sys.exit(1)
+    print('\nNo regressions.')
+
+
+if __name__ == '__main__':
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--machine-model', required=True, help='The machine_model.cfg to schedule for.')
+    common.add_argument('--sched-ini', required=True, help='The sched.ini with the scheduler settings.')
+    common.add_argument('--replay', default='optsched-replay',
+                        help='The optsched-replay binary (default: %(default)s).')
+    common.add_argument('-r', '--repeat', type=int, default=5,
+                        help='How many times to schedule every region (default: %(default)s).')
+    common.add_argument('-j', '--jobs', type=int, default=1,
+                        help='The number of regions to schedule at once. More than one makes the '
+                             'times noisier (default: %(default)s).')
+    common.add_argument('--timeout', type=float, default=None,
+                        help='Kill a region after this many seconds.')
+
+    parser = argparse.ArgumentParser(description='Scheduler performance regression suite.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    record_parser = subparsers.add_parser('record', parents=[common], help='Record a baseline.')
+    record_parser.add_argument('corpus', help='The corpus file or directory of .ddg files.')
+    record_parser.add_argument('-o', '--output', required=True, help='The baseline file to write.')
+    record_parser.add_argument('--seed', type=int, default=1,
+                               help='The RANDOM_SEED to schedule with (default: %(default)s).')
+    record_parser.set_defaults(func=record)
+
+    check_parser = subparsers.add_parser('check', parents=[common], help='Compare with a baseline.')
+    check_parser.add_argument('corpus', help='The corpus file or directory of .ddg files.')
+    check_parser.add_argument('baseline', help='The baseline file written by record.')
+    check_parser.add_argument('--min-threshold', type=float, default=0.1,
+                              help='The smallest relative slowdown which is a regression (default: %(default)s).')
+    check_parser.add_argument('--noise-factor', type=float, default=3.0,
+                              help='Multiple of the spread of the baseline runs which is still noise '
+                                   '(default: %(default)s).')
+    check_parser.set_defaults(func=check)
+
+    args = parser.parse_args()
+    args.func(args)
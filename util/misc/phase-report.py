@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+'''
+Attribute the cost improvement and the time of every region to the phases of
+the scheduler: the heuristic, ACO before enumeration (ACO_BEFORE_ENUM), the
+enumerator, and ACO after enumeration (ACO_AFTER_ENUM).
+
+The time of a phase is taken from the events which end it and the one before:
+
+    heuristic   ProcessDag to HeuristicResult
+    aco         CostLowerBound to ACOSchedComplete
+    enum        the end of the previous phase to DagSolvedOptimally/DagTimedOut
+    aco_post    the last event before it to AcoPostSchedComplete
+
+The improvement of ACO is over the schedule it started from: the heuristic
+before enumeration and the best schedule after it. The improvement of the
+enumerator is over the better of the two schedules before it.
+
+The regions are aggregated by size class and by benchmark (the name of the
+log file), so that ACO can be enabled and its ant count chosen per region
+size. With `-o`, the phases of every region are written as CSV.
+
+Example:
+    ./phase-report.py outdir/test/logs/ -o phases.csv
+'''
+
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import log_benchmark, read_logs, size_class, size_class_key
+from readlogs import profiling
+
+PHASES = ('heuristic', 'aco', 'enum', 'aco_post')
+# The events after which the post-enumeration ACO can start.
+BEFORE_ACO_POST = ('CostLowerBound', 'ACOSchedComplete', 'DagSolvedOptimally', 'DagTimedOut',
+                   'HeuristicScheduleOptimal', 'BestResult', 'LocalRegAllocSimulationChoice')
+
+
+def first_time(events, event_id):
+    return events[event_id][0]['time'] if event_id in events else None
+
+
+def block_phases(events):
+    '''
+    Returns `dict[phase --> (time in ms, improvement, iterations)]` for the
+    phases which ran in a block.
+    '''
+    phases = {}
+    start = first_time(events, 'ProcessDag')
+    end = first_time(events, 'HeuristicResult')
+    if end is not None:
+        phases['heuristic'] = (end - start, 0, 0)
+        start = end
+
+    bound = first_time(events, 'CostLowerBound')
+    if bound is not None:
+        start = bound
+    if 'ACOSchedComplete' in events:
+        aco = events['ACOSchedComplete'][0]
+        phases['aco'] = (aco['time'] - start, max(aco['improvement'], 0), aco['iterations'])
+        start = aco['time']
+
+    for event_id in ('DagSolvedOptimally', 'DagTimedOut'):
+        if event_id in events:
+            enum = events[event_id][0]
+            phases['enum'] = (enum['time'] - start, enum['cost_improvement'], 0)
+
+    if 'AcoPostSchedComplete' in events:
+        aco = events['AcoPostSchedComplete'][0]
+        before = [e['time'] for event_id in BEFORE_ACO_POST for e in events.get(event_id, [])
+                  if e['time'] <= aco['time']]
+        start = max(before) if before else start
+        # ACO after enumeration only replaces the schedule if it is better.
+        phases['aco_post'] = (aco['time'] - start, max(aco['improvement'], 0), aco['iterations'])
+    return phases
+
+
+def read_regions(paths, jobs=None):
+    '''
+    Returns `list[dict]` with the benchmark, size, heuristic cost and phases of
+    every region, adding up all passes of a region.
+    '''
+    regions = {}
+    for path, blocks in read_logs(paths, jobs):
+        benchmark = log_benchmark(path)
+        for events in blocks:
+            if 'ProcessDag' not in events:
+                continue
+            dag = events['ProcessDag'][0]
+            region = regions.setdefault((benchmark, dag['name']), {
+                'benchmark': benchmark, 'name': dag['name'], 'size': dag['num_instructions'],
+                'heuristic_cost': events['HeuristicResult'][0]['cost'] if 'HeuristicResult' in events else 0,
+                'phases': {},
+            })
+            for phase, values in block_phases(events).items():
+                old = region['phases'].get(phase, (0, 0, 0))
+                region['phases'][phase] = tuple(a + b for a, b in zip(old, values))
+    return list(regions.values())
+
+
+def summarize(regions):
+    '''
+    Returns `dict[phase --> dict]` with the runs, time, improvement,
+    improved regions and iterations of every phase over the regions.
+    '''
+    summary = {}
+    for phase in PHASES:
+        ran = [r['phases'][phase] for r in regions if phase in r['phases']]
+        summary[phase] = {
+            'runs': len(ran),
+            'time': sum(time for time, _, _ in ran),
+            'improvement': sum(improvement for _, improvement, _ in ran),
+            'improved': sum(1 for _, improvement, _ in ran if improvement > 0),
+            'iterations': float(sum(iterations for _, _, iterations in ran)) / len(ran) if ran else 0.0,
+        }
+    return summary
+
+
+def print_table(title, groups, sort_key=None):
+    print(title)
+    header = '{:<20} {:>7} {:>10}'.format('', 'Regions', 'Heur. ms')
+    for phase in PHASES[1:]:
+        header += ' | {:>5} {:>9} {:>9} {:>6}'.format(phase, 'ms', 'improved', 'share')
+    print(header)
+    print('{:<20} {:>7} {:>10}'.format('', '', '') +
+          ' | {:>5} {:>9} {:>9} {:>6}'.format('runs', '', 'cost/rgns', '') * (len(PHASES) - 1))
+    for label in sorted(groups, key=sort_key):
+        regions = groups[label]
+        summary = summarize(regions)
+        total_improvement = sum(summary[phase]['improvement'] for phase in PHASES)
+        line = '{:<20} {:>7} {:>10}'.format(label, len(regions), summary['heuristic']['time'])
+        for phase in PHASES[1:]:
+            s = summary[phase]
+            share = float(s['improvement']) / total_improvement if total_improvement else 0.0
+            line += ' | {:>5} {:>9} {:>9} {:>6.1%}'.format(
+                s['runs'], s['time'], '{}/{}'.format(s['improvement'], s['improved']), share)
+        print(line)
+    print('')
+
+
+def main(args):
+    with profiling.phase('aggregate'):
+        regions = read_regions(args.logs, args.jobs)
+    if not regions:
+        print('Fatal: No scheduling regions in the logs.')
+        sys.exit(1)
+
+    bounds = sorted(args.classes)
+    by_size = {}
+    by_benchmark = {}
+    for region in regions:
+        by_size.setdefault(size_class(region['size'], bounds), []).append(region)
+        by_benchmark.setdefault(region['benchmark'], []).append(region)
+
+    print_table('By region size:', by_size, size_class_key)
+    print_table('By benchmark:', by_benchmark)
+    print_table('Total:', {'all': regions})
+    print('improved: the total cost improvement of the phase / the regions it improved.')
+    print('share: the part of all the cost improvement which came from the phase.')
+
+    aco_classes = []
+    for label in sorted(by_size, key=size_class_key):
+        summary = summarize(by_size[label])
+        for phase in ('aco', 'aco_post'):
+            if summary[phase]['runs']:
+                aco_classes.append((label, phase, summary[phase]))
+    if aco_classes:
+        print('\nACO per region size:')
+        print('{:<12} {:<9} {:>7} {:>11} {:>13} {:>11}'.format(
+            'Size class', 'Phase', 'Runs', 'Iterations', 'Improved rgns', 'Cost per s'))
+        for label, phase, s in aco_classes:
+            print('{:<12} {:<9} {:>7} {:>11.1f} {:>13.1%} {:>11.1f}'.format(
+                label, phase, s['runs'], s['iterations'], float(s['improved']) / s['runs'],
+                s['improvement'] * 1000.0 / s['time'] if s['time'] else 0.0))
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['benchmark', 'region', 'size', 'heuristic_cost'] +
+                            ['{}_{}'.format(phase, value) for phase in PHASES
+                             for value in ('time', 'improvement', 'iterations')])
+            for region in sorted(regions, key=lambda r: (r['benchmark'], r['name'])):
+                row = [region['benchmark'], region['name'], region['size'], region['heuristic_cost']]
+                for phase in PHASES:
+                    row += list(region['phases'][phase]) if phase in region['phases'] else ['', '', '']
+                writer.writerow(row)
+        print('\nWrote {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Attribute cost improvement and time to the scheduler phases.')
+    parser.add_argument('logs', nargs='+', help='The scheduler logs, or directories of .log files.')
+    parser.add_argument('--classes', type=int, nargs='+', default=[50, 100, 200, 500, 1000],
+                        help='The region sizes (in instructions) at which the classes start '
+                             '(default: %(default)s).')
+    parser.add_argument('-o', '--output', help='Where to write the phases of every region as CSV.')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of log files to parse at once (default: %(default)s).')
+    profiling.add_profile_option(parser)
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable_profiling()
+    with profiling.phase('report'):
+        main(args)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+'''
+Schedule a set of DDG dumps with the optsched-replay tool and summarize the
+results.
+
+The DAGs are split into batches which are scheduled in parallel, one
+optsched-replay process per batch. The log of every process is parsed with
+readlogs, so the results have the same form as those of a compiler run. The
+DAGs can be given as .ddg files and DUMP_DDGS directories or as a corpus
+written by ddg-corpus.py.
+
+Example:
+    ./replay-ddgs.py ddg-dumps/ --machine-model machine_model.cfg \
+        --sched-ini sched.ini -o results.csv --log replay.log
+'''
+
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ddg import dump_name, find_ddg_files, format_ddg, read_ddg
+from ddg.corpus import Corpus
+from ddg.replay import run_replay
+from readlogs import block_metrics, block_outcome, keep_only_first_event, parse_blocks
+
+# The corpus of the worker process, opened on its first batch.
+_corpus = None
+
+
+def corpus_dag(path, name):
+    global _corpus
+    if _corpus is None:
+        _corpus = Corpus(path)
+    return _corpus.get(name)
+
+
+def run_batch(job):
+    '''
+    Schedules a batch of DAGs in one optsched-replay process. Returns the
+    names and dag_ids of the DAGs in the batch, the log and an error message
+    if the process failed.
+    '''
+    args, batch = job
+    with tempfile.TemporaryDirectory(prefix='replay-ddgs') as tmpdir:
+        if args.corpus:
+            files = []
+            dag_ids = []
+            for name in batch:
+                dag = corpus_dag(args.corpus, name)
+                dag_ids.append(dag.dag_id)
+                files.append(os.path.join(tmpdir, '{}.ddg'.format(len(files))))
+                with open(files[-1], 'w') as f:
+                    f.write(format_ddg(dag))
+            names = batch
+        else:
+            files = batch
+            dags = [read_ddg(path) for path in batch]
+            names = [dump_name(path, dag) for path, dag in zip(batch, dags)]
+            dag_ids = [dag.dag_id for dag in dags]
+
+        result = run_replay(args.replay, args.machine_model, args.sched_ini, files, args.timeout)
+        return names, dag_ids, result.log, result.error
+
+
+def match_blocks(names, dag_ids, log):
+    '''
+    Returns `dict[name --> events]` for the DAGs of a batch. DAGs which could
+    not be read have no block in the log, so the blocks are matched in order
+    by their ProcessDag name.
+    '''
+    results = {}
+    blocks = [keep_only_first_event(events) for events in parse_blocks(log)]
+    blocks = [events for events in blocks if 'ProcessDag' in events]
+    b = 0
+    for name, dag_id in zip(names, dag_ids):
+        if b < len(blocks) and blocks[b]['ProcessDag']['name'] == dag_id:
+            results[name] = blocks[b]
+            b += 1
+    return results
+
+
+def main(args):
+    if args.corpus:
+        with Corpus(args.corpus) as corpus:
+            dags = args.dags if args.dags else list(corpus.names())
+    else:
+        dags = find_ddg_files(args.dags)
+    if not dags:
+        print('Fatal: No DAGs to schedule.')
+        sys.exit(1)
+    batches = [dags[i:i + args.batch_size] for i in range(0, len(dags), args.batch_size)]
+    jobs = [(args, batch) for batch in batches]
+
+    rows = []
+    failed = 0
+    log_file = open(args.log, 'w') if args.log else None
+    pool = multiprocessing.Pool(args.jobs)
+    try:
+        for names, dag_ids, log, error in pool.imap(run_batch, jobs):
+            if log_file:
+                log_file.write(log)
+            if error:
+                print('WARNING: optsched-replay failed on a batch starting at {}: {}'.format(names[0], error))
+            results = match_blocks(names, dag_ids, log)
+            for name in names:
+                if name not in results:
+                    failed += 1
+                    rows.append({'dag': name, 'outcome': 'failed'})
+                    continue
+                events = results[name]
+                row = {'dag': name, 'outcome': block_outcome(events)}
+                row.update(block_metrics(events))
+                rows.append(row)
+    finally:
+        pool.close()
+        pool.join()
+        if log_file:
+            log_file.close()
+
+    outcomes = {}
+    for row in rows:
+        outcomes[row['outcome']] = outcomes.get(row['outcome'], 0) + 1
+    print('Scheduled {} DAGs in {} batches.'.format(len(rows), len(batches)))
+    for outcome in sorted(outcomes):
+        print('  {:<20} {:>8}'.format(outcome, outcomes[outcome]))
+    scheduled = [row for row in rows if row['outcome'] != 'failed']
+    print('Total cost: {}'.format(sum(row['cost'] for row in scheduled)))
+    print('Total time: {} ms'.format(sum(row['time'] for row in scheduled)))
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, ['dag', 'outcome', 'cost', 'time', 'spills', 'improvement'], restval='')
+            writer.writeheader()
+            writer.writerows(rows)
+        print('Wrote {}'.format(args.output))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Schedule DDG dumps with optsched-replay in parallel.')
+    parser.add_argument('dags', nargs='*',
+                        help='The .ddg files or DUMP_DDGS directories, or with --corpus the names of the DAGs '
+                             'to schedule (default: all).')
+    parser.add_argument('-c', '--corpus', help='Read the DAGs from this corpus file.')
+    parser.add_argument('--machine-model', required=True, help='The machine_model.cfg to schedule for.')
+    parser.add_argument('--sched-ini', required=True, help='The sched.ini with the scheduler settings.')
+    parser.add_argument('--replay', default='optsched-replay',
+                        help='The optsched-replay binary (default: %(default)s).')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of optsched-replay processes (default: %(default)s).')
+    parser.add_argument('-b', '--batch-size', type=int, default=16,
+                        help='The number of DAGs per process (default: %(default)s).')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Kill a process after this many seconds; its unfinished DAGs count as failed.')
+    parser.add_argument('-o', '--output', help='Where to write the result of every DAG as CSV.')
+    parser.add_argument('--log', help='Where to write the combined scheduler log.')
+
+    args = parser.parse_args()
+    if not args.corpus and not args.dags:
+        parser.error('the .ddg files are required without --corpus')
+    main(args)
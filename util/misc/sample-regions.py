@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+'''
+Stratified sampling of scheduling regions for fast A/B comparisons.
+
+`sample` reads the logs of a baseline build and groups its regions, told apart
+by their benchmark (the name of the log file), into strata by region size, max latency (both in power-of-two buckets) and the outcome of
+the baseline (heuristic optimal, enumerated and optimal, timed out, not
+enumerated). It then draws a random sample from every stratum and writes:
+
+    regions.ini   SCHEDULE_SPECIFIC_REGIONS/REGIONS_TO_SCHEDULE for the sample,
+                  or a full sched.ini if --ini is given.
+    weights.csv   The benchmark and stratum of every sampled region, together
+                  with the stratum's population and sample size.
+
+SCHEDULE_SPECIFIC_REGIONS selects regions by name alone, so the builds also
+schedule the regions of the same name in the other benchmarks; they are not
+part of the sample and are ignored by `estimate`.
+
+Build both configurations with the sample's sched.ini, then `estimate` uses
+the weights to extrapolate a suite-level total (and the A - B difference)
+with a confidence interval:
+
+    total = sum_h N_h * mean_h
+    var   = sum_h N_h^2 * (1 - n_h / N_h) * s_h^2 / n_h
+
+Samples are allocated proportionally to N_h * s_h (Neyman allocation) of the
+baseline heuristic cost, so strata where the cost varies get more samples.
+
+Example:
+    ./sample-regions.py sample baseline/logs/ -n 2000 --ini sched.ini -o sample/
+    ./sample-regions.py estimate sample/weights.csv -a runA/logs/ -b runB/logs/ -m cost
+'''
+
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import *
+from schedini import format_list, update_settings
+
+REGIONS_INI_FILENAME = 'regions.ini'
+WEIGHTS_FILENAME = 'weights.csv'
+METRICS = ('cost', 'time', 'spills', 'improvement')
+
+
+def pow2_bucket(value):
+    if value <= 1:
+        return '<=1'
+    low = 2 ** int(math.log(value, 2))
+    return '{}-{}'.format(low, 2 * low - 1)
+
+
+def stratum_of(events):
+    process_dag = events['ProcessDag']
+    return '/'.join([
+        'size' + pow2_bucket(process_dag['num_instructions']),
+        'lat' + pow2_bucket(process_dag['max_latency']),
+        block_outcome(events),
+    ])
+
+
+def stdev(values):
+    if len(values) < 2:
+        return 0.0
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+def allocate(strata, sample_size, min_per_stratum, proportional):
+    '''
+    Returns a `dict[stratum --> sample size]`.
+    '''
+    if proportional:
+        shares = {h: len(regions) for h, regions in strata.items()}
+    else:
+        shares = {h: len(regions) * stdev([cost for _, cost in regions])
+                  for h, regions in strata.items()}
+        # Without any variance in the baseline, fall back to proportional.
+        if sum(shares.values()) == 0:
+            shares = {h: len(regions) for h, regions in strata.items()}
+
+    total_share = sum(shares.values())
+    allocation = {}
+    for h, regions in strata.items():
+        wanted = int(round(sample_size * shares[h] / total_share)) if total_share else 0
+        allocation[h] = min(len(regions), max(min_per_stratum, wanted))
+    return allocation
+
+
+def sample(args):
+    regions = read_region_metrics(args.logs)
+    if not regions:
+        print('Fatal: No regions found in the baseline logs.')
+        sys.exit(1)
+
+    # dict[stratum --> list[((benchmark, region name), heuristic cost)]]
+    strata = {}
+    for region, (events, _) in sorted(regions.items()):
+        cost = events['HeuristicResult']['cost'] if 'HeuristicResult' in events else 0
+        strata.setdefault(stratum_of(events), []).append((region, cost))
+
+    sample_size = args.count if args.count else int(math.ceil(args.fraction * len(regions)))
+    allocation = allocate(strata, sample_size, args.min_per_stratum, args.proportional)
+
+    rng = random.Random(args.seed)
+    chosen = []
+    for h in sorted(strata):
+        members = [region for region, _ in strata[h]]
+        for region in sorted(rng.sample(members, allocation[h])):
+            chosen.append((region, h, len(members), allocation[h]))
+
+    if not os.path.exists(args.outdir):
+        os.makedirs(args.outdir)
+
+    settings = {
+        'SCHEDULE_SPECIFIC_REGIONS': 'YES',
+        'REGIONS_TO_SCHEDULE': format_list(sorted(set(name for (_, name), _, _, _ in chosen))),
+    }
+    base = ''
+    if args.ini:
+        with open(args.ini) as f:
+            base = f.read()
+    with open(os.path.join(args.outdir, REGIONS_INI_FILENAME), 'w') as f:
+        f.write(update_settings(base, settings))
+
+    with open(os.path.join(args.outdir, WEIGHTS_FILENAME), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['benchmark', 'region', 'stratum', 'stratum_size', 'stratum_sample', 'weight'])
+        for (benchmark, name), h, population, n in chosen:
+            writer.writerow([benchmark, name, h, population, n, '{:.6f}'.format(population / n)])
+
+    print('Sampled {} of {} regions from {} strata.'.format(len(chosen), len(regions), len(strata)))
+    for h in sorted(strata):
+        print('  {:<50} {:>7} {:>6}'.format(h, len(strata[h]), allocation[h]))
+
+
+def read_weights(path):
+    '''
+    Returns a `dict[stratum --> (population, list[(benchmark, region name)])]`.
+    '''
+    strata = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            population, regions = strata.setdefault(row['stratum'], (int(row['stratum_size']), []))
+            regions.append((row['benchmark'], row['region']))
+    return strata
+
+
+def stratified_total(strata, values):
+    '''
+    Estimates the population total of `values`
+    (dict[(benchmark, region name) --> value]). Returns (total, variance,
+    number of sampled regions missing from values).
+    '''
+    total = 0.0
+    variance = 0.0
+    missing = 0
+    for population, regions in strata.values():
+        observed = [values[region] for region in regions if region in values]
+        missing += len(regions) - len(observed)
+        if not observed:
+            continue
+        n = len(observed)
+        total += population * sum(observed) / n
+        variance += population ** 2 * (1 - n / population) * stdev(observed) ** 2 / n
+    return total, variance, missing
+
+
+def print_estimate(label, total, variance, z):
+    half_width = z * math.sqrt(variance)
+    relative = ' ({:.2%})'.format(half_width / abs(total)) if total else ''
+    print('{:<12} {:>16,.1f} +/- {:,.1f}{}'.format(label, total, half_width, relative))
+
+
+def estimate(args):
+    strata = read_weights(args.weights)
+
+    runs = [('A', args.a)] + ([('B', args.b)] if args.b else [])
+    values = {}
+    for label, paths in runs:
+        regions = read_region_metrics(paths)
+        values[label] = {region: metrics[args.metric] for region, (_, metrics) in regions.items()}
+
+    print('Estimated suite-level {} ({:.0%} confidence):'.format(args.metric, args.confidence))
+    z = {0.9: 1.645, 0.95: 1.96, 0.99: 2.576}[args.confidence]
+    for label, _ in runs:
+        total, variance, missing = stratified_total(strata, values[label])
+        if missing:
+            print('WARNING: {} sampled regions are missing from run {}.'.format(missing, label))
+        print_estimate(label, total, variance, z)
+
+    if args.b:
+        # Pair the regions so that the variance of the difference is estimated
+        # on the per-region differences.
+        diffs = {region: values['A'][region] - values['B'][region]
+                 for region in values['A'] if region in values['B']}
+        total, variance, _ = stratified_total(strata, diffs)
+        print_estimate('A - B', total, variance, z)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stratified region sampling for fast A/B evaluation.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    sample_parser = subparsers.add_parser('sample', help='Sample regions from a baseline build.')
+    sample_parser.add_argument('logs', nargs='+', help='The baseline log files or directories of logs.')
+    group = sample_parser.add_mutually_exclusive_group()
+    group.add_argument('-n', '--count', type=int, help='The number of regions to sample.')
+    group.add_argument('-f', '--fraction', type=float, default=0.05,
+                       help='The fraction of regions to sample (default: %(default)s).')
+    sample_parser.add_argument('--min-per-stratum', type=int, default=2,
+                               help='The minimum sample of every stratum, needed for its variance (default: %(default)s).')
+    sample_parser.add_argument('--proportional', action='store_true',
+                               help='Allocate the samples proportionally to the stratum sizes instead of Neyman allocation.')
+    sample_parser.add_argument('--ini', help='The sched.ini to add the region list to.')
+    sample_parser.add_argument('--seed', type=int, default=0, help='The random seed (default: %(default)s).')
+    sample_parser.add_argument('-o', '--outdir', default='./', help='Where to write the results (default: %(default)s).')
+    sample_parser.set_defaults(func=sample)
+
+    estimate_parser = subparsers.add_parser('estimate', help='Extrapolate suite-level metrics from sampled builds.')
+    estimate_parser.add_argument('weights', help='The weights.csv written by `sample`.')
+    estimate_parser.add_argument('-a', nargs='+', required=True, help='The logs of configuration A.')
+    estimate_parser.add_argument('-b', nargs='+', help='The logs of configuration B.')
+    estimate_parser.add_argument('-m', '--metric', choices=METRICS, default='cost',
+                                 help='The per-region metric to extrapolate (default: %(default)s).')
+    estimate_parser.add_argument('-c', '--confidence', type=float, choices=(0.9, 0.95, 0.99), default=0.95,
+                                 help='The confidence level of the intervals (default: %(default)s).')
+    estimate_parser.set_defaults(func=estimate)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+'''
+Shard scheduler logs by function, so that the per-function analyses can read
+them in parallel.
+
+Every log is cut at its blocks and `Function:` banners and the functions are
+written to a shard each, or with `--buckets N` to N shards by a hash of the
+function name, under OUTDIR/<log>/, with a manifest of the shards in
+OUTDIR/manifest.json (see readlogs.shards). Binary event logs are written to
+text shards.
+
+The sharded log directory can be given to the scripts built on readlogs in
+place of the logs. They read the shards in several processes at once.
+
+Example:
+    ./shard-logs.py outdir/test/logs/ -o outdir/test/shards/
+    ./phase-report.py outdir/test/shards/
+'''
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import LOG_SUFFIXES, find_log_files, log_benchmark, profiling
+from readlogs.shards import MANIFEST_NAME, shard_log, write_manifest
+
+
+def shard(job):
+    path, out_dir, buckets = job
+    entry = shard_log(path, out_dir, log_benchmark(path), buckets)
+    return entry, profiling.take_profile()
+
+
+def main(args):
+    paths = find_log_files(args.logs, LOG_SUFFIXES)
+    if not paths:
+        print('Fatal: No log files found.')
+        sys.exit(1)
+    names = [log_benchmark(path) for path in paths]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        print('Fatal: More than one log of {}.'.format(', '.join(duplicates)))
+        sys.exit(1)
+
+    logs = []
+    jobs = [(path, args.output, args.buckets) for path in paths]
+    pool = multiprocessing.Pool(args.jobs, profiling.init_worker, (profiling.profiling_enabled(),))
+    try:
+        for entry, profile in pool.imap(shard, jobs):
+            logs.append(entry)
+            profiling.merge_profile(profile)
+            print('{}: {} blocks in {} shards'.format(entry['log'], entry['blocks'], len(entry['shards'])))
+    finally:
+        pool.close()
+        pool.join()
+    write_manifest(args.output, logs, args.buckets)
+    print('Wrote {}'.format(os.path.join(args.output, MANIFEST_NAME)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shard scheduler logs by function.')
+    parser.add_argument('logs', nargs='+', help='The scheduler logs, or directories of .log files.')
+    parser.add_argument('-o', '--output', required=True, help='The directory to write the shards to.')
+    parser.add_argument('--buckets', type=int,
+                        help='Hash the functions into this many shards per log instead of a shard per function.')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of logs to shard at once (default: %(default)s).')
+    profiling.add_profile_option(parser)
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable_profiling()
+    with profiling.phase('shard'):
+        main(args)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+'''
+Virtual-best and portfolio analysis of scheduling configurations per region.
+
+Given the logs of N builds of the same code with different sched.ini files,
+every region (told apart by its benchmark, the name of the log file) is scored
+in every configuration as
+
+    score = cost + time weight * scheduling time in seconds
+
+where cost is the final schedule cost including the lower bound, so the
+configurations must use the same cost function. The time weight, the cost
+which one second of scheduling time is worth, has to be given: it sets how
+much cost a configuration has to buy with its compile time. A region's winner
+is the configuration with the lowest score, ties going to the faster one.
+
+The report lists the totals of every configuration, the virtual best (every
+region scheduled by its winner), and a portfolio grown greedily by adding the
+configuration that lowers the total score of the portfolio's per-region best
+the most. For the final portfolio, `<config>.ini` files are written with
+SCHEDULE_SPECIFIC_REGIONS/REGIONS_TO_SCHEDULE set to the regions that
+configuration wins, so that each region is only scheduled by its winner. The
+region lists select regions by name, so a name which different configurations
+win in different benchmarks is listed for each of them.
+
+Example:
+    ./virtual-best.py aco=aco/logs/ bb=bb/logs/ two_pass=2p/logs/ -t 1000 -k 2 -o portfolio/
+'''
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import *
+from schedini import format_list, update_settings
+
+
+def parse_run(spec):
+    '''
+    Returns (name, path) from `NAME=PATH` or `PATH`, in which case the name
+    is taken from the path.
+    '''
+    name, sep, path = spec.partition('=')
+    if sep:
+        return name, path
+    path = spec.rstrip(os.sep)
+    name = os.path.basename(path)
+    if name == 'logs':
+        name = os.path.basename(os.path.dirname(path))
+    return name, spec
+
+
+def read_scores(runs, time_weight):
+    '''
+    Returns (list[region], dict[config --> dict[region --> (score, cost, time)]])
+    for the regions, `(benchmark, region name)`, which were logged by every
+    configuration.
+    '''
+    scores = {}
+    for name, path in runs:
+        regions = read_region_metrics([path])
+        scores[name] = {
+            region: (metrics['cost'] + time_weight * metrics['time'] / 1000.0,
+                     metrics['cost'], metrics['time'])
+            for region, (_, metrics) in regions.items()
+        }
+
+    common = set.intersection(*(set(regions) for regions in scores.values()))
+    for name, regions in scores.items():
+        if len(regions) != len(common):
+            print('WARNING: Ignoring {} regions which are only logged by some configurations, e.g. by {}.'.format(
+                len(regions) - len(common), name))
+    return sorted(common), scores
+
+
+def winner(regions, scores, configs):
+    '''
+    Returns a `dict[region --> config]` of the best of `configs` on every region.
+    '''
+    return {region: min(configs, key=lambda c: (scores[c][region][0], scores[c][region][2], c))
+            for region in regions}
+
+
+def totals(assignment, scores):
+    '''
+    Returns the total (score, cost, time) of scheduling every region with its
+    assigned configuration.
+    '''
+    result = [0.0, 0, 0]
+    for region, config in assignment.items():
+        for i, value in enumerate(scores[config][region]):
+            result[i] += value
+    return tuple(result)
+
+
+def greedy_portfolio(regions, scores, size, min_gain):
+    '''
+    Returns the list of configurations added at each step together with the
+    totals of the portfolio after that step.
+    '''
+    portfolio = []
+    steps = []
+    current = None
+    while len(portfolio) < size:
+        best = None
+        for config in sorted(scores):
+            if config in portfolio:
+                continue
+            result = totals(winner(regions, scores, portfolio + [config]), scores)
+            if best is None or result[0] < best[1][0]:
+                best = (config, result)
+        if best is None:
+            break
+        if current is not None and current[0] - best[1][0] <= min_gain * abs(current[0]):
+            break
+        portfolio.append(best[0])
+        current = best[1]
+        steps.append((best[0], current))
+    return steps
+
+
+def print_row(label, result, best, wins=''):
+    score, cost, time = result
+    gap = '{:.2%}'.format((score - best) / abs(best)) if best else '-'
+    print('  {:<24} {:>16,.1f} {:>14,} {:>10,.1f} {:>9} {:>8}'.format(
+        label, score, int(cost), time / 1000.0, gap, wins))
+
+
+def main(args):
+    runs = [parse_run(spec) for spec in args.runs]
+    if len(set(name for name, _ in runs)) != len(runs):
+        print('Fatal: The configuration names must be unique, use NAME=PATH.')
+        sys.exit(1)
+
+    regions, scores = read_scores(runs, args.time_weight)
+    if not regions:
+        print('Fatal: No region is logged by every configuration.')
+        sys.exit(1)
+
+    configs = sorted(scores)
+    virtual_best = winner(regions, scores, configs)
+    best_total = totals(virtual_best, scores)
+    wins = {config: 0 for config in configs}
+    for config in virtual_best.values():
+        wins[config] += 1
+
+    print('{} regions, score = cost + {} * scheduling time in seconds, ties to the faster configuration.'.format(
+        len(regions), args.time_weight))
+    print('  {:<24} {:>16} {:>14} {:>10} {:>9} {:>8}'.format(
+        'Configuration', 'Score', 'Cost', 'Time (s)', 'Gap to VB', 'Wins'))
+    for config in configs:
+        print_row(config, totals({region: config for region in regions}, scores), best_total[0], wins[config])
+    print_row('virtual best', best_total, best_total[0])
+
+    print('\nGreedy portfolio:')
+    steps = greedy_portfolio(regions, scores, args.portfolio_size, args.min_gain)
+    for i, (config, result) in enumerate(steps):
+        print_row('{}. + {}'.format(i + 1, config), result, best_total[0])
+
+    if not args.outdir:
+        return
+    if not os.path.exists(args.outdir):
+        os.makedirs(args.outdir)
+
+    portfolio = [config for config, _ in steps]
+    assignment = winner(regions, scores, portfolio)
+    # dict[region name --> set[config]], the configurations which win a name in some benchmark.
+    name_winners = {}
+    for (_, name), config in assignment.items():
+        name_winners.setdefault(name, set()).add(config)
+    shared = sum(1 for configs in name_winners.values() if len(configs) > 1)
+    if shared:
+        print('WARNING: {} region names are won by different configurations in different benchmarks '
+              'and are listed for each of them.'.format(shared))
+    for config in portfolio:
+        settings = {
+            'SCHEDULE_SPECIFIC_REGIONS': 'YES',
+            'REGIONS_TO_SCHEDULE': format_list(sorted(name for name, configs in name_winners.items()
+                                                      if config in configs)),
+        }
+        path = os.path.join(args.outdir, config + '.ini')
+        base = ''
+        if config in args.ini:
+            with open(args.ini[config]) as f:
+                base = f.read()
+        with open(path, 'w') as f:
+            f.write(update_settings(base, settings))
+        print('Wrote {}'.format(path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Virtual-best and portfolio analysis of scheduling configurations.')
+    parser.add_argument('runs', nargs='+', metavar='[NAME=]LOGS',
+                        help='The logs (file or directory) of each configuration.')
+    parser.add_argument('-t', '--time-weight', type=float, required=True,
+                        help='The cost one second of scheduling time is worth; 0 ranks by cost alone '
+                             'and only breaks ties by time.')
+    parser.add_argument('-k', '--portfolio-size', type=int, default=3,
+                        help='The maximum number of configurations in the portfolio (default: %(default)s).')
+    parser.add_argument('--min-gain', type=float, default=0.001,
+                        help='Stop growing the portfolio when a configuration improves the total score '
+                             'by no more than this fraction (default: %(default)s).')
+    parser.add_argument('--ini', nargs=2, action='append', default=[], metavar=('NAME', 'SCHED_INI'),
+                        help='The sched.ini of a configuration to add its region list to.')
+    parser.add_argument('-o', '--outdir', help='Where to write the per-configuration region lists.')
+
+    args = parser.parse_args()
+    args.ini = dict(args.ini)
+    main(args)
@@ -9,16 +9,21 @@ Last Update:  December 30, 2019
 **********************************************************************************
 
 OUTPUT:
-    This script takes in data from plaidbench runs and output 4 spreadsheets.
-        Spreadsheet 1: compile_time.xls
-        Spreadsheet 2: examples-per-second.xls
-        Spreadsheet 3: tiles-per-second.xls
-        Spreadsheet 4: execution_time.xls
+    This script takes in data from plaidbench runs and output a workbook with
+    4 sheets, plaidbench-data.xlsx, or 4 .csv files with -o <name>.csv.
+        Sheet 1: Compile Time
+        Sheet 2: Examples per Second
+        Sheet 3: Tiles per Second
+        Sheet 4: Execution Time
+
+    With --records, the stats of every benchmark of every run are also
+    written as a row of a .csv or .parquet file.
 
 Requirements:
     - python3
     - pip3
-    - xlwt (spreadsheet module, installed using pip3)
+    - openpyxl (spreadsheet module, installed using pip3), for .xlsx output
+    - pyarrow, for .parquet records
 
 HOW TO USE:
     1.) Run a plaidbench benchmarks with run-plaidbench.sh to generate a
@@ -40,9 +45,15 @@ Example:
 '''
 
 import os       # Used for scanning directories, getting paths, and checking files.
-import xlwt     # Used to create excel spreadsheets.
+import sys
 import argparse # Used to parse commandline arguments
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sheets import Sheet, write_records, write_sheets
+
+# Value of the stats which are missing from a log
+NOT_FOUND = 'Not Found'
+
 # Contains all of the stats
 benchStats = {}
 
@@ -101,9 +112,10 @@ def parseStats(inputFolder, ignoreFolders):
             currentLogFile = os.path.join(currentPath, bench + '.log')
             stats = {}
             # Set default values
-            stats['compile_time'] = 'Not Found'
-            stats['inference_lat'] = 'Not Found'
-            stats['fps'] = 'Not Found'
+            stats['compile_time'] = NOT_FOUND
+            stats['execution_time'] = NOT_FOUND
+            stats['inference_lat'] = NOT_FOUND
+            stats['fps'] = NOT_FOUND
 
             # First check if log file exists.
             if (os.path.exists(currentLogFile)):
@@ -161,214 +173,62 @@ def printStats():
                     print('            Inference Latency: {:0.2f}'.format(benchStats[nameOfRun][runNumber][bench]['inference_lat']))
                     print('            FPS: {:0.2f}'.format(benchStats[nameOfRun][runNumber][bench]['fps']))
 
-# Create compile time excel spreadsheet
-def CreateCompileTimeSpreadsheet():
-    # Create a new excel file
-    file = xlwt.Workbook()
-    # Create a new sheet in the excel file
-    sh = file.add_sheet('Sheet 1')
-
-    # Write the titles to the respective row
-    # Use the function write(row, col, val)
-    # to write to sheet 1
-    # Note: 0,0 is row 1,1 in the spreadsheet
-    sh.write(0,0, 'Benchmarks')
-    # Set width for benchmark col
-    # 36.5714285 is about equal to 1 pixel
-    # Width of 18 is 131 pixels
-    sh.col(0).width = 4790
-
-    # Write benchmark names
-    row = 2
-    for bench in benchmarks:
-        sh.write(row, 0, bench)
-        row += 1
-    sh.write(row, 0, 'Total')
-
-    # Begin writing stats for compile times
-    col = 1
-    for nameOfRun in benchStats:
-        # Write run name
-        row = 0
-        sh.write(row, col, nameOfRun)
-
-        for runNumber in benchStats[nameOfRun]:
-            # Write run number
-            row = 1
-            sh.write(row, col, 'Run {}'.format(runNumber))
-            row += 1
-
-            # Write compile time stats
-            for bench in benchStats[nameOfRun][runNumber]:
-                if (bench == 'total_compile_time'):
-                    sh.write(row, col, benchStats[nameOfRun][runNumber][bench])
-                elif (bench == 'total_exe_time'):
-                    continue
-                else:
-                    sh.write(row, col, benchStats[nameOfRun][runNumber][bench]['compile_time'])
-                row += 1
-
-            # Go to next column for the next run.
-            col += 1
-
-    # Save file to current directory.
-    file.save('compile_time.xls')
-
-# Create execution time excel spreadsheet
-def CreateExecutionTimeSpreadsheet():
-    # Create a new excel file
-    file = xlwt.Workbook()
-    # Create a new sheet in the excel file
-    sh = file.add_sheet('Sheet 1')
-
-    # Write the titles to the respective row
-    # Use the function write(row, col, val)
-    # to write to sheet 1
-    # Note: 0,0 is row 1,1 in the spreadsheet
-    sh.write(0,0, 'Benchmarks')
-    # Set width for benchmark col
-    # 36.5714285 is about equal to 1 pixel
-    # Width of 18 is 131 pixels
-    sh.col(0).width = 4790
-
-    # Write benchmark names
-    row = 2
-    for bench in benchmarks:
-        sh.write(row, 0, bench)
-        row += 1
-    sh.write(row, 0, 'Total')
-
-    # Begin writing stats for compile times
-    col = 1
-    for nameOfRun in benchStats:
-        # Write run name
-        row = 0
-        sh.write(row, col, nameOfRun)
-
-        for runNumber in benchStats[nameOfRun]:
-            # Write run number
-            row = 1
-            sh.write(row, col, 'Run {}'.format(runNumber))
-            row += 1
-
-            # Write compile time stats
-            for bench in benchStats[nameOfRun][runNumber]:
-                if (bench == 'total_exe_time'):
-                    sh.write(row, col, benchStats[nameOfRun][runNumber][bench])
-                elif (bench == 'total_compile_time'):
-                    continue
-                else:
-                    sh.write(row, col, benchStats[nameOfRun][runNumber][bench]['execution_time'])
-                row += 1
-
-            # Go to next column for the next run.
-            col += 1
-
-    # Save file to current directory.
-    file.save('execution_time.xls')
-
-# Create examples per second excel spreadsheet
-def CreateEPSSpreadsheet():
-    # Create a new excel file
-    file = xlwt.Workbook()
-    # Create a new sheet in the excel file
-    sh = file.add_sheet('Sheet 1')
-
-    # Write the titles to the respective row
-    # Use the function write(row, col, val)
-    # to write to sheet 1
-    # Note: 0,0 is row 1,1 in the spreadsheet
-    sh.write(0,0, 'Benchmarks')
-    # Set width for benchmark col
-    # 36.5714285 is about equal to 1 pixel
-    # Width of 18 is 131 pixels
-    sh.col(0).width = 4790
-
-    # Write benchmark names
-    row = 2
-    for bench in benchmarks:
-        sh.write(row, 0, bench)
-        row += 1
-
-    # Begin writing stats for compile times
-    col = 1
-    for nameOfRun in benchStats:
-        # Write run name
-        row = 0
-        sh.write(row, col, nameOfRun)
-
-        # Begin writing stats for examples per second
-        for runNumber in benchStats[nameOfRun]:
-            # Write run number
-            row = 1
-            sh.write(row, col, 'Run {}'.format(runNumber))
-            row += 1
-
-            for bench in benchStats[nameOfRun][runNumber]:
-                if ((bench == 'total_compile_time') or (bench == 'total_exe_time')):
-                    continue
-                else:
-                    # Calculate examples per second stat then write to spreadsheet
-                    examplesPerSecond = 1000.00 / benchStats[nameOfRun][runNumber][bench]['inference_lat']
-                    sh.write(row, col, examplesPerSecond)
-                row += 1
-
-            # Go to next column for the next run.
-            col += 1
-
-    # Save file to current directory.
-    file.save('examples-per-second.xls')
-
-# Create examples per second excel spreadsheet
-def CreateTPSSpreadsheet():
-    # Create a new excel file
-    file = xlwt.Workbook()
-    # Create a new sheet in the excel file
-    sh = file.add_sheet('Sheet 1')
-
-    # Write the titles to the respective row
-    # Use the function write(row, col, val)
-    # to write to sheet 1
-    # Note: 0,0 is row 1,1 in the spreadsheet
-    sh.write(0,0, 'Benchmarks')
-    # Set width for benchmark col
-    # 36.5714285 is about equal to 1 pixel
-    # Width of 18 is 131 pixels
-    sh.col(0).width = 4790
-
-    # Write benchmark names
-    row = 2
-    for bench in benchmarks:
-        sh.write(row, 0, bench)
-        row += 1
-
-    col = 1
+# The sheet of one stat, a row for each benchmark and a column for each run,
+# with the name of the run above its first column. "value" gets the stat from
+# the stats of a benchmark, and "total" names the total of the run, if any.
+def runSheet(title, value, total=None):
+    def rows():
+        # Write the titles to the respective row
+        row = ['Benchmarks']
+        for nameOfRun in benchStats:
+            row += [nameOfRun] + [None] * (len(benchStats[nameOfRun]) - 1)
+        yield row
+        yield [None] + ['Run {}'.format(runNumber) for nameOfRun in benchStats for runNumber in benchStats[nameOfRun]]
+
+        # Write the stat of each benchmark for every run
+        for bench in benchmarks:
+            yield [bench] + [value(benchStats[nameOfRun][runNumber][bench])
+                             for nameOfRun in benchStats for runNumber in benchStats[nameOfRun]]
+
+        if total:
+            yield ['Total'] + [benchStats[nameOfRun][runNumber][total]
+                               for nameOfRun in benchStats for runNumber in benchStats[nameOfRun]]
+
+    # Width of 18 characters for the benchmark names
+    return Sheet(title, rows(), widths={0: 18})
+
+# Calculate examples per second from the inference latency in ms
+def examplesPerSecond(stats):
+    if stats['inference_lat'] == NOT_FOUND:
+        return NOT_FOUND
+    return 1000.00 / stats['inference_lat']
+
+# Create the spreadsheets of all stats in one pass
+def createSpreadsheets(output):
+    write_sheets(output, [
+        runSheet('Compile Time', lambda stats: stats['compile_time'], 'total_compile_time'),
+        runSheet('Examples per Second', examplesPerSecond),
+        runSheet('Tiles per Second', lambda stats: stats['fps']),
+        runSheet('Execution Time', lambda stats: stats['execution_time'], 'total_exe_time'),
+    ])
+
+# The stats of every benchmark of every run, the missing ones as None
+def benchRecords():
     for nameOfRun in benchStats:
-        # Write run name
-        row = 0
-        sh.write(row, col, nameOfRun)
-
         for runNumber in benchStats[nameOfRun]:
-            # Write run number
-            row = 1
-            sh.write(row, col, 'Run {}'.format(runNumber))
-            row += 1
-
-            for bench in benchStats[nameOfRun][runNumber]:
-                if ((bench == 'total_compile_time') or (bench == 'total_exe_time')):
-                    continue
-                else:
-                    # Get the tiles per second (FPS) from benchStats and write it to
-                    # the spreadsheet.
-                    fps = benchStats[nameOfRun][runNumber][bench]['fps']
-                    sh.write(row, col, fps)
-                row += 1
-
-            # Go to next column for the next run.
-            col += 1
-
-    # Save file to current directory.
-    file.save('tiles-per-second.xls')
+            for bench in benchmarks:
+                stats = benchStats[nameOfRun][runNumber][bench]
+                record = {
+                    'run': nameOfRun,
+                    'run_number': runNumber,
+                    'benchmark': bench,
+                    'compile_time': stats['compile_time'],
+                    'execution_time': stats['execution_time'],
+                    'inference_latency': stats['inference_lat'],
+                    'examples_per_second': examplesPerSecond(stats),
+                    'tiles_per_second': stats['fps'],
+                }
+                yield dict((k, None if v == NOT_FOUND else v) for k, v in record.items())
 
 def main(args):
     # Parse folders to ignore into a list
@@ -381,10 +241,12 @@ def main(args):
         printStats()
 
     if not args.disable:
-        CreateCompileTimeSpreadsheet()
-        CreateEPSSpreadsheet()
-        CreateTPSSpreadsheet()
-        CreateExecutionTimeSpreadsheet()
+        createSpreadsheets(args.output)
+
+    if args.records:
+        write_records(args.records, benchRecords(),
+                      ['run', 'run_number', 'benchmark', 'compile_time', 'execution_time', 'inference_latency',
+                       'examples_per_second', 'tiles_per_second'])
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Script to extract plaidbench data.',
@@ -395,6 +257,15 @@ if __name__ == '__main__':
                         dest='verbose',
                         help='Print stats to terminal')
 
+    parser.add_argument('--output', '-o',
+                        default='plaidbench-data',
+                        dest='output',
+                        help='Output spreadsheet filepath, .xlsx or .csv')
+
+    parser.add_argument('--records',
+                        dest='records',
+                        help='Also write the stats of every benchmark and run to this .csv or .parquet file')
+
     parser.add_argument('--disable', '-d',
                         action='store_true', default=False,
                         dest='disable',
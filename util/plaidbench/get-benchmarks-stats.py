@@ -13,10 +13,14 @@ OUTPUT:
     This script takes in data from plaidbench runs and output a single spreadsheet.
         Spreadsheet 1: benchmarks-stats.xlsx
 
+    With --records, the stats of every benchmark are also written as a row
+    of a .csv or .parquet file.
+
 Requirements:
     - python3
     - pip3
-    - openpyxl (sreadsheet module, installed using pip3)
+    - openpyxl (sreadsheet module, installed using pip3), for .xlsx output
+    - pyarrow, for .parquet records
 
 HOW TO USE:
     1.) Run a plaidbench benchmarks with run-plaidbench.sh to generate a
@@ -36,12 +40,14 @@ Example:
 
 import os       # Used for scanning directories, getting paths, and checking files.
 import re       # Used for parsing log file
-from openpyxl import Workbook
-from openpyxl.styles import Font
+import sys
 import argparse
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import block_pass_name, parse_events
+from sheets import Sheet, bold, write_records, write_sheets
+
 RE_DAG_INFO = re.compile(r'Processing DAG (.*) with (\d+) insts and max latency (\d+)')
-RE_PASS_NUM = re.compile(r'End of (.*) pass through')
 
 # Contains all of the stats
 benchStats = {}
@@ -103,11 +109,8 @@ def parseStats(inputFolder):
                 for block in blocks:
                 # Ignore second pass since it should
                 # have the same stats as first
-                    getPassNum = RE_PASS_NUM.search(block)
-                    if (getPassNum):
-                        passNum = getPassNum.group(1)
-                        if passNum == 'second':
-                            continue
+                    if block_pass_name(parse_events(block)) == 'second':
+                        continue
 
                     # Get DAG stats
                     dagStats = RE_DAG_INFO.search(block)
@@ -154,55 +157,28 @@ def printStats():
     print('    Average Region Size {:0.1f}'.format(cumulativeStats['averageRegionSize']))
     print('    Max region size: {}'.format(cumulativeStats['maxRegionSize']))
 
-def createSpreadsheets(output):
-    if 'xls' not in output[-4:]:
-        output += '.xlsx'
-
-    # Create new excel worksheet
-    wb = Workbook()
-
-    # Grab the active worksheet
-    ws = wb.active
-
-    # Insert title and benchmark names
-    ws['A1'] = 'Benchmarks'
-    ws['A1'].font = Font(bold=True)
-
-    row = 3
-    for bench in benchmarks:
-        ws['A' + str(row)] = bench
-        row += 1
-
-    ws['A' + str(row)] = 'Total'
-    ws['A' + str(row)].font = Font(bold=True)
+def benchmarkRows():
+    # Insert title and column titles
+    yield [bold('Benchmarks'), 'Benchmark Stats']
+    yield [None, 'Kernels', 'Scheduling Regions', 'Instructions', 'Average Region Size', 'Max Region Size']
 
     # Stats entry
-    col = 'B'
-    row = 1
-    ws[col + str(row)] = 'Benchmark Stats'
-    row = 2
-    ws[col+str(row)] = 'Kernels'
-    ws[chr(ord(col)+1)+str(row)] = 'Scheduling Regions'
-    ws[chr(ord(col)+2)+str(row)] = 'Instructions'
-    ws[chr(ord(col)+3)+str(row)] = 'Average Region Size'
-    ws[chr(ord(col)+4)+str(row)] = 'Max Region Size'
-
-    row = 3
     for bench in benchmarks:
-        ws[col+str(row)] = len(benchStats[bench]['kernels'])
-        ws[chr(ord(col)+1)+str(row)] = benchStats[bench]['regions']
-        ws[chr(ord(col)+2)+str(row)] = benchStats[bench]['inst']
-        ws[chr(ord(col)+3)+str(row)] = benchStats[bench]['average']
-        ws[chr(ord(col)+4)+str(row)] = benchStats[bench]['maxRegionSize']
-        row += 1
+        yield [bench, len(benchStats[bench]['kernels']), benchStats[bench]['regions'], benchStats[bench]['inst'],
+               benchStats[bench]['average'], benchStats[bench]['maxRegionSize']]
 
-    ws[col+str(row)] = cumulativeStats['totalKernels']
-    ws[chr(ord(col)+1)+str(row)] = cumulativeStats['totalRegions']
-    ws[chr(ord(col)+2)+str(row)] = cumulativeStats['totalInsts']
-    ws[chr(ord(col)+3)+str(row)] = cumulativeStats['averageRegionSize']
-    ws[chr(ord(col)+4)+str(row)] = cumulativeStats['maxRegionSize']
+    yield [bold('Total'), cumulativeStats['totalKernels'], cumulativeStats['totalRegions'],
+           cumulativeStats['totalInsts'], cumulativeStats['averageRegionSize'], cumulativeStats['maxRegionSize']]
 
-    wb.save(output)
+def createSpreadsheets(output):
+    write_sheets(output, [Sheet('Benchmark Stats', benchmarkRows())])
+
+def benchmarkRecords():
+    for bench in benchmarks:
+        yield {'benchmark': bench, 'kernels': len(benchStats[bench]['kernels']),
+               'regions': benchStats[bench]['regions'], 'instructions': benchStats[bench]['inst'],
+               'average_region_size': benchStats[bench]['average'],
+               'max_region_size': benchStats[bench]['maxRegionSize']}
 
 def main(args):
     # Start stats collection
@@ -214,6 +190,10 @@ def main(args):
     if not args.disable:
         createSpreadsheets(args.output)
 
+    if args.records:
+        write_records(args.records, benchmarkRecords(),
+                      ['benchmark', 'kernels', 'regions', 'instructions', 'average_region_size', 'max_region_size'])
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Script to extract benchmarks stats', \
                                       formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -226,7 +206,11 @@ if __name__ == '__main__':
     parser.add_argument('--output', '-o',
                         default='benchmarks-stats',
                         dest='output',
-                        help='Output spreadsheet filepath')
+                        help='Output spreadsheet filepath, .xlsx or .csv')
+
+    parser.add_argument('--records',
+                        dest='records',
+                        help='Also write the stats of every benchmark to this .csv or .parquet file')
 
     parser.add_argument('--disable', '-d',
                         action='store_true', default=False,
@@ -13,10 +13,14 @@ OUTPUT:
     average occupancy.
         Spreadsheet 1: occupancy.xlsx
 
+    With --records, the occupancy of every benchmark of every run is also
+    written as a row of a .csv or .parquet file.
+
 Requirements:
     - python3
     - pip3
-    - openpyxl (sreadsheet module, installed using pip3)
+    - openpyxl (sreadsheet module, installed using pip3), for .xlsx output
+    - pyarrow, for .parquet records
     - patch to print out occupancy
 
 HOW TO USE:
@@ -40,10 +44,12 @@ Example:
 
 import os
 import re
-from openpyxl import Workbook
-from openpyxl.styles import Font
+import sys
 import argparse
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sheets import Sheet, bold, write_records, write_sheets
+
 RE_OCCUPANCY = re.compile('Final occupancy for function (.*):(\d+)')
 
 # Contains all of the stats
@@ -159,53 +165,31 @@ def printStats():
         if kernel != 0:
             print('  Average: {:.2f}'.format(total/kernel))
 
-def createSpreadsheets(output):
-    if 'xls' not in output[-4:]:
-        output += '.xlsx'
-
-    # Create new excel worksheet
-    wb = Workbook()
-
-    # Grab the active worksheet
-    ws = wb.active
+def occupancyRows():
+    # Insert title and the name of each run
+    yield [bold('Benchmarks')] + [nameOfRun for nameOfRun in benchStats]
+    yield [None] + ['Occupancy' for nameOfRun in benchStats]
 
-    # Insert title and benchmark names
-    ws['A1'] = 'Benchmarks'
-    ws['A1'].font = Font(bold=True)
-
-    row = 3
+    # Stats entry, one column per test run
     for bench in benchmarks:
-        ws['A' + str(row)] = bench
-        row += 1
-
-    ws['A' + str(row)] = 'Average'
-    ws['A' + str(row)].font = Font(bold=True)
+        yield [bench] + [benchStats[nameOfRun][bench]['average'] for nameOfRun in benchStats]
 
-    # Stats entry
-    col = 'B'
+    row = [bold('Average')]
     for nameOfRun in benchStats:
-        row = 1
-        ws[col + str(row)] = nameOfRun
-        row = 2
-        ws[col+str(row)] = 'Occupancy'
-        row = 3
-
-        total = 0.0
-        kernel = 0
-        for bench in benchmarks:
-            ws[col+str(row)] = benchStats[nameOfRun][bench]['average']
-            total += benchStats[nameOfRun][bench]['total']
-            kernel += benchStats[nameOfRun][bench]['numKernel']
-            row += 1
-        ws[col+str(row)] = total/kernel
+        total = sum(benchStats[nameOfRun][bench]['total'] for bench in benchmarks)
+        kernel = sum(benchStats[nameOfRun][bench]['numKernel'] for bench in benchmarks)
+        row.append(total/kernel if kernel != 0 else None)
+    yield row
 
-        # Convert column char to ASCII value
-        # then increment it and convert
-        # back into char. Used to go to next
-        # column for next test run.
-        col = chr(ord(col)+1)
+def createSpreadsheets(output):
+    write_sheets(output, [Sheet('Occupancy', occupancyRows())])
 
-    wb.save(output)
+def occupancyRecords():
+    for nameOfRun in benchStats:
+        for bench in benchmarks:
+            stats = benchStats[nameOfRun][bench]
+            yield {'run': nameOfRun, 'benchmark': bench, 'kernels': stats['numKernel'],
+                   'occupancy': stats['average'] if stats['numKernel'] != 0 else None}
 
 def main(args):
     # Parse folders to ignore into a list
@@ -220,6 +204,9 @@ def main(args):
     if not args.disable:
         createSpreadsheets(args.output)
 
+    if args.records:
+        write_records(args.records, occupancyRecords(), ['run', 'benchmark', 'kernels', 'occupancy'])
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Script to extract occupancy data. \
                                      Requires patch to print occupancy.', \
@@ -233,7 +220,11 @@ if __name__ == '__main__':
     parser.add_argument('--output', '-o',
                         default='occupancy',
                         dest='output',
-                        help='Output spreadsheet filepath')
+                        help='Output spreadsheet filepath, .xlsx or .csv')
+
+    parser.add_argument('--records',
+                        dest='records',
+                        help='Also write the occupancy of every benchmark and run to this .csv or .parquet file')
 
     parser.add_argument('--disable', '-d',
                         action='store_true', default=False,
@@ -13,10 +13,14 @@ OUTPUT:
     This script takes in data from plaidbench runs and output a single spreadsheet.
         Spreadsheet 1: optsched-stats.xlsx
 
+    With --records, the stats of every benchmark in every pass are also
+    written as a row of a .csv or .parquet file.
+
 Requirements:
     - python3
     - pip3
-    - openpyxl (sreadsheet module, installed using pip3)
+    - openpyxl (sreadsheet module, installed using pip3), for .xlsx output
+    - pyarrow, for .parquet records
 
 HOW TO USE:
     1.) Run a plaidbench benchmarks with run-plaidbench.sh to generate a
@@ -36,16 +40,17 @@ Example:
 
 import os       # Used for scanning directories, getting paths, and checking files.
 import re
-from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.styles import Alignment
+import sys
 import argparse
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import block_pass_name, parse_events
+from sheets import Sheet, bold, right, write_records, write_sheets
+
 REGEX_DAG_INFO = re.compile(r'Processing DAG (.*) with (\d+) insts and max latency (\d+)')
 REGEX_LIST_OPTIMAL = re.compile(r'list schedule (.?)* is optimal')
 REGEX_COST_IMPROV = re.compile(r'cost imp=(\d+).')
 REGEX_OPTIMAL = re.compile(r'The schedule is optimal')
-REGEX_PASS_NUM = re.compile(r'End of (.*) pass through')
 
 # Contains all of the stats
 benchStats = {}
@@ -114,13 +119,9 @@ def parseStats(inputFolder):
                 log = file.read()
                 blocks = log.split('********** Opt Scheduling **********')[1:]
                 for block in blocks:
-                    # Get pass num, if none is found then
-                    # use third as default.
-                    getPass = REGEX_PASS_NUM.search(block)
-                    if getPass:
-                        passNum = getPass.group(1)
-                    else:
-                        passNum = "third"
+                    # Get pass num from the PassFinished event, if
+                    # none is found then use third as default.
+                    passNum = block_pass_name(parse_events(block)) or 'third'
 
                     stats[passNum]['TotalProcessed'] += 1
 
@@ -196,127 +197,84 @@ def printStats():
         for stat in passStats[passNum]:
             print('    {} : {}'.format(stat, passStats[passNum][stat]))
 
-def writeBenchmarkNames(ws, row):
-    for bench in benchmarks:
-        ws['A' + str(row)] = bench
-        row += 1
-    ws['A' + str(row)] = 'Overall'
-    ws['A' + str(row)].font = Font(bold=True)
-
-def createSpreadsheets(output):
-    if 'xls' not in output[-4:]:
-        output += '.xlsx'
-
-    # Create new excel worksheet
-    wb = Workbook()
-
-    # Grab the active worksheet
-    ws = wb.active
+# Column titles of the stats
+statTitles = [
+    'Regions processed',
+    'Passed to B&B',
+    'Optimal and improved',
+    'Optimal and not improved',
+    'Timed out and improved',
+    'Timed out and not improved',
+    'Avg. Region size passed to B&B',
+    'Largest optimal region',
+    'Largest improved region',
+]
 
+# Format a count with its percentage of the total
+def percentCell(count, total):
+    return right(str(count) + ' ({:.2f}%)'.format(float(count) / total * 100.0))
+
+# The cells of the regions passed to B&B and their outcomes
+def enumCells(stats):
+    return [percentCell(stats['OptImpr'], stats['EnumCnt']),
+            percentCell(stats['OptNotImpr'], stats['EnumCnt']),
+            percentCell(stats['TimeoutImpr'], stats['EnumCnt']),
+            percentCell(stats['TimeoutNotImpr'], stats['EnumCnt']),
+            right(stats['AverageSizeToEnum']),
+            right(stats['LargestOptimalRegion']),
+            right(stats['LargestImprovedRegion'])]
+
+def optschedRows():
     # Insert column titles
-    ws['A1'] = 'Benchmarks'
-    ws['A1'].font = Font(bold=True)
-    col = 'B'
-    row = 1
-    ws[col + str(row)] = 'Benchmark Stats'
-    row = 2
-    ws[col+str(row)] = 'Regions processed'
-    ws[chr(ord(col)+1)+str(row)] = 'Passed to B&B'
-    ws[chr(ord(col)+2)+str(row)] = 'Optimal and improved'
-    ws[chr(ord(col)+3)+str(row)] = 'Optimal and not improved'
-    ws[chr(ord(col)+4)+str(row)] = 'Timed out and improved'
-    ws[chr(ord(col)+5)+str(row)] = 'Timed out and not improved'
-    ws[chr(ord(col)+6)+str(row)] = 'Avg. Region size passed to B&B'
-    ws[chr(ord(col)+7)+str(row)] = 'Largest optimal region'
-    ws[chr(ord(col)+8)+str(row)] = 'Largest improved region'
-
-    # Stats entry
-    row = 3
+    yield [bold('Benchmarks'), 'Benchmark Stats']
+
+    first = True
     for passNum in passes:
         # Skip pass if there is no data.
         if passStats[passNum]['TotalProcessed'] == 0:
             continue
 
         # Identify each pass if data set is from 2-pass
-        # scheduler.
-        if not passNum == 'third':
-            ws['A'+str(row-1)] = passNum.capitalize() + ' Pass'
-            ws['A'+str(row-1)].font = Font(bold=True)
-
-        writeBenchmarkNames(ws, row)
+        # scheduler. The first label goes next to the
+        # column titles, the others below a blank row.
+        label = bold(passNum.capitalize() + ' Pass') if not passNum == 'third' else None
+        if first:
+            yield [label] + statTitles
+            first = False
+        else:
+            yield []
+            yield [label]
 
         # Write individual benchmark stats
         for bench in benchmarks:
-            ws[col+str(row)] = benchStats[bench][passNum]['TotalProcessed']
-            ws[col+str(row)].alignment = Alignment(horizontal='right')
-            if benchStats[bench][passNum]['EnumCnt'] != 0:
-                enumCntPcnt = float(benchStats[bench][passNum]['EnumCnt']) / benchStats[bench][passNum]['TotalProcessed'] * 100.0
-                ws[chr(ord(col)+1)+str(row)] = str(benchStats[bench][passNum]['EnumCnt']) + ' ({:.2f}%)'.format(enumCntPcnt)
-                ws[chr(ord(col)+1)+str(row)].alignment = Alignment(horizontal='right')
-
-                enumCntPcnt = float(benchStats[bench][passNum]['OptImpr']) / benchStats[bench][passNum]['EnumCnt'] * 100.0
-                ws[chr(ord(col)+2)+str(row)] = str(benchStats[bench][passNum]['OptImpr']) + ' ({:.2f}%)'.format(enumCntPcnt)
-                ws[chr(ord(col)+2)+str(row)].alignment = Alignment(horizontal='right')
-
-                enumCntPcnt = float(benchStats[bench][passNum]['OptNotImpr']) / benchStats[bench][passNum]['EnumCnt'] * 100.0
-                ws[chr(ord(col)+3)+str(row)] = str(benchStats[bench][passNum]['OptNotImpr']) + ' ({:.2f}%)'.format(enumCntPcnt)
-                ws[chr(ord(col)+3)+str(row)].alignment = Alignment(horizontal='right')
-
-                enumCntPcnt = float(benchStats[bench][passNum]['TimeoutImpr']) / benchStats[bench][passNum]['EnumCnt'] * 100.0
-                ws[chr(ord(col)+4)+str(row)] = str(benchStats[bench][passNum]['TimeoutImpr']) + ' ({:.2f}%)'.format(enumCntPcnt)
-                ws[chr(ord(col)+4)+str(row)].alignment = Alignment(horizontal='right')
-
-                enumCntPcnt = float(benchStats[bench][passNum]['TimeoutNotImpr']) / benchStats[bench][passNum]['EnumCnt'] * 100.0
-                ws[chr(ord(col)+5)+str(row)] = str(benchStats[bench][passNum]['TimeoutNotImpr']) + ' ({:.2f}%)'.format(enumCntPcnt)
-                ws[chr(ord(col)+5)+str(row)].alignment = Alignment(horizontal='right')
-
-                ws[chr(ord(col)+6)+str(row)] = benchStats[bench][passNum]['AverageSizeToEnum']
-                ws[chr(ord(col)+6)+str(row)].alignment = Alignment(horizontal='right')
-
-                ws[chr(ord(col)+7)+str(row)] = benchStats[bench][passNum]['LargestOptimalRegion']
-                ws[chr(ord(col)+7)+str(row)].alignment = Alignment(horizontal='right')
-
-                ws[chr(ord(col)+8)+str(row)] = benchStats[bench][passNum]['LargestImprovedRegion']
-                ws[chr(ord(col)+8)+str(row)].alignment = Alignment(horizontal='right')
-
-            row += 1
+            stats = benchStats[bench][passNum]
+            row = [bench, right(stats['TotalProcessed'])]
+            if stats['EnumCnt'] != 0:
+                row += [percentCell(stats['EnumCnt'], stats['TotalProcessed'])] + enumCells(stats)
+            yield row
 
         # Write overall stats
-        ws[col+str(row)] = passStats[passNum]['TotalProcessed']
-        enumCntPcnt = float(passStats[passNum]['EnumCnt']) / passStats[passNum]['TotalProcessed'] * 100.0
-        ws[chr(ord(col)+1)+str(row)] = str(passStats[passNum]['EnumCnt']) + ' ({:.2f}%)'.format(enumCntPcnt)
-        ws[chr(ord(col)+1)+str(row)].alignment = Alignment(horizontal='right')
-
-        if passStats[passNum]['EnumCnt'] != 0:
-            enumCntPcnt = float(passStats[passNum]['OptImpr']) / passStats[passNum]['EnumCnt'] * 100.0
-            ws[chr(ord(col)+2)+str(row)] = str(passStats[passNum]['OptImpr']) + ' ({:.2f}%)'.format(enumCntPcnt)
-            ws[chr(ord(col)+2)+str(row)].alignment = Alignment(horizontal='right')
-
-            enumCntPcnt = float(passStats[passNum]['OptNotImpr']) / passStats[passNum]['EnumCnt'] * 100.0
-            ws[chr(ord(col)+3)+str(row)] = str(passStats[passNum]['OptNotImpr']) + ' ({:.2f}%)'.format(enumCntPcnt)
-            ws[chr(ord(col)+3)+str(row)].alignment = Alignment(horizontal='right')
-
-            enumCntPcnt = float(passStats[passNum]['TimeoutImpr']) / passStats[passNum]['EnumCnt'] * 100.0
-            ws[chr(ord(col)+4)+str(row)] = str(passStats[passNum]['TimeoutImpr']) + ' ({:.2f}%)'.format(enumCntPcnt)
-            ws[chr(ord(col)+4)+str(row)].alignment = Alignment(horizontal='right')
-
-            enumCntPcnt = float(passStats[passNum]['TimeoutNotImpr']) / passStats[passNum]['EnumCnt'] * 100.0
-            ws[chr(ord(col)+5)+str(row)] = str(passStats[passNum]['TimeoutNotImpr']) + ' ({:.2f}%)'.format(enumCntPcnt)
-            ws[chr(ord(col)+5)+str(row)].alignment = Alignment(horizontal='right')
+        stats = passStats[passNum]
+        row = [bold('Overall'), stats['TotalProcessed'], percentCell(stats['EnumCnt'], stats['TotalProcessed'])]
+        if stats['EnumCnt'] != 0:
+            row += enumCells(stats)
+        yield row
 
-            ws[chr(ord(col)+6)+str(row)] = passStats[passNum]['AverageSizeToEnum']
-            ws[chr(ord(col)+6)+str(row)].alignment = Alignment(horizontal='right')
+    if first:
+        yield [None] + statTitles
 
-            ws[chr(ord(col)+7)+str(row)] = passStats[passNum]['LargestOptimalRegion']
-            ws[chr(ord(col)+7)+str(row)].alignment = Alignment(horizontal='right')
-
-            ws[chr(ord(col)+8)+str(row)] = passStats[passNum]['LargestImprovedRegion']
-            ws[chr(ord(col)+8)+str(row)].alignment = Alignment(horizontal='right')
-
-        # Prepare to write for next pass if there is any.
-        row += 3
+def createSpreadsheets(output):
+    write_sheets(output, [Sheet('OptSched Stats', optschedRows())])
 
-    wb.save(output)
+def optschedRecords():
+    for passNum in passes:
+        for bench in benchmarks:
+            stats = benchStats[bench][passNum]
+            if stats['TotalProcessed'] == 0:
+                continue
+            record = {'benchmark': bench, 'pass': 'first' if passNum == 'third' else passNum}
+            record.update(stats)
+            yield record
 
 def main(args):
     # Start stats collection
@@ -328,6 +286,11 @@ def main(args):
     if not args.disable:
         createSpreadsheets(args.output)
 
+    if args.records:
+        write_records(args.records, optschedRecords(),
+                      ['benchmark', 'pass'] + statsProcessed +
+                      ['AverageSizeToEnum', 'LargestOptimalRegion', 'LargestImprovedRegion'])
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Script to extract OptSched stats', \
                                       formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -340,7 +303,11 @@ if __name__ == '__main__':
     parser.add_argument('--output', '-o',
                         default='optsched-stats',
                         dest='output',
-                        help='Output spreadsheet filepath')
+                        help='Output spreadsheet filepath, .xlsx or .csv')
+
+    parser.add_argument('--records',
+                        dest='records',
+                        help='Also write the stats of every benchmark and pass to this .csv or .parquet file')
 
     parser.add_argument('--disable', '-d',
                         action='store_true', default=False,
@@ -13,10 +13,14 @@ OUTPUT:
     average schedule length.
         Spreadsheet 1: schedule-length.xlsx
 
+    With --records, the schedule lengths of every benchmark of every run are
+    also written as a row of a .csv or .parquet file.
+
 Requirements:
     - python3
     - pip3
-    - openpyxl (sreadsheet module, installed using pip3)
+    - openpyxl (sreadsheet module, installed using pip3), for .xlsx output
+    - pyarrow, for .parquet records
 
 HOW TO USE:
     1.) Run a plaidbench benchmarks with run-plaidbench.sh to generate a
@@ -39,16 +43,18 @@ Example:
 
 import os
 import re
+import sys
 import argparse
-from openpyxl import Workbook
-from openpyxl.styles import Font
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import block_pass_name, parse_events
+from sheets import Sheet, bold, write_records, write_sheets
 
 # For AMD
 RE_DAG_NAME = re.compile(r'Processing DAG (.*) with')
 RE_SCHED_LENGTH = re.compile(r'The list schedule is of length (\d+) and')
 
 # For OptSched
-RE_PASS_NUM = re.compile(r'End of (.*) pass through')
 RE_DAG_INFO = re.compile(r'INFO: Best schedule for DAG (.*) has cost (\d+) and length (\d+). The schedule is (.*) \(Time')
 
 # Contains all of the stats
@@ -132,11 +138,8 @@ def parseStats(inputFolder, ignoreFolders):
 
                         # Skip first pass because it isn't the
                         # final schedule
-                        getPassNum = RE_PASS_NUM.search(block)
-                        if getPassNum:
-                            passNum = getPassNum.group(1)
-                            if passNum == 'first':
-                                continue
+                        if block_pass_name(parse_events(block)) == 'first':
+                            continue
 
                         # First check if B&B is enabled because
                         # with B&B enabled, the final output will
@@ -181,52 +184,39 @@ def printStats():
         print('  Overall Average : {:0.2f} Overall Max : {}'.format(cumulativeStats[nameOfRun]['average'],
                                                      cumulativeStats[nameOfRun]['maxLength']))
 
-def createSpreadsheets(output):
-    if 'xls' not in output[-4:]:
-        output += '.xlsx'
-
-    # Create new excel worksheet
-    wb = Workbook()
-
-    # Grab the active worksheet
-    ws = wb.active
-
-    # Insert title and benchmark names
-    ws['A1'] = 'Benchmarks'
-    ws['A1'].font = Font(bold=True)
+def schedLengthRows():
+    # Insert title and the name of each run above its two columns
+    row = [bold('Benchmarks')]
+    for nameOfRun in benchStats:
+        row += [nameOfRun, None]
+    yield row
+    yield [None] + ['Average Sched. Length', 'Max Sched. Length'] * len(benchStats)
 
-    row = 3
+    # Stats entry, two columns per test run
     for bench in benchmarks:
-        ws['A' + str(row)] = bench
-        row += 1
+        row = [bench]
+        for nameOfRun in benchStats:
+            # Runs without a log for the benchmark leave its cells empty
+            stats = benchStats[nameOfRun].get(bench)
+            row += [stats['average'], stats['maxLength']] if stats else [None, None]
+        yield row
+
+    row = [bold('Overall')]
+    for nameOfRun in benchStats:
+        row += [cumulativeStats[nameOfRun]['average'], cumulativeStats[nameOfRun]['maxLength']]
+    yield row
 
-    ws['A' + str(row)] = 'Overall'
-    ws['A' + str(row)].font = Font(bold=True)
+def createSpreadsheets(output):
+    write_sheets(output, [Sheet('Schedule Length', schedLengthRows())])
 
-    # Stats entry
-    col = 'B'
+def schedLengthRecords():
     for nameOfRun in benchStats:
-        row = 1
-        ws[col + str(row)] = nameOfRun
-        row = 2
-        ws[col+str(row)] = 'Average Sched. Length'
-        ws[chr(ord(col)+1)+str(row)] = 'Max Sched. Length'
-
-        row = 3
         for bench in benchmarks:
-            ws[col+str(row)] = benchStats[nameOfRun][bench]['average']
-            ws[chr(ord(col)+1)+str(row)] = benchStats[nameOfRun][bench]['maxLength']
-            row += 1
-        ws[col+str(row)] = cumulativeStats[nameOfRun]['average']
-        ws[chr(ord(col)+1)+str(row)] = cumulativeStats[nameOfRun]['maxLength']
-
-        # Convert column char to ASCII value
-        # then increment it and convert
-        # back into char. Used to go to next
-        # column for next test run.
-        col = chr(ord(col)+2)
-
-    wb.save(output)
+            if bench not in benchStats[nameOfRun]:
+                continue
+            stats = benchStats[nameOfRun][bench]
+            yield {'run': nameOfRun, 'benchmark': bench, 'regions': stats['numRegions'],
+                   'average_length': stats['average'], 'max_length': stats['maxLength']}
 
 def main(args):
     # Parse folders to ignore into a list
@@ -241,6 +231,10 @@ def main(args):
     if not args.disable:
         createSpreadsheets(args.output)
 
+    if args.records:
+        write_records(args.records, schedLengthRecords(),
+                      ['run', 'benchmark', 'regions', 'average_length', 'max_length'])
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Script to extract average schedule length.',
                                       formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -253,7 +247,11 @@ if __name__ == '__main__':
     parser.add_argument('--output', '-o',
                         default='schedule-length',
                         dest='output',
-                        help='Output spreadsheet filepath')
+                        help='Output spreadsheet filepath, .xlsx or .csv')
+
+    parser.add_argument('--records',
+                        dest='records',
+                        help='Also write the schedule lengths of every benchmark and run to this .csv or .parquet file')
 
     parser.add_argument('--disable', '-d',
                         action='store_true', default=False,
@@ -30,6 +30,9 @@ import re
 import os
 import argparse
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readlogs import block_pass_name, parse_events
+
 # List of benchmark names
 benchmarks = [
     'densenet121',
@@ -50,8 +53,6 @@ benchmarks = [
 # Parse for DAG stats
 RE_DAG_COST_LOWER_BOUND = re.compile(r'Lower bound of cost before scheduling: (\d+)')
 RE_DAG_COST = re.compile(r'INFO: Best schedule for DAG (.*) has cost (\d+) and length (\d+). The schedule is (.*) \(Time')
-# Parse for passthrough number
-RE_PASS_NUM = re.compile(r'End of (.*) pass through')
 
 # Store DAGs stats for each benchmark and passes
 dags = []
@@ -195,9 +196,8 @@ def main(args):
                 log = logfile.read()
                 blocks = log.split('********** Opt Scheduling **********')[1:]
                 for block in blocks:
-                    # Get pass num
-                    getPass = RE_PASS_NUM.search(block)
-                    passNum = getPass.group(1)
+                    # Get pass num from the PassFinished event
+                    passNum = block_pass_name(parse_events(block))
 
                     # Get DAG stats
                     dagLwrBound = RE_DAG_COST_LOWER_BOUND.search(block)
@@ -1,10 +1,23 @@
-import json
+import multiprocessing
+import os
+import re
+import struct
+from collections import OrderedDict
+
+from . import profiling
+from .schema import decode_event
+from .shards import is_sharded_log_dir, shard_files, shard_log_name
 
 def split_blocks(log):
     '''
     Splits the log into the individual blocks.
     '''
-    return log.split("INFO: ********** Opt Scheduling **********")[1:]
+    with profiling.phase('split'):
+        blocks = log.split("INFO: ********** Opt Scheduling **********")
+    if profiling.profiling_enabled():
+        profiling.count('blocks', len(blocks) - 1)
+        profiling.count('events_skipped', ('\n' + blocks[0]).count('\nEVENT:'))
+    return blocks[1:]
 
 def parse_events(block_log):
     '''
@@ -15,15 +28,20 @@ def parse_events(block_log):
 
     If there is only one event of each id, pass the result through
     `parse_as_singular_events(...)` to unwrap the lists.
+
+    The events are decoded with the decoders of their schemas, see
+    readlogs.schema.
     '''
-    lines = block_log.splitlines()
-    event_lines = [line.split(' ', 1)[1] for line in lines if line.startswith('EVENT:')]
-    parsed = list(map(json.loads, event_lines))
-    result = dict()
+    with profiling.phase('decode'):
+        lines = block_log.splitlines()
+        event_lines = [line.split(' ', 1)[1] for line in lines if line.startswith('EVENT:')]
+        parsed = list(map(decode_event, event_lines))
+        result = dict()
 
-    for log in parsed:
-        result.setdefault(log['event_id'], []).append(log)
+        for log in parsed:
+            result.setdefault(log['event_id'], []).append(log)
 
+    profiling.count('events_decoded', len(parsed))
     return result
 
 def parse_blocks(log):
@@ -32,6 +50,168 @@ def parse_blocks(log):
     '''
     return [parse_events(block) for block in split_blocks(log)]
 
+# The binary event log written with EVENT_LOG_FORMAT BINARY, see
+# Logger::SetBinaryEventStream().
+BINARY_EVENT_MAGIC = b'OSEV'
+BINARY_EVENT_SUFFIX = '.bin'
+# The files which read_log_blocks() reads from a directory of logs.
+LOG_SUFFIXES = ('.log', BINARY_EVENT_SUFFIX)
+BINARY_EVENT_VERSION = 1
+_BIN_HEADER = struct.Struct('<4sH')
+_BIN_RECORD = struct.Struct('<BI')
+_BIN_EVENT = struct.Struct('<Iq')
+_BIN_ATTR = struct.Struct('<IB')
+_BIN_UINT32 = struct.Struct('<I')
+_BIN_VALUES = [struct.Struct('<q'), struct.Struct('<Q'), None, struct.Struct('<?')]
+_BIN_STRING, _BIN_EVENT_RECORD = 1, 2
+_BIN_CSTR = 2
+
+def is_binary_event_log(data):
+    '''
+    Returns whether the contents of a log file are a binary event log.
+    '''
+    return data[:len(BINARY_EVENT_MAGIC)] == BINARY_EVENT_MAGIC
+
+def parse_binary_events(data):
+    '''
+    Decodes a binary event log into the list of its events, each in the form
+    of the JSON of an `EVENT:` line.
+    '''
+    magic, version = _BIN_HEADER.unpack_from(data, 0)
+    if magic != BINARY_EVENT_MAGIC or version != BINARY_EVENT_VERSION:
+        raise ValueError('Not a version {} binary event log'.format(BINARY_EVENT_VERSION))
+
+    with profiling.phase('decode'):
+        events = _parse_binary_events(data)
+    profiling.count('events_decoded', len(events))
+    return events
+
+def _parse_binary_events(data):
+    strings = []
+    events = []
+    pos = _BIN_HEADER.size
+    end = len(data)
+    while pos + _BIN_RECORD.size <= end:
+        kind, size = _BIN_RECORD.unpack_from(data, pos)
+        pos += _BIN_RECORD.size
+        record_end = pos + size
+        if record_end > end:
+            # The compiler died while writing the record.
+            profiling.count('events_skipped')
+            break
+        if kind == _BIN_STRING:
+            strings.append(data[pos + 4:record_end].decode('utf-8'))
+        elif kind == _BIN_EVENT_RECORD:
+            event_id, time = _BIN_EVENT.unpack_from(data, pos)
+            event = {'event_id': strings[event_id]}
+            pos += _BIN_EVENT.size
+            while pos < record_end:
+                key, type_ = _BIN_ATTR.unpack_from(data, pos)
+                pos += _BIN_ATTR.size
+                if type_ == _BIN_CSTR:
+                    length, = _BIN_UINT32.unpack_from(data, pos)
+                    pos += 4
+                    event[strings[key]] = data[pos:pos + length].decode('utf-8')
+                    pos += length
+                else:
+                    value = _BIN_VALUES[type_]
+                    event[strings[key]], = value.unpack_from(data, pos)
+                    pos += value.size
+            event['time'] = time
+            events.append(event)
+        pos = record_end
+    return events
+
+def parse_binary_blocks(data):
+    '''
+    Like parse_blocks() for a binary event log. The log has no block
+    separators, so every block starts at a `ProcessDag` event.
+    '''
+    events = parse_binary_events(data)
+    with profiling.phase('split'):
+        blocks = []
+        skipped = 0
+        for event in events:
+            if event['event_id'] == 'ProcessDag':
+                blocks.append(dict())
+            if blocks:
+                blocks[-1].setdefault(event['event_id'], []).append(event)
+            else:
+                skipped += 1
+    profiling.count('blocks', len(blocks))
+    profiling.count('events_skipped', skipped)
+    return blocks
+
+def read_log_blocks(path):
+    '''
+    Reads a text log or a binary event log and returns its blocks as
+    parse_blocks() does. Of a sharded log directory, the blocks of all the
+    shards are returned, see read_logs().
+    '''
+    if os.path.isdir(path):
+        return [block for _, blocks in read_logs([path]) for block in blocks]
+    with profiling.phase('read'):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not is_binary_event_log(data):
+            data = data.decode('utf-8', 'replace')
+    profiling.count('bytes_read', len(data))
+    if isinstance(data, bytes):
+        return parse_binary_blocks(data)
+    return parse_blocks(data)
+
+def map_logs(function, paths, jobs=None):
+    '''
+    Yields `(path, function(path))` for every log file in `paths`, see
+    find_log_files(), in the order of the files. With more than one file, the
+    function runs in `jobs` processes at once, one per processor by default,
+    and has to be a module level function. The profiles of the processes are
+    added to the one of this process.
+    '''
+    files = find_log_files(paths, LOG_SUFFIXES)
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if jobs <= 1 or len(files) <= 1:
+        for path in files:
+            yield path, function(path)
+        return
+
+    pool = multiprocessing.Pool(min(jobs, len(files)), profiling.init_worker, (profiling.profiling_enabled(),))
+    try:
+        results = pool.imap(_profiled_job, [(function, path) for path in files])
+        for path in files:
+            result, profile = next(results)
+            profiling.merge_profile(profile)
+            yield path, result
+    finally:
+        # Also stops the processes when the caller stops early.
+        pool.terminate()
+        pool.join()
+
+def _profiled_job(job):
+    function, path = job
+    result = function(path)
+    return result, profiling.take_profile()
+
+def read_logs(paths, jobs=None):
+    '''
+    Yields `(path, blocks)` for every log file in `paths` with its blocks as
+    read_log_blocks() returns them. The files are read in several processes at
+    once, see map_logs(). The shards of a sharded log directory (see
+    readlogs.shards) are read log by log, and every shard keeps the blocks of
+    its functions in the order of the log.
+    '''
+    return map_logs(read_log_blocks, paths, jobs)
+
+def log_benchmark(path):
+    '''
+    Returns the benchmark of a log file: its name without the suffix, or the
+    name of the log a shard was cut from. A binary event log is written per
+    compiler process, as `events.<random>.bin`, so it is a benchmark of its
+    own.
+    '''
+    return shard_log_name(path) or os.path.splitext(os.path.basename(path))[0]
+
 def keep_only_singular_events(logs):
     '''
     Converts a the event `dict[event_id --> list[event-json]]` to
@@ -60,3 +240,242 @@ def parse_as_singular_events(logs):
     for k, v in logs.items():
         if len(v) != 1: raise AssertionError('Duplicate log events for event ' + k)
     return {k: v[0] for k, v in logs.items()}
+
+def block_duration(events):
+    '''
+    Returns the processor time in ms spent on a block, measured from its
+    `ProcessDag` event to its last event. Accepts both the list and the
+    singular form of the events from parse_events().
+    '''
+    def times(event):
+        return [e['time'] for e in event] if isinstance(event, list) else [event['time']]
+
+    start = min(times(events['ProcessDag']))
+    return max(max(times(event)) for event in events.values()) - start
+
+def block_metrics(events):
+    '''
+    Returns the outcome of a block as a `dict` with its final `cost` (including
+    the lower bound), processor `time` in ms, simulated `spills` and the
+    `improvement` of the cost over the heuristic. Takes the events in the
+    singular form.
+    '''
+    heuristic_cost = events['HeuristicResult']['cost'] if 'HeuristicResult' in events else 0
+    lower_bound = events['CostLowerBound']['cost'] if 'CostLowerBound' in events else 0
+    final_cost = events['BestResult']['cost'] if 'BestResult' in events else heuristic_cost
+    spills = events['LocalRegAllocSimulationChoice']['num_spills'] \
+        if 'LocalRegAllocSimulationChoice' in events else 0
+
+    return {
+        'cost': lower_bound + final_cost,
+        'time': block_duration(events),
+        'spills': spills,
+        'improvement': heuristic_cost - final_cost,
+    }
+
+def block_outcome(events):
+    '''
+    Classifies a block as `heuristic_optimal`, `optimal` (enumerated and
+    proven optimal), `timeout` or `not_enumerated`. Takes the events in the
+    singular form.
+    '''
+    if 'HeuristicResult' in events and events['HeuristicResult']['cost'] == 0:
+        return 'heuristic_optimal'
+    if 'DagSolvedOptimally' in events:
+        return 'optimal'
+    if 'DagTimedOut' in events:
+        return 'timeout'
+    return 'not_enumerated'
+
+# The passes of two-pass scheduling (USE_TWO_PASS), by the `num` of their
+# `PassFinished` events.
+PASS_NAMES = {1: 'first', 2: 'second'}
+
+def block_pass(events):
+    '''
+    Returns the pass of two-pass scheduling in which a block was scheduled, 1
+    or 2, or None if it was not scheduled in two passes. Accepts both the list
+    and the singular form of the events from parse_events().
+
+    The pass is taken from the `PassFinished` event which is logged once the
+    region of the block is done. A region which OptSched skips logs no block,
+    so its `PassFinished` ends up in the block before it; the first one in a
+    block is always its own.
+    '''
+    event = events.get('PassFinished')
+    if isinstance(event, list):
+        event = event[0]
+    return event['num'] if event else None
+
+def block_pass_name(events):
+    '''
+    Returns the name of the pass of a block, see block_pass(), or None.
+    '''
+    return PASS_NAMES.get(block_pass(events))
+
+def size_class(num_instructions, bounds):
+    '''
+    Returns the label of the region size class of `num_instructions`, such as
+    `50-99`, given the sorted sizes at which the classes start.
+    '''
+    lower = 0
+    for bound in bounds:
+        if num_instructions < bound:
+            return '{}-{}'.format(lower, bound - 1)
+        lower = bound
+    return '{}+'.format(lower)
+
+def size_class_key(label):
+    '''
+    Sort key for the labels returned by size_class().
+    '''
+    return int(label.split('-')[0].rstrip('+'))
+
+def read_region_passes(paths, jobs=None):
+    '''
+    Reads the logs at `paths` (see find_log_files()) and returns a
+    `dict[(benchmark, region name) --> dict[pass --> (events, metrics)]]` with
+    the events and block_metrics() of the block of every region in each pass
+    of two-pass scheduling, see block_pass(). The pass of a block scheduled
+    only once is None. The logs are read in `jobs` processes at once, see
+    map_logs().
+
+    The regions are told apart by their benchmark, see log_benchmark(), since
+    the same region name occurs in several benchmarks. A function compiled
+    more than once logs its regions again; only the first block of a region
+    in each pass is kept.
+    '''
+    regions = {}
+    for path, blocks in map_logs(_read_block_metrics, paths, jobs):
+        benchmark = log_benchmark(path)
+        for name, events, metrics in blocks:
+            passes = regions.setdefault((benchmark, name), {})
+            passes.setdefault(block_pass(events), (events, metrics))
+    return regions
+
+def read_region_metrics(paths, jobs=None):
+    '''
+    Reads the logs at `paths` and returns a
+    `dict[(benchmark, region name) --> (events of the first block, metrics)]`
+    with the block_metrics() of every region, see read_region_passes().
+
+    With two-pass scheduling a region is scheduled in both passes; the times
+    of the passes are added up while the other metrics are taken from the
+    last pass.
+    '''
+    regions = {}
+    for region, passes in read_region_passes(paths, jobs).items():
+        blocks = [passes[num] for num in sorted(passes, key=lambda num: num or 0)]
+        metrics = dict(blocks[-1][1])
+        metrics['time'] = sum(block[1]['time'] for block in blocks)
+        regions[region] = (blocks[0][0], metrics)
+    return regions
+
+def _read_block_metrics(path):
+    blocks = []
+    for events in read_log_blocks(path):
+        events = keep_only_first_event(events)
+        if 'ProcessDag' in events:
+            blocks.append((events['ProcessDag']['name'], events, block_metrics(events)))
+    return blocks
+
+RE_DAT_BENCH = re.compile(r'^(\S+):\s*$')
+RE_DAT_FUNCTION = re.compile(r'^\s+(-?\d+) (\S+)')
+RE_DAT_TIME = re.compile(r'^\s*(\S+):\s*(-?\d+) seconds')
+RE_DAT_USAGE = re.compile(r'user\s+([\d.]+) s\s+sys\s+([\d.]+) s\s+max rss\s+(\d+) KiB'
+                          r'\s+read\s+(\d+) blocks\s+written\s+(\d+) blocks')
+
+def parse_spills_dat(text):
+    '''
+    Parses a `spills.dat` or `weighted-spills.dat` file written by the runspec
+    wrapper into a `OrderedDict[benchmark --> OrderedDict[function --> spills]]`.
+
+    Sum and total lines are skipped, as is anything else which does not look
+    like a benchmark header or a function line.
+    '''
+    result = OrderedDict()
+    bench = None
+    for line in text.splitlines():
+        match = RE_DAT_FUNCTION.match(line)
+        if match and bench is not None:
+            bench[match.group(2)] = int(match.group(1))
+            continue
+
+        match = RE_DAT_BENCH.match(line)
+        if match and match.group(1) != 'Total':
+            bench = result.setdefault(match.group(1), OrderedDict())
+
+    return result
+
+def parse_times_dat(text):
+    '''
+    Parses a `times.dat` file written by the runspec wrapper into a
+    `OrderedDict[benchmark --> seconds]`, excluding the total.
+    '''
+    result = OrderedDict()
+    for line in text.splitlines():
+        match = RE_DAT_TIME.match(line)
+        if match and match.group(1) != 'Total':
+            result[match.group(1)] = int(match.group(2))
+    return result
+
+def format_usage(usage):
+    '''
+    Formats the resource usage of a benchmark build, a `dict` with the `user`
+    and `sys` seconds, the `max_rss` in KiB and the `read_blocks` and
+    `written_blocks`, the way the runspec wrappers append it to the lines of
+    `times.dat`.
+    '''
+    return '  user %9.1f s  sys %8.1f s  max rss %9d KiB  read %9d blocks  written %9d blocks' % (
+        usage['user'], usage['sys'], usage['max_rss'], usage['read_blocks'], usage['written_blocks'])
+
+def parse_times_dat_usage(text):
+    '''
+    Parses the resource usage in a `times.dat` file into a
+    `OrderedDict[benchmark --> usage dict]` (see format_usage()), including
+    the `Total`. Benchmarks without usage information are left out.
+    '''
+    result = OrderedDict()
+    for line in text.splitlines():
+        match = RE_DAT_TIME.match(line)
+        usage = RE_DAT_USAGE.search(line)
+        if match and usage:
+            result[match.group(1)] = {
+                'user': float(usage.group(1)),
+                'sys': float(usage.group(2)),
+                'max_rss': int(usage.group(3)),
+                'read_blocks': int(usage.group(4)),
+                'written_blocks': int(usage.group(5)),
+            }
+    return result
+
+def total_usage(usages):
+    '''
+    Combines the usage of several builds: times and I/O add up, while the
+    `max_rss` is the largest one.
+    '''
+    total = {'user': 0.0, 'sys': 0.0, 'max_rss': 0, 'read_blocks': 0, 'written_blocks': 0}
+    for usage in usages:
+        for key in total:
+            if key == 'max_rss':
+                total[key] = max(total[key], usage[key])
+            else:
+                total[key] += usage[key]
+    return total
+
+def find_log_files(paths, suffix='.log'):
+    '''
+    Expands the given list of log files and directories into a sorted list of
+    log files. Directories contribute every file ending in `suffix`, which can
+    also be a tuple of suffixes, and sharded log directories their shards.
+    '''
+    result = []
+    for path in paths:
+        if is_sharded_log_dir(path):
+            result += shard_files(path)
+        elif os.path.isdir(path):
+            result += sorted(os.path.join(path, f) for f in os.listdir(path)
+                             if f.endswith(suffix) and os.path.isfile(os.path.join(path, f)))
+        else:
+            result.append(path)
+    return result
@@ -0,0 +1,173 @@
+'''
+Phase timers and counters for the log readers, enabled with `--profile`.
+
+readlogs times the phases it runs itself:
+
+    read      reading the log files
+    split     splitting the logs into blocks
+    decode    decoding the events of the blocks
+    write     writing the shards of a log, see readlogs.shards
+
+and counts the `bytes_read`, the `blocks`, the `events_decoded` and the
+`events_skipped` (the events outside of any block, and the records of a
+binary log which were cut off). The scripts time their own phases on top,
+such as `aggregate` and `report`, and can count anything else. The time of a
+phase does not include the phases inside it, so a script can put the whole
+reading of its logs into `aggregate` and still have the time of readlogs
+apart.
+
+When profiling is enabled, the summary is written to stderr at exit as a
+single line
+
+    PROFILE: {"total_seconds": ..., "phases": {"decode": {"seconds": ..., "calls": ...}, ...},
+              "counters": {...}}
+
+in which `other` is the time not spent in any phase. The phases handed over
+by worker processes (see take_profile()) add up the time of all the workers,
+so they can exceed the total. Disabled, the timers cost a function call.
+'''
+
+import atexit
+import json
+import sys
+import time
+
+_clock = getattr(time, 'perf_counter', time.time)
+_enabled = False
+_start = None
+# phase --> [seconds, calls]
+_phases = {}
+_counters = {}
+# The phases entered and not yet left.
+_stack = []
+
+
+class _Phase(object):
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        now = _clock()
+        if _stack:
+            # The phase inside another one pauses it.
+            _stack[-1]._add(now)
+        _stack.append(self)
+        self.start = now
+        return self
+
+    def __exit__(self, *exc):
+        now = _clock()
+        self._add(now)
+        _phases[self.name][1] += 1
+        _stack.pop()
+        if _stack:
+            _stack[-1].start = now
+        return False
+
+    def _add(self, now):
+        _phases.setdefault(self.name, [0.0, 0])[0] += now - self.start
+
+
+class _NoPhase(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def profiling_enabled():
+    return _enabled
+
+
+def enable_profiling():
+    '''
+    Starts the timers and writes the summary to stderr at exit.
+    '''
+    global _enabled, _start
+    if _enabled:
+        return
+    _enabled = True
+    _start = _clock()
+    atexit.register(write_profile)
+
+
+def phase(name):
+    '''
+    A context manager which adds the time spent in it to the phase `name`.
+    The time of the phases inside it is not counted.
+    '''
+    return _Phase(name) if _enabled else _NO_PHASE
+
+
+def count(name, n=1):
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def profile_summary():
+    '''
+    Returns the summary which is written at exit as a `dict`.
+    '''
+    total = _clock() - _start if _enabled else 0.0
+    phases = dict((name, {'seconds': round(seconds, 6), 'calls': calls})
+                  for name, (seconds, calls) in _phases.items())
+    phases['other'] = {'seconds': round(max(0.0, total - sum(s for s, _ in _phases.values())), 6), 'calls': 1}
+    return {'total_seconds': round(total, 6), 'phases': phases, 'counters': dict(_counters)}
+
+
+def init_worker(enabled):
+    '''
+    The initializer of a worker process, which starts with no phases or
+    counters of its own, whatever it inherited from the parent.
+    '''
+    global _enabled
+    _enabled = enabled
+    del _stack[:]
+    _phases.clear()
+    _counters.clear()
+
+
+def take_profile():
+    '''
+    Returns the phases and counters so far and resets them, for a worker
+    process (see init_worker()) to hand them to the parent, which adds them
+    with merge_profile().
+    '''
+    taken = {'phases': dict(_phases), 'counters': dict(_counters)}
+    _phases.clear()
+    _counters.clear()
+    return taken
+
+
+def merge_profile(taken):
+    if not _enabled:
+        return
+    for name, (seconds, calls) in taken['phases'].items():
+        totals = _phases.setdefault(name, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += calls
+    for name, n in taken['counters'].items():
+        count(name, n)
+
+
+def write_profile(out=None):
+    out = out or sys.stderr
+    out.write('PROFILE: ' + json.dumps(profile_summary(), sort_keys=True) + '\n')
+    out.flush()
+
+
+def add_profile_option(parser):
+    '''
+    Adds `--profile` to an argparse or optparse parser.
+    '''
+    add = parser.add_argument if hasattr(parser, 'add_argument') else parser.add_option
+    add('--profile', action='store_true', default=False,
+        help='Time the phases of the run and write a summary to stderr at exit.')
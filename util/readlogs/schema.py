@@ -0,0 +1,139 @@
+'''
+Decoding of the `EVENT:` lines of scheduler logs.
+
+Every event has a fixed layout: the attributes that its `Logger::Event(...)`
+call site passes, in that order, followed by the `time`. EVENT_SCHEMAS lists
+the layout of every event, and for each one a decoder is compiled which picks
+the attributes out of the line with a single regular expression and converts
+them to their types, instead of parsing the line as JSON with the `json`
+module. Events which are not in the registry, or whose line does not have the
+expected layout, are still parsed as JSON.
+
+The JSON backend is the fastest of `orjson`, `ujson` and `json` which is
+installed, or the one chosen with use_json_backend(). The compiled decoders
+are faster than the `json` module but not than the other two, so they are only
+used with `json`.
+
+util/misc/check-event-schemas.py checks the registry against the call sites
+in the C++ sources.
+'''
+
+import importlib
+import re
+
+# `event_id --> ((attribute, type), ...)` in the order of the call site,
+# without the `event_id` and `time` which every event has. The types are
+# `int`, `bool` and `str`.
+EVENT_SCHEMAS = {
+    'ACOSchedComplete': (('cost', int), ('iterations', int), ('improvement', int)),
+    'AcoPostSchedComplete': (('cost', int), ('iterations', int), ('improvement', int)),
+    'BestLocalRegAllocSimulation': (('dag_name', str), ('num_spills', int), ('num_stores', int),
+                                    ('num_loads', int)),
+    'BestResult': (('name', str), ('cost', int), ('length', int), ('optimal', bool)),
+    'BypassZeroTimeLimit': (('cost', int),),
+    'CostLowerBound': (('cost', int),),
+    'DagSolvedOptimally': (('solution_time', int), ('length', int), ('spill_cost', int), ('total_cost', int),
+                           ('cost_improvement', int)),
+    'DagTimedOut': (('length', int), ('spill_cost', int), ('total_cost', int), ('cost_improvement', int)),
+    'Enumerating': (('target_length', int),),
+    'feasible_sched_found': (('length', int), ('spill_cost', int), ('cost', int)),
+    'GraphTransILPNodeSuperiority': (),
+    'GraphTransILPNodeSuperiorityFinished': (('superior_edges', int), ('removed_edges', int),
+                                             ('resource_edges', int)),
+    'GraphTransRPNodeSuperiority': (),
+    'GraphTransRPNodeSuperiorityFinished': (('superior_edges', int),),
+    'HeuristicLocalRegAllocSimulation': (('dag_name', str), ('num_spills', int), ('num_stores', int),
+                                         ('num_loads', int)),
+    'HeuristicResult': (('length', int), ('spill_cost', int), ('cost', int)),
+    'HeuristicScheduleOptimal': (('length', int), ('cost', int)),
+    'HistTableStats': (('hash_bits', int), ('buckets', int), ('entries', int), ('populated_buckets', int),
+                       ('max_chain', int), ('lookups', int), ('traversed_entries', int),
+                       ('domination_hits', int), ('memory_bytes', int)),
+    'LocalRegAllocSimulationChoice': (('dag_name', str), ('num_spills', int), ('num_stores', int),
+                                      ('num_loads', int)),
+    'MultiPassGraphTransRPNodeSuperiority': (),
+    'MultiPassGraphTransRPNodeSuperiorityFinished': (('superior_edges', int),),
+    'NodeExamineCount': (('num_nodes', int),),
+    'PassFinished': (('num', int),),
+    'ProcessDag': (('name', str), ('num_instructions', int), ('max_latency', int)),
+    'ScheduleVerifiedSuccessfully': (),
+    'SlilStats': (('name', str), ('static_lb', int), ('gap_size', int), ('is_enumerated', bool),
+                  ('is_optimal', bool), ('is_perp_higher', bool)),
+    'StaticLowerBoundDebugInfo': (('name', str), ('spill_cost_lb', int), ('sc_factor', int), ('length_lb', int),
+                                  ('len_factor', int), ('static_lb', int)),
+}
+
+# How Logger::Event() writes the values of each type, and how to convert them.
+_VALUE_PATTERNS = {int: r'(-?\d+)', bool: r'(true|false)', str: r'"([^"]*)"'}
+_CONVERSIONS = {int: 'int({})', bool: '{} == "true"', str: '{}'}
+_EVENT_PREFIX = '{"event_id": "'
+
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+json_backend = None
+json_loads = None
+_use_decoders = True
+
+
+def use_json_backend(name=None):
+    '''
+    Parses the events which have no decoder with the given JSON module, or the
+    first of JSON_BACKENDS which is installed if `name` is None.
+    '''
+    global json_backend, json_loads, _use_decoders
+    for backend in ([name] if name else JSON_BACKENDS):
+        try:
+            module = importlib.import_module(backend)
+        except ImportError:
+            if name:
+                raise
+            continue
+        json_backend = backend
+        json_loads = module.loads
+        _use_decoders = backend == 'json'
+        return
+
+
+use_json_backend()
+
+
+def compile_decoder(event_id, fields):
+    '''
+    Returns a function which decodes the JSON text of an `event_id` event with
+    the given fields into its `dict`, or returns None if the text does not
+    have the layout of the fields.
+    '''
+    pattern = re.escape(_EVENT_PREFIX + event_id + '"')
+    for key, type_ in fields:
+        pattern += re.escape(', "{}": '.format(key)) + _VALUE_PATTERNS[type_]
+    pattern += re.escape(', "time": ') + _VALUE_PATTERNS[int] + r'\}\s*$'
+
+    # A function per event, so that building the dict is a single expression.
+    items = ['"event_id": {!r}'.format(event_id)]
+    for i, (key, type_) in enumerate(fields + (('time', int),)):
+        items.append('{!r}: {}'.format(key, _CONVERSIONS[type_].format('g[{}]'.format(i))))
+    source = ('def decode(text, match=match):\n'
+              '    m = match(text)\n'
+              '    if m is None:\n'
+              '        return None\n'
+              '    g = m.groups()\n'
+              '    return {{{}}}\n'.format(', '.join(items)))
+    namespace = {'match': re.compile(pattern).match}
+    exec(source, namespace)
+    return namespace['decode']
+
+
+DECODERS = dict((event_id, compile_decoder(event_id, fields)) for event_id, fields in EVENT_SCHEMAS.items())
+
+
+def decode_event(text):
+    '''
+    Decodes the JSON text of an `EVENT:` line into its `dict`.
+    '''
+    if _use_decoders and text.startswith(_EVENT_PREFIX):
+        end = text.find('"', len(_EVENT_PREFIX))
+        decoder = DECODERS.get(text[len(_EVENT_PREFIX):end])
+        if decoder is not None:
+            event = decoder(text)
+            if event is not None:
+                return event
+    return json_loads(text)
@@ -0,0 +1,200 @@
+'''
+Sharding of scheduler logs by function, so that the functions of a log can be
+read in parallel.
+
+A log is cut into units at the block separators and at the `Function:`
+banners which LLVM writes at the end of a function. A block belongs to the
+function in the name of its `ProcessDag` event (`function:region`), a banner
+and the text after it to the function it names, and everything else to the
+function before it. The units of a function, or of all the functions which
+hash to the same bucket, are written to one shard in the order of the log, so
+that every shard is itself a log which the readers of readlogs can read.
+Binary event logs are written to text shards.
+
+A sharded log directory holds a directory of shards per log, named after the
+log, and a `manifest.json`:
+
+    {"version": 1, "buckets": null,
+     "logs": [{"log": "401.bzip2", "source": "logs/401.bzip2.log", "blocks": 1200,
+               "shards": [{"file": "401.bzip2/BZ2_compressBlock.log",
+                           "functions": ["BZ2_compressBlock"], "blocks": 80, "bytes": 51234},
+                          ...]},
+              ...]}
+
+find_log_files() expands a sharded log directory into its shards, which the
+readers of readlogs read at once in several processes, see map_logs().
+'''
+
+import json
+import os
+import re
+import zlib
+
+from . import profiling
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+SHARD_SUFFIX = '.log'
+# The shard of the text before the first function of a log.
+OTHER_SHARD = '_other'
+BLOCK_SEPARATOR = 'INFO: ********** Opt Scheduling **********'
+# Where a unit starts: a block separator, or a `Function:` banner together
+# with the line of stars above it.
+RE_UNIT_START = re.compile(r'^(?:' + re.escape(BLOCK_SEPARATOR) + r'|(?:\*+\n)?Function: (.*)$)', re.MULTILINE)
+RE_PROCESS_DAG = re.compile(r'"event_id": "ProcessDag", "name": "([^"]*)"')
+RE_UNSAFE = re.compile(r'[^\w.$-]')
+# The longest function name kept in a shard file name.
+MAX_SHARD_NAME = 80
+
+
+def region_function(name):
+    '''
+    Returns the function of a region named `function:region`.
+    '''
+    return name.rsplit(':', 1)[0]
+
+
+def split_functions(log):
+    '''
+    Cuts a text log into `list[(function, text)]` units, in order. The text
+    before the first function has the function ''. Joining the texts gives
+    back the log.
+    '''
+    units = []
+    function = ''
+    starts = list(RE_UNIT_START.finditer(log))
+    if not starts or starts[0].start() > 0:
+        units.append((function, log[:starts[0].start() if starts else len(log)]))
+    for i, match in enumerate(starts):
+        end = starts[i + 1].start() if i + 1 < len(starts) else len(log)
+        if match.group(1) is not None:
+            function = match.group(1).strip()
+        else:
+            # A block whose region is unknown stays with the function before it.
+            dag = RE_PROCESS_DAG.search(log, match.end(), end)
+            if dag:
+                function = region_function(dag.group(1))
+        units.append((function, log[match.start():end]))
+    return units
+
+
+def binary_log_text(data):
+    '''
+    Converts a binary event log to a text log with the `EVENT:` lines of its
+    events, and a block separator before every `ProcessDag` event.
+    '''
+    from . import parse_binary_events
+
+    lines = []
+    for event in parse_binary_events(data):
+        if event['event_id'] == 'ProcessDag':
+            lines.append(BLOCK_SEPARATOR)
+        # The events keep the order of their attributes, which is that of
+        # Logger::Event(): the event_id first and the time last.
+        lines.append('EVENT: {' + ', '.join('{}: {}'.format(json.dumps(key), json.dumps(value))
+                                            for key, value in event.items()) + '}')
+    return '\n'.join(lines) + '\n'
+
+
+def shard_name(function, buckets=None):
+    '''
+    Returns the name of the shard of `function`: its bucket out of `buckets`,
+    or the function itself made safe for a file name.
+    '''
+    if not function:
+        return OTHER_SHARD
+    if buckets:
+        return 'bucket-{:03d}'.format(_crc(function) % buckets)
+    name = RE_UNSAFE.sub('_', function)
+    if name != function or len(name) > MAX_SHARD_NAME or name == OTHER_SHARD:
+        # Tell apart the functions which are the same once made safe.
+        name = '{}.{:08x}'.format(name[:MAX_SHARD_NAME], _crc(function))
+    return name
+
+
+def _crc(function):
+    return zlib.crc32(function.encode('utf-8')) & 0xffffffff
+
+
+def shard_log(path, out_dir, name, buckets=None):
+    '''
+    Writes the shards of the log at `path` to `out_dir/name/` and returns its
+    entry in the manifest.
+    '''
+    from . import is_binary_event_log
+
+    with profiling.phase('read'):
+        with open(path, 'rb') as f:
+            data = f.read()
+    profiling.count('bytes_read', len(data))
+    with profiling.phase('split'):
+        if is_binary_event_log(data):
+            log = binary_log_text(data)
+        else:
+            log = data.decode('utf-8', 'replace')
+        shards = {}
+        for function, text in split_functions(log):
+            shard = shards.setdefault(shard_name(function, buckets), {'functions': [], 'texts': [], 'blocks': 0})
+            if function and function not in shard['functions']:
+                shard['functions'].append(function)
+            shard['texts'].append(text)
+            if text.startswith(BLOCK_SEPARATOR):
+                shard['blocks'] += 1
+
+    with profiling.phase('write'):
+        directory = os.path.join(out_dir, name)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        entry = {'log': name, 'source': path, 'blocks': 0, 'shards': []}
+        for shard in sorted(shards):
+            text = ''.join(shards[shard]['texts']).encode('utf-8')
+            file_name = os.path.join(name, shard + SHARD_SUFFIX)
+            with open(os.path.join(out_dir, file_name), 'wb') as f:
+                f.write(text)
+            entry['blocks'] += shards[shard]['blocks']
+            entry['shards'].append({'file': file_name, 'functions': shards[shard]['functions'],
+                                    'blocks': shards[shard]['blocks'], 'bytes': len(text)})
+    profiling.count('shards', len(shards))
+    return entry
+
+
+def write_manifest(out_dir, logs, buckets=None):
+    manifest = {'version': MANIFEST_VERSION, 'buckets': buckets, 'logs': logs}
+    temp = os.path.join(out_dir, MANIFEST_NAME + '.tmp')
+    with open(temp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.rename(temp, os.path.join(out_dir, MANIFEST_NAME))
+
+
+def is_sharded_log_dir(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def read_manifest(path):
+    '''
+    Returns the manifest of the sharded log directory at `path`.
+    '''
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError('{} is not a version {} shard manifest'.format(path, MANIFEST_VERSION))
+    return manifest
+
+
+def shard_files(path):
+    '''
+    Returns the paths of the shards in the sharded log directory at `path`,
+    log by log.
+    '''
+    return [os.path.join(path, shard['file']) for log in read_manifest(path)['logs'] for shard in log['shards']]
+
+
+def shard_log_name(path):
+    '''
+    Returns the name of the log which the shard at `path` was cut from, or
+    None if it is not a shard.
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    if is_sharded_log_dir(os.path.dirname(directory)):
+        return os.path.basename(directory)
+    return None
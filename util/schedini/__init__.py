@@ -0,0 +1,62 @@
+'''
+Helpers for reading and writing the OptSched configuration files
+(`sched.ini`, `hotfuncs.ini`).
+
+Both files use the format read by `Config::Load`: whitespace separated
+`NAME VALUE` pairs, where anything starting with `#` is a comment. Lists are
+written as a single comma-separated value.
+'''
+
+from collections import OrderedDict
+
+
+def parse_settings(text):
+    '''
+    Returns an `OrderedDict[name --> value]` of the settings in the given
+    configuration text. Later settings override earlier ones, like in
+    `Config::Load`.
+    '''
+    settings = OrderedDict()
+    for line in text.splitlines():
+        tokens = line.split('#', 1)[0].split()
+        if len(tokens) >= 2:
+            settings[tokens[0]] = tokens[1]
+    return settings
+
+
+def read_settings(path):
+    '''
+    Reads the configuration file at `path` via parse_settings().
+    '''
+    with open(path) as f:
+        return parse_settings(f.read())
+
+
+def update_settings(text, overrides):
+    '''
+    Returns the configuration text with the values of the settings in
+    `overrides` replaced, keeping all comments and the order of the file.
+    Settings which do not exist in the text are appended at the end.
+    '''
+    remaining = OrderedDict(overrides)
+    lines = []
+    for line in text.splitlines():
+        tokens = line.split('#', 1)[0].split()
+        if len(tokens) >= 2 and tokens[0] in overrides:
+            remaining.pop(tokens[0], None)
+            line = '{} {}'.format(tokens[0], overrides[tokens[0]])
+        lines.append(line)
+
+    for name, value in remaining.items():
+        lines.append('{} {}'.format(name, value))
+
+    return '\n'.join(lines) + '\n'
+
+
+
+def format_list(values):
+    '''
+    Formats a list setting such as `REGIONS_TO_SCHEDULE` the way
+    `Config::GetStringList` reads it.
+    '''
+    return ','.join(str(value) for value in values)
@@ -0,0 +1,162 @@
+'''
+Streaming export of result tables to spreadsheets, CSV and Parquet, shared by
+the plaidbench scripts.
+
+A script lays its results out as sheets: a title and the rows of the sheet,
+each a list of cell values, which are produced one at a time by a generator
+and written as they come. write_sheets() writes all the sheets of a script in
+one pass, to the format of the suffix of the output:
+
+    .xlsx   one workbook, written in the write-only mode of openpyxl
+    .csv    a file per sheet, <output>-<sheet title>.csv
+
+openpyxl only writes .xlsx, so an .xls output is rejected.
+
+Neither format keeps the sheets in memory, so a workbook with hundreds of
+runs takes no longer to write than to fill.
+
+write_records() writes the results in long form instead, a row per record
+(such as a benchmark of a run in a pass), to `.csv` or `.parquet` (with
+pyarrow), for the analyses which would have to read the spreadsheets back.
+
+openpyxl and pyarrow are only imported to write their formats.
+'''
+
+import csv
+import os
+import re
+
+SHEET_SUFFIXES = ('.xlsx', '.csv')
+RECORD_SUFFIXES = ('.csv', '.parquet')
+# Excel does not allow these in sheet titles, and limits them to 31 characters.
+RE_TITLE_UNSAFE = re.compile(r'[\[\]:*?/\\]')
+MAX_TITLE = 31
+
+
+class Cell(object):
+    '''
+    A cell value with a style, for the cells which are not plain values.
+    CSV only keeps the value.
+    '''
+    __slots__ = ('value', 'bold', 'right')
+
+    def __init__(self, value, bold=False, right=False):
+        self.value = value
+        self.bold = bold
+        self.right = right
+
+
+def bold(value):
+    return Cell(value, bold=True)
+
+
+def right(value):
+    return Cell(value, right=True)
+
+
+class Sheet(object):
+    '''
+    A sheet titled `title` with the given `rows`, an iterable of lists of
+    values or Cells which is consumed once. `None` leaves a cell empty.
+    `widths` maps column indexes to their widths in characters.
+    '''
+    def __init__(self, title, rows, widths=None):
+        self.title = title
+        self.rows = rows
+        self.widths = widths or {}
+
+
+def output_path(output, suffixes, default):
+    '''
+    Returns `output` with the suffix `default` added unless it already has
+    one of `suffixes`.
+    '''
+    if os.path.splitext(output)[1].lower() in suffixes:
+        return output
+    return output + default
+
+
+def write_sheets(output, sheets):
+    '''
+    Writes the sheets to `output`, to an .xlsx workbook unless it ends with
+    another of SHEET_SUFFIXES. Returns the paths written. Raises ValueError
+    for an .xls output, which openpyxl can not write.
+    '''
+    if output.lower().endswith('.xls'):
+        raise ValueError('Cannot write {}: .xls is not supported, use .xlsx or .csv'.format(output))
+    output = output_path(output, SHEET_SUFFIXES, '.xlsx')
+    if output.lower().endswith('.csv'):
+        return _write_csv_sheets(output, sheets)
+    _write_workbook(output, sheets)
+    return [output]
+
+
+def _write_workbook(output, sheets):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    styles = {}
+    for sheet in sheets:
+        ws = wb.create_sheet(RE_TITLE_UNSAFE.sub('_', sheet.title)[:MAX_TITLE])
+        # In write-only mode the widths have to be set before the rows.
+        for column, width in sheet.widths.items():
+            ws.column_dimensions[get_column_letter(column + 1)].width = width
+
+        def convert(value):
+            if not isinstance(value, Cell):
+                return value
+            cell = WriteOnlyCell(ws, value=value.value)
+            if value.bold:
+                cell.font = styles.setdefault('bold', Font(bold=True))
+            if value.right:
+                cell.alignment = styles.setdefault('right', Alignment(horizontal='right'))
+            return cell
+
+        for row in sheet.rows:
+            ws.append([convert(value) for value in row])
+    wb.save(output)
+
+
+def _write_csv_sheets(output, sheets):
+    stem = output[:-len('.csv')]
+    sheets = list(sheets)
+    paths = []
+    for sheet in sheets:
+        path = output if len(sheets) == 1 else '{}-{}.csv'.format(stem, re.sub(r'\W+', '-', sheet.title).strip('-'))
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            for row in sheet.rows:
+                writer.writerow(['' if value is None else value.value if isinstance(value, Cell) else value
+                                 for value in row])
+        paths.append(path)
+    return paths
+
+
+def write_records(output, records, fields):
+    '''
+    Writes the records, an iterable of `dict`s with the keys `fields`, to
+    `output`, a .csv file unless it ends with .parquet. Missing values are
+    `None`. Returns the path written.
+    '''
+    output = output_path(output, RECORD_SUFFIXES, '.csv')
+    if output.lower().endswith('.parquet'):
+        import pyarrow
+        import pyarrow.parquet
+
+        # Parquet is written by column, so the records are collected first.
+        columns = dict((field, []) for field in fields)
+        for record in records:
+            for field in fields:
+                columns[field].append(record.get(field))
+        pyarrow.parquet.write_table(pyarrow.table(columns), output)
+        return output
+
+    with open(output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fields, restval='', extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(dict((k, '' if v is None else v) for k, v in record.items()))
+    return output
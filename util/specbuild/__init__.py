@@ -0,0 +1,42 @@
+'''
+Helpers for running the benchmark builds of the runspec wrappers: limiting
+the memory of a build and measuring its resource usage.
+
+The usage is a `dict` with the `user` and `sys` seconds, the `max_rss` in KiB
+and the `read_blocks` and `written_blocks` of the build, which the wrappers
+write to `times.dat` with readlogs.format_usage().
+
+Only the standard library is used, and the module works with Python 2, since
+the runspec wrappers do.
+'''
+
+import os
+import resource
+
+
+def limit_memory(memory_limit):
+    '''
+    Returns a preexec_fn which limits the address space of the benchmark build
+    and every process it starts to `memory_limit` MiB, or None for no limit.
+    '''
+    if not memory_limit:
+        return None
+    limit = int(memory_limit) * 1024 * 1024
+    return lambda: resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def wait_for_usage(p):
+    '''
+    Waits for the build shell `p` and returns its resource usage. Unlike
+    getrusage(RUSAGE_CHILDREN), the usage from wait4() covers only this build,
+    and its max_rss is that of the largest process the build ran.
+    '''
+    _, status, usage = os.wait4(p.pid, 0)
+    p.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    return {
+        'user': usage.ru_utime,
+        'sys': usage.ru_stime,
+        'max_rss': usage.ru_maxrss,
+        'read_blocks': usage.ru_inblock,
+        'written_blocks': usage.ru_oublock,
+    }
@@ -0,0 +1,267 @@
+'''
+A queue of build jobs in a shared directory, for spreading the benchmark
+builds of the runspec wrapper over several machines.
+
+Layout:
+
+    pending/<id>.json     jobs which nobody works on
+    running/<id>.json     jobs claimed by a worker, kept touched by it
+    done/<id>.json        the results of the finished jobs
+    done/<id>.log.gz      and their logs
+    failed/<id>.json      jobs which failed, with the error
+    closed                written once all jobs have been enqueued
+
+A job is claimed by renaming it from `pending/` to `running/`, which is atomic
+on the same file system, including NFS, so any number of workers on any
+number of hosts can pull from the same directory. Results are written to a
+temporary file and renamed into `done/`, so a result is either complete or
+absent. A worker touches the file of its job while it works on it; the jobs of
+workers which died are put back by requeue_stale().
+
+Job ids are chosen by the coordinator and must be valid file names. Enqueueing
+a job which already finished does nothing, so a coordinator can be restarted
+on the same queue.
+
+Only the standard library is used, and the module works with Python 2, since
+the runspec wrapper does.
+'''
+
+import gzip
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CLOSED = 'closed'
+JOB_SUFFIX = '.json'
+LOG_SUFFIX = '.log.gz'
+# How often a worker touches the file of its job, in seconds.
+HEARTBEAT_INTERVAL = 60
+
+
+def worker_name():
+    '''
+    The name a worker records in the jobs it claims: the host and process.
+    '''
+    return '%s.%d' % (socket.gethostname(), os.getpid())
+
+
+class WorkQueue(object):
+    def __init__(self, path):
+        self.path = path
+        for state in (PENDING, RUNNING, DONE, FAILED):
+            directory = os.path.join(path, state)
+            if not os.path.isdir(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError:
+                    # Another process created it first.
+                    if not os.path.isdir(directory):
+                        raise
+
+    def _file(self, state, job_id, suffix=JOB_SUFFIX):
+        return os.path.join(self.path, state, job_id + suffix)
+
+    def _ids(self, state):
+        return sorted(name[:-len(JOB_SUFFIX)] for name in os.listdir(os.path.join(self.path, state))
+                      if name.endswith(JOB_SUFFIX))
+
+    def _write_json(self, path, data):
+        # Written under a name no reader looks for and renamed into place.
+        temp = '%s.%s.tmp' % (path, worker_name())
+        with open(temp, 'w') as f:
+            json.dump(data, f, sort_keys=True)
+        os.rename(temp, path)
+
+    def _read_json(self, path):
+        with open(path) as f:
+            return json.load(f)
+
+    def enqueue(self, job_id, job):
+        '''
+        Adds the job, a JSON serializable `dict`, unless it already finished or
+        a worker is on it. Returns whether it was added.
+        '''
+        if os.path.exists(self._file(DONE, job_id)) or os.path.exists(self._file(RUNNING, job_id)):
+            return False
+        failed = self._file(FAILED, job_id)
+        if os.path.exists(failed):
+            os.remove(failed)
+        job = dict(job, id=job_id)
+        self._write_json(self._file(PENDING, job_id), job)
+        return True
+
+    def close(self):
+        '''
+        Tells the workers that no more jobs will be enqueued.
+        '''
+        open(os.path.join(self.path, CLOSED), 'w').close()
+
+    def is_closed(self):
+        return os.path.exists(os.path.join(self.path, CLOSED))
+
+    def claim(self, worker=None):
+        '''
+        Takes the first pending job and returns it, or None if there is none.
+        '''
+        for job_id in self._ids(PENDING):
+            running = self._file(RUNNING, job_id)
+            try:
+                os.rename(self._file(PENDING, job_id), running)
+            except OSError:
+                # Another worker was faster.
+                continue
+            job = self._read_json(running)
+            job['worker'] = worker or worker_name()
+            job['claimed'] = time.time()
+            self._write_json(running, job)
+            return job
+        return None
+
+    def release(self, job):
+        '''
+        Puts a claimed job back for another worker.
+        '''
+        os.rename(self._file(RUNNING, job['id']), self._file(PENDING, job['id']))
+
+    def heartbeat(self, job):
+        '''
+        A context manager which keeps the job marked as alive while a worker
+        works on it.
+        '''
+        return _Heartbeat(self._file(RUNNING, job['id']))
+
+    def complete(self, job, result, log=None):
+        '''
+        Stores the result of a job, a JSON serializable `dict`, and its log.
+        '''
+        if log is not None:
+            temp = '%s.%s.tmp' % (self._file(DONE, job['id'], LOG_SUFFIX), worker_name())
+            with gzip.open(temp, 'wb') as f:
+                f.write(log.encode('utf-8') if not isinstance(log, bytes) else log)
+            os.rename(temp, self._file(DONE, job['id'], LOG_SUFFIX))
+        self._write_json(self._file(DONE, job['id']), {'job': job, 'result': result})
+        self._release_claim(job)
+
+    def fail(self, job, error):
+        self._write_json(self._file(FAILED, job['id']), {'job': job, 'error': error})
+        self._release_claim(job)
+
+    def _release_claim(self, job):
+        # If the job was put back as stale and claimed by another worker
+        # meanwhile, the file is that worker's claim and stays.
+        try:
+            claim = self._read_json(self._file(RUNNING, job['id']))
+        except (IOError, OSError, ValueError):
+            return
+        if claim.get('worker') == job.get('worker'):
+            self._remove(RUNNING, job['id'])
+
+    def _remove(self, state, job_id):
+        try:
+            os.remove(self._file(state, job_id))
+        except OSError:
+            pass
+
+    def requeue_stale(self, timeout):
+        '''
+        Puts back the running jobs whose worker has not touched them in
+        `timeout` seconds. Returns the ids of the jobs put back.
+        '''
+        stale = []
+        now = time.time()
+        for job_id in self._ids(RUNNING):
+            running = self._file(RUNNING, job_id)
+            try:
+                if now - os.path.getmtime(running) <= timeout:
+                    continue
+                os.rename(running, self._file(PENDING, job_id))
+            except OSError:
+                # It finished meanwhile.
+                continue
+            stale.append(job_id)
+        return stale
+
+    def pending(self):
+        return self._ids(PENDING)
+
+    def running(self):
+        return self._ids(RUNNING)
+
+    def finished(self):
+        '''
+        Whether there is nothing left for the workers to do.
+        '''
+        return self.is_closed() and not self.pending() and not self.running()
+
+    def result(self, job_id):
+        '''
+        Returns the result of a finished job, None if it has not finished.
+        '''
+        try:
+            return self._read_json(self._file(DONE, job_id))['result']
+        except (IOError, OSError):
+            return None
+
+    def error(self, job_id):
+        '''
+        Returns the error of a failed job, None if it has not failed.
+        '''
+        try:
+            return self._read_json(self._file(FAILED, job_id))['error']
+        except (IOError, OSError):
+            return None
+
+    def read_log(self, job_id):
+        '''
+        Returns the uncompressed log of a finished job, None if it has none.
+        '''
+        source = self._file(DONE, job_id, LOG_SUFFIX)
+        if not os.path.exists(source):
+            return None
+        with gzip.open(source, 'rb') as f:
+            return f.read()
+
+    def copy_log(self, job_id, path):
+        '''
+        Writes the uncompressed log of a finished job to `path`. Returns
+        whether the job had a log.
+        '''
+        source = self._file(DONE, job_id, LOG_SUFFIX)
+        if not os.path.exists(source):
+            return False
+        with gzip.open(source, 'rb') as compressed:
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(compressed, f)
+        return True
+
+
+class _Heartbeat(object):
+    def __init__(self, path):
+        self.path = path
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+
+    def _run(self):
+        while not self.stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                os.utime(self.path, None)
+            except OSError:
+                # The job was put back as stale; the result still counts.
+                pass
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        return False